@@ -0,0 +1,22 @@
+from alembic import op
+
+
+revision = "20261018000000"
+down_revision = "20251107000000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Добавляет индекс varchar_pattern_ops по ключу: листинг настроек по префиксу идёт диапазоном, а не полным сканом."""
+    op.create_index(
+        "ix_system_settings_key_pattern",
+        "system_settings",
+        ["key"],
+        postgresql_ops={"key": "varchar_pattern_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Удаляет индекс для поиска по префиксу ключа."""
+    op.drop_index("ix_system_settings_key_pattern", table_name="system_settings")
@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from temporalio import activity
+from temporalio.exceptions import ApplicationError
+
+from app.activities.heartbeat import process_in_chunks
+
+PARTITION_CHUNK_SIZE = 100
+
+# Обработчик диапазона элементов [start, end): чтение источника по offset'ам, запись результата.
+PartitionHandler = Callable[[int, int], Awaitable[None]]
+
+_handlers: dict[str, PartitionHandler] = {}
+
+
+@dataclass(slots=True)
+class PartitionInput:
+    job_id: str
+    handler: str
+    start: int
+    end: int
+
+
+def register_partition_handler(name: str, handler: PartitionHandler) -> None:
+    """Регистрируем обработчик партиций под именем, которое батч передаёт в ``BatchJobInput.handler``."""
+    if name in _handlers and _handlers[name] is not handler:
+        raise ValueError(f"Partition handler {name!r} is already registered")
+    _handlers[name] = handler
+
+
+@activity.defn(name="ProcessBatchPartition")
+async def process_batch_partition(partition: PartitionInput) -> int:
+    """Обрабатываем диапазон элементов партиции кусками с чекпоинтами; возвращаем, сколько элементов обработано."""
+    handler = _handlers.get(partition.handler)
+    if handler is None:
+        # Ретраить бессмысленно: обработчик не появится, пока worker не передеплоят.
+        raise ApplicationError(
+            f"Partition handler {partition.handler!r} is not registered on this worker",
+            type="UnknownPartitionHandler",
+            non_retryable=True,
+        )
+    size = partition.end - partition.start
+
+    async def process_chunk(start: int, end: int) -> None:
+        await handler(partition.start + start, partition.start + end)
+
+    await process_in_chunks(size, PARTITION_CHUNK_SIZE, process_chunk)
+    return size
@@ -0,0 +1,85 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from temporalio import activity
+
+ACTIVITY_HEARTBEAT_INTERVAL = float(os.getenv("ACTIVITY_HEARTBEAT_INTERVAL", "5"))
+
+
+def last_checkpoint(default: Any = None) -> Any:
+    """Чекпоинт из последнего heartbeat'а прошлой попытки; на первой попытке — default."""
+    details = activity.info().heartbeat_details
+    return details[0] if details else default
+
+
+class CheckpointHeartbeater:
+    """Фоновый heartbeat для долгих activity: шлём последний чекпоинт по таймеру, даже если кусок работы завис.
+
+    Пока heartbeat'ы идут, Temporal быстро замечает смерть worker'а (по ``heartbeat_timeout``, а не
+    ``start_to_close_timeout``) и доставляет в activity отмену — она прилетает как CancelledError
+    на ближайшем await. Интервал по умолчанию — треть ``heartbeat_timeout`` из info activity.
+    """
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        self._interval = interval
+        self._details: tuple[Any, ...] = ()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def interval(self) -> float:
+        if self._interval is not None:
+            return self._interval
+        timeout = activity.info().heartbeat_timeout
+        if timeout:
+            return max(timeout.total_seconds() / 3, 0.1)
+        return ACTIVITY_HEARTBEAT_INTERVAL
+
+    def checkpoint(self, value: Any) -> None:
+        """Запоминаем прогресс и сразу отправляем его; SDK сам троттлит частые heartbeat'ы."""
+        self._details = (value,)
+        activity.heartbeat(value)
+
+    async def __aenter__(self) -> "CheckpointHeartbeater":
+        # Детали heartbeat'а заменяют прошлые целиком: до первого своего чекпоинта шлём унаследованный,
+        # иначе падение на старте новой попытки стерло бы прогресс предыдущих.
+        resumed = activity.info().heartbeat_details
+        if resumed:
+            self._details = tuple(resumed)
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        interval = self.interval
+        while True:
+            await asyncio.sleep(interval)
+            activity.heartbeat(*self._details)
+
+
+async def process_in_chunks(
+    total: int,
+    chunk_size: int,
+    process_chunk: Callable[[int, int], Awaitable[None]],
+) -> int:
+    """Проходим диапазон [0, total) кусками с чекпоинтом после каждого; на retry продолжаем с сохранённого offset.
+
+    Возвращаем offset, с которого стартовала эта попытка: при failover теряется не больше одного куска.
+    """
+    resumed_from = int(last_checkpoint({}).get("offset", 0))
+    if resumed_from:
+        activity.logger.info(f"Продолжаем с offset {resumed_from} из {total}")
+    async with CheckpointHeartbeater() as heartbeater:
+        for offset in range(resumed_from, total, chunk_size):
+            end = min(offset + chunk_size, total)
+            await process_chunk(offset, end)
+            heartbeater.checkpoint({"offset": end})
+    return resumed_from
@@ -1,13 +1,22 @@
 from temporalio import activity
 import asyncio
 
+from app.activities.heartbeat import process_in_chunks
+
+SAMPLE_STEPS = 10
+SAMPLE_STEP_SECONDS = 0.2
+
+
+async def _sample_step(start: int, end: int) -> None:
+    await asyncio.sleep(SAMPLE_STEP_SECONDS * (end - start))
+
 
 @activity.defn(name="TestActivity")
 async def sample_activity(name: str) -> str:
-    """Мини-activity для демо: делаем паузу и отвечаем тёплым приветом по имени."""
+    """Мини-activity для демо: «обрабатываем» батч по шагам с чекпоинтами и отвечаем тёплым приветом по имени."""
     activity.logger.info(f"Выполнение activity для {name}")
     
-    await asyncio.sleep(2)
+    await process_in_chunks(SAMPLE_STEPS, 1, _sample_step)
     
     result = f"Привет, {name}! Activity успешно выполнена."
     activity.logger.info(f"Activity завершена: {result}")
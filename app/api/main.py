@@ -1,53 +1,98 @@
 import asyncio
+import json
 import logging
 import os
 import subprocess
-import sys
-import time
 from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 from uuid import uuid4
 
-from fastapi import Depends, FastAPI, HTTPException, Request
-from pydantic import BaseModel, ConfigDict
-from sqlalchemy import select, text
-from sqlalchemy.orm import Session
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from nats.errors import Error as NATSError
+from nats.errors import NoRespondersError
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from temporalio import exceptions as temporal_exceptions
+from temporalio.common import WorkflowIDConflictPolicy, WorkflowIDReusePolicy
 
 from app import __version__ as APP_VERSION
-from app.database import SessionLocal, get_db
+from app.api.middleware import API_COMPRESSION_ENABLED, CompressionMiddleware, RequestContextMiddleware
+from app.api.responses import FastJSONResponse
+from app.database import AsyncSessionLocal, async_engine, dispose_db, get_db
+from app.health import health_prober
+from app.logging_config import configure_logging, dropped_records
+from app.loop_monitor import LOOP_MONITOR_ENABLED, loop_monitor
 from app.models import SystemSetting
-from app.telemetry import configure_telemetry, record_http_request_metrics
+from app.startup import StartupCoordinator
+from app.telemetry import configure_telemetry, observe_gauge, shutdown_tracing
 from app.temporal.client import (
+    WORKER_TASK_QUEUE,
+    TemporalConnectError,
+    WorkflowStart,
     close_temporal_client,
     get_temporal_client,
-    wait_for_temporal,
+    start_workflows_concurrently,
+    started_new_run,
+)
+from app.temporal.results import (
+    WORKFLOW_RESULT_MAX_WAIT,
+    WorkflowNotFoundError,
+    WorkflowOutcome,
+    forget_workflow_results,
+    wait_for_result,
+    workflow_status,
 )
 from app.workflows.test_workflow import TestWorkflow
-from app.services.cache import close_redis, get_redis, set_value, get_value
+from app.services.cache import close_redis, get_redis, pipeline
 from app.services.nats_client import (
+    NATS_JETSTREAM_ENABLED,
     NATS_SUBJECT,
     close_nats,
-    clear_pending_messages,
+    ensure_stream,
     get_nats,
+    nats_connected,
+    on_connection_reset,
     publish_message,
-    wait_for_message,
+    request as nats_request,
+    subscribe_subject,
+)
+from app.services.settings_cache import (
+    SETTINGS_CACHE_MAX_SIZE,
+    SETTINGS_CACHE_WARM,
+    SETTINGS_INVALIDATION_SUBJECT,
+    SETTINGS_INVALIDATION_TIMEOUT,
+    encode_invalidation,
+    handle_invalidation_message,
+    settings_cache,
 )
 
 APP_ROOT = Path(__file__).resolve().parent.parent
+SETTINGS_BATCH_MAX_ITEMS = int(os.getenv("SETTINGS_BATCH_MAX_ITEMS", "500"))
+SETTINGS_PAGE_MAX_LIMIT = 500
+WORKFLOW_BATCH_MAX_ITEMS = int(os.getenv("WORKFLOW_BATCH_MAX_ITEMS", "100000"))
 
-logging.basicConfig(
-    level=logging.INFO,
-    stream=sys.stdout,
-    format="%(asctime)s %(levelname)s %(name)s %(message)s",
-)
 logger = logging.getLogger("sbs.api")
 
-app = FastAPI(title="SBS Core API", version=APP_VERSION)
+app = FastAPI(title="SBS Core API", version=APP_VERSION, default_response_class=FastJSONResponse)
 
-configure_telemetry(app)
+if API_COMPRESSION_ENABLED:
+    # Внутри RequestContextMiddleware: время сжатия попадает в длительность запроса в логах и метриках.
+    app.add_middleware(CompressionMiddleware)
+
+# Добавляем до инструментора OTel: он оборачивает нас снаружи, и запись в лог уже несёт trace_id запроса.
+app.add_middleware(RequestContextMiddleware)
+configure_telemetry(app, engines=[async_engine.sync_engine])
+observe_gauge(
+    "log_records_dropped",
+    "Log records dropped because the logging queue was full.",
+    lambda: float(dropped_records()),
+)
 
 
 class TestWorkflowRequest(BaseModel):
@@ -60,6 +105,36 @@ class TestWorkflowResponse(BaseModel):
     message: str
 
 
+class WorkflowBatchItem(BaseModel):
+    name: str = "TestUser"
+    workflow_id: str | None = Field(default=None, min_length=1, max_length=255)
+
+
+class WorkflowBatchStartRequest(BaseModel):
+    items: list[WorkflowBatchItem] = Field(min_length=1, max_length=WORKFLOW_BATCH_MAX_ITEMS)
+    id_conflict_policy: Literal["fail", "use_existing", "terminate_existing"] = "fail"
+    id_reuse_policy: Literal[
+        "allow_duplicate",
+        "allow_duplicate_failed_only",
+        "reject_duplicate",
+    ] = "allow_duplicate"
+    concurrency: int | None = Field(default=None, ge=1, le=1000)
+
+
+class WorkflowStatusResponse(BaseModel):
+    workflow_id: str
+    status: str
+    run_id: str | None = None
+    workflow_type: str | None = None
+    start_time: datetime | None = None
+    close_time: datetime | None = None
+
+
+class WorkflowResultResponse(WorkflowStatusResponse):
+    result: Any = None
+    error: str | None = None
+
+
 class NATSRequest(BaseModel):
     message: str = "data"
     subject: str | None = None
@@ -90,8 +165,34 @@ class SystemSettingResponse(BaseModel):
 
 
 class SystemSettingPayload(BaseModel):
-    value: str | None = None
-    description: str | None = None
+    # Длины колонок system_settings: лишнее отсекаем 422, а не ошибкой БД и 500.
+    value: str | None = Field(default=None, max_length=256)
+    description: str | None = Field(default=None, max_length=512)
+
+
+class SystemSettingBatchGetRequest(BaseModel):
+    keys: list[str] = Field(min_length=1, max_length=SETTINGS_BATCH_MAX_ITEMS)
+
+
+class SystemSettingBatchGetResponse(BaseModel):
+    items: list[SystemSettingResponse]
+    missing: list[str]
+
+
+class SystemSettingBatchItem(SystemSettingPayload):
+    key: str = Field(min_length=1, max_length=64)
+
+
+class SystemSettingBatchUpsertRequest(BaseModel):
+    items: list[SystemSettingBatchItem] = Field(
+        min_length=1, max_length=SETTINGS_BATCH_MAX_ITEMS
+    )
+
+
+class SystemSettingListResponse(BaseModel):
+    items: list[SystemSettingResponse]
+    next_cursor: str | None
+
 
 def _resolve_build() -> str:
     """Пытаемся честно узнать номер сборки: сначала смотрим переменную, потом git."""
@@ -108,11 +209,13 @@ def _resolve_build() -> str:
         return "unknown"
 
 
-def _ensure_core_version_setting() -> None:
+async def _ensure_core_version_setting() -> None:
     """Гарантируем, что в базе лежит актуальная версия ядра — пригодится для проверок здоровья."""
-    with SessionLocal() as session:
-        result = session.execute(
-            select(SystemSetting).where(SystemSetting.key == "core.version")
+    async with AsyncSessionLocal() as session:
+        result = (
+            await session.execute(
+                select(SystemSetting).where(SystemSetting.key == "core.version")
+            )
         ).scalar_one_or_none()
         if result is None:
             session.add(
@@ -122,12 +225,50 @@ def _ensure_core_version_setting() -> None:
                     description="Текущая версия ядра платформы.",
                 )
             )
-            session.commit()
+            await session.commit()
             return
 
         if result.value != APP_VERSION:
             result.value = APP_VERSION
-            session.commit()
+            await session.commit()
+
+
+async def _warm_settings_cache() -> None:
+    """Одним запросом подгружаем настройки в память, чтобы первые чтения после старта не шли в БД."""
+    generation = settings_cache.begin_load()
+    async with AsyncSessionLocal() as session:
+        rows = (
+            await session.execute(
+                select(SystemSetting)
+                .order_by(SystemSetting.key)
+                .limit(SETTINGS_CACHE_MAX_SIZE)
+            )
+        ).scalars()
+        if generation != settings_cache.begin_load():
+            return
+        loaded = settings_cache.warm(
+            (row.key, SystemSettingResponse.model_validate(row)) for row in rows
+        )
+    logger.info("Кэш настроек прогрет: %s записей", loaded)
+
+
+async def _broadcast_settings_invalidation(keys: list[str]) -> None:
+    """Рассказываем остальным репликам, какие ключи поменялись; падение NATS не должно ломать запись."""
+    if not nats_connected():
+        # Не ждём переподключения в запросе: реплики очистят кэш сами, когда связь вернётся, или догонят по TTL.
+        logger.warning("NATS недоступен, инвалидация настроек %s не разослана", keys)
+        return
+    try:
+        await asyncio.wait_for(
+            publish_message(SETTINGS_INVALIDATION_SUBJECT, encode_invalidation(keys)),
+            timeout=SETTINGS_INVALIDATION_TIMEOUT,
+        )
+    except (NATSError, RuntimeError, OSError, asyncio.TimeoutError):
+        logger.warning(
+            "Не удалось разослать инвалидацию настроек %s, реплики догонят по TTL",
+            keys,
+            exc_info=True,
+        )
 
 
 @lru_cache(maxsize=1)
@@ -139,67 +280,63 @@ def get_build_metadata() -> dict[str, Any]:
     }
 
 
-@app.middleware("http")
-async def request_logging_middleware(request: Request, call_next):
-    """Логируем каждый запрос по-человечески: с request_id, статусом и временем выполнения."""
-    request_id = request.headers.get("X-Request-ID", str(uuid4()))
-    request.state.request_id = request_id
-    start_time = time.perf_counter()
+async def _connect_database() -> None:
+    """Пишем версию ядра и прогреваем кэш настроек — заодно проверяем, что БД отвечает."""
+    await _ensure_core_version_setting()
+    if SETTINGS_CACHE_WARM:
+        await _warm_settings_cache()
 
-    logger.info(
-        "request_id=%s method=%s path=%s",
-        request_id,
-        request.method,
-        request.url.path,
-    )
 
-    duration_seconds: float
+async def _connect_nats() -> None:
+    """Подключение к NATS, подписка на инвалидации настроек и, если включено, stream JetStream."""
+    # Пока связи нет, инвалидации с других реплик теряются — не доверяем кэшу ни после разрыва, ни после возврата.
+    on_connection_reset(settings_cache.clear)
+    await get_nats()
+    await subscribe_subject(SETTINGS_INVALIDATION_SUBJECT, handle_invalidation_message)
+    if NATS_JETSTREAM_ENABLED:
+        await ensure_stream()
 
-    try:
-        response = await call_next(request)
-    except Exception:
-        duration_ms = (time.perf_counter() - start_time) * 1000
-        duration_seconds = duration_ms / 1000
-        logger.exception(
-            "request_id=%s method=%s path=%s status=error duration_ms=%.2f",
-            request_id,
-            request.method,
-            request.url.path,
-            duration_ms,
-        )
-        record_http_request_metrics(request, 500, duration_seconds)
-        raise
-
-    duration_ms = (time.perf_counter() - start_time) * 1000
-    duration_seconds = duration_ms / 1000
-    logger.info(
-        "request_id=%s method=%s path=%s status=%s duration_ms=%.2f",
-        request_id,
-        request.method,
-        request.url.path,
-        response.status_code,
-        duration_ms,
-    )
-    record_http_request_metrics(request, response.status_code, duration_seconds)
-    response.headers["X-Request-ID"] = request_id
-    return response
+
+async def _connect_redis() -> None:
+    await get_redis()
+
+
+async def _connect_temporal() -> None:
+    await get_temporal_client()
+
+
+startup = StartupCoordinator()
+startup.add("database", _connect_database)
+startup.add("redis", _connect_redis)
+startup.add("nats", _connect_nats)
+startup.add("temporal", _connect_temporal)
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    """На старте убеждаемся, что Temporal, NATS, Redis и версия в БД готовы к работе."""
-    await wait_for_temporal()
-    await get_nats()
-    await get_redis()
-    await asyncio.to_thread(_ensure_core_version_setting)
+    """Поднимаем зависимости параллельно: начинаем отвечать, как только готов обязательный набор."""
+    # Не при импорте: тесты и бенчмарки не должны получать чужие root-хендлеры и поток listener'а, а uvicorn
+    # к этому моменту уже применил свой dictConfig — его логгеры снова переводим на очередь.
+    configure_logging(os.getenv("OTEL_SERVICE_NAME", "sbs-api"))
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    # git rev-parse — синхронный subprocess: прогреваем кэш версии в потоке, а не на первом запросе /version.
+    await asyncio.gather(asyncio.to_thread(get_build_metadata), startup.run())
+    await health_prober.probe_once()
+    health_prober.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     """При выключении сервиса аккуратно закрываем все подключения, чтобы ничего не висело."""
+    await startup.stop()
+    await health_prober.stop()
+    await loop_monitor.stop()
     await close_nats()
     await close_redis()
     await close_temporal_client()
+    await dispose_db()
+    shutdown_tracing()
 
 
 @app.get("/")
@@ -210,17 +347,37 @@ async def root():
 
 
 @app.get("/health")
-async def health(
-    _: Any = Depends(get_temporal_client),
-    __: Any = Depends(get_nats),
-    ___: Any = Depends(get_redis),
-    db: Session = Depends(get_db),
-):
-    """Пинг-понг для операторов: проверяем Temporal, NATS, Redis и делаем SELECT 1."""
-    db.execute(text("SELECT 1"))
+async def health():
+    """Пинг-понг для операторов: отвечаем из снимка фонового пробера, не трогая Temporal, NATS, Redis и БД."""
+    if not health_prober.is_ready:
+        return JSONResponse(status_code=503, content={"status": "unhealthy"})
     return {"status": "healthy"}
 
 
+@app.get("/health/live")
+async def health_live():
+    """Liveness: процесс жив и event loop отвечает — зависимости тут не проверяем, чтобы kube зря не рестартил под."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: готовы к трафику, только если свежий снимок говорит, что обязательные зависимости здоровы."""
+    if not health_prober.is_ready:
+        return JSONResponse(status_code=503, content={"status": "not_ready"})
+    return {"status": "ready"}
+
+
+@app.get("/health/deps")
+async def health_deps():
+    """Подробный снимок по каждой зависимости: статус, задержка, время последней удачной проверки."""
+    snapshot = health_prober.snapshot()
+    return JSONResponse(
+        status_code=200 if snapshot["ready"] else 503,
+        content=jsonable_encoder(snapshot),
+    )
+
+
 @app.get("/version")
 async def version():
     """Возвращаем компактный JSON с версией и build, чтобы проверяющие не лезли в git."""
@@ -238,8 +395,9 @@ async def start_test_workflow(
             TestWorkflow.run,
             request.name,
             id=f"test-workflow-{request.name}",
-            task_queue="test-task-queue",
+            task_queue=WORKER_TASK_QUEUE,
         )
+        await forget_workflow_results([handle.id])
         return TestWorkflowResponse(
             run_id=handle.result_run_id,
             workflow_id=handle.id,
@@ -252,14 +410,98 @@ async def start_test_workflow(
         ) from exc
 
 
+@app.post("/workflows:batchStart")
+async def batch_start_workflows(
+    payload: WorkflowBatchStartRequest,
+    _: Any = Depends(get_temporal_client),
+):
+    """Стартуем много workflow за один HTTP-вызов: параллельно, с лимитом в полёте, и стримим результат по строке NDJSON на элемент."""
+    starts = [
+        WorkflowStart(
+            workflow_id=item.workflow_id or f"test-workflow-{item.name}-{uuid4().hex}",
+            args=[item.name],
+        )
+        for item in payload.items
+    ]
+    options: dict[str, Any] = {
+        "id_conflict_policy": WorkflowIDConflictPolicy[payload.id_conflict_policy.upper()],
+        "id_reuse_policy": WorkflowIDReusePolicy[payload.id_reuse_policy.upper()],
+    }
+    if payload.concurrency is not None:
+        options["concurrency"] = payload.concurrency
+
+    async def stream_results():
+        started: list[str] = []
+        try:
+            async for index, outcome in start_workflows_concurrently(
+                TestWorkflow.run,
+                starts,
+                task_queue=WORKER_TASK_QUEUE,
+                **options,
+            ):
+                result: dict[str, Any] = {"index": index, "workflow_id": starts[index].workflow_id}
+                if isinstance(outcome, temporal_exceptions.WorkflowAlreadyStartedError):
+                    result.update(status="already_started", error=str(outcome))
+                elif isinstance(outcome, Exception):
+                    result.update(status="error", error=str(outcome))
+                elif not started_new_run(outcome):
+                    # USE_EXISTING вернул уже идущий run: это не новый старт, и его кэш результатов не трогаем.
+                    result.update(status="existing", run_id=outcome.result_run_id)
+                else:
+                    result.update(status="started", run_id=outcome.result_run_id)
+                    started.append(outcome.id)
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            # Перезапущенные id: закэшированные исходы прошлых запусков сбрасываем одним DEL.
+            await forget_workflow_results(started)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+def _outcome_fields(outcome: WorkflowOutcome, model: type[BaseModel]) -> dict[str, Any]:
+    return {name: getattr(outcome, name) for name in model.model_fields}
+
+
+@app.get("/workflows/{workflow_id:path}/result", response_model=WorkflowResultResponse)
+async def get_workflow_result(
+    workflow_id: str,
+    wait: float = Query(default=30.0, gt=0, le=WORKFLOW_RESULT_MAX_WAIT),
+):
+    """Long-poll результата: ждём до wait секунд и отвечаем 202, если workflow ещё идёт; готовые исходы — из Redis."""
+    try:
+        outcome = await wait_for_result(workflow_id, wait)
+    except WorkflowNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Workflow {workflow_id} не найден") from None
+    except (temporal_exceptions.TemporalError, TemporalConnectError) as exc:
+        raise HTTPException(status_code=503, detail=f"Temporal недоступен: {exc}") from exc
+    if outcome is None:
+        return JSONResponse(status_code=202, content={"workflow_id": workflow_id, "status": "RUNNING"})
+    return WorkflowResultResponse(**_outcome_fields(outcome, WorkflowResultResponse))
+
+
+@app.get("/workflows/{workflow_id:path}", response_model=WorkflowStatusResponse)
+async def get_workflow_status(workflow_id: str):
+    """Статус workflow без опроса в цикле: закрытые отдаём из Redis, открытые — одним describe."""
+    try:
+        outcome = await workflow_status(workflow_id)
+    except WorkflowNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Workflow {workflow_id} не найден") from None
+    except (temporal_exceptions.TemporalError, TemporalConnectError) as exc:
+        raise HTTPException(status_code=503, detail=f"Temporal недоступен: {exc}") from exc
+    return WorkflowStatusResponse(**_outcome_fields(outcome, WorkflowStatusResponse))
+
+
 @app.post("/nats/test", response_model=NATSResponse)
 async def nats_test(payload: NATSRequest, _: Any = Depends(get_nats)):
-    """Публикуем сообщение в NATS, ждём отклика и возвращаем, что реально получили."""
+    """Делаем request/reply в NATS через свой inbox, ждём эхо и возвращаем, что реально получили."""
     subject = payload.subject or NATS_SUBJECT
     try:
-        clear_pending_messages()
-        await publish_message(subject, payload.message.encode("utf-8"))
-        data = await wait_for_message(timeout=1.0)
+        data = await nats_request(subject, payload.message.encode("utf-8"), timeout=1.0)
+    except NoRespondersError:
+        raise HTTPException(
+            status_code=503,
+            detail=f"На subject '{subject}' в NATS никто не отвечает",
+        ) from None
     except asyncio.TimeoutError:
         raise HTTPException(
             status_code=504,
@@ -270,34 +512,44 @@ async def nats_test(payload: NATSRequest, _: Any = Depends(get_nats)):
 
 @app.post("/redis/test", response_model=RedisResponse)
 async def redis_test(payload: RedisRequest, _: Any = Depends(get_redis)):
-    """Сохраняем пару ключ-значение в Redis и тут же читаем обратно для проверки."""
-    await set_value(payload.key, payload.value)
-    stored = await get_value(payload.key)
+    """Сохраняем пару ключ-значение в Redis и тут же читаем обратно — одним pipeline, за один round-trip."""
+    async with pipeline() as pipe:
+        pipe.set(payload.key, payload.value)
+        pipe.get(payload.key)
+        _, stored = await pipe.execute()
     return RedisResponse(key=payload.key, value=stored or "")
 
 
 @app.get("/settings/{key}", response_model=SystemSettingResponse)
-async def get_setting(key: str, db: Session = Depends(get_db)):
-    """Достаём запись настройки по ключу; если её нет — честно говорим 404."""
+async def get_setting(key: str, db: AsyncSession = Depends(get_db)):
+    """Достаём запись настройки по ключу: сначала из кэша в памяти, потом из БД; если её нет — честно говорим 404."""
+    cached = settings_cache.get(key)
+    if cached is not None:
+        # Модель уже провалидирована: отдаём её сериализатору напрямую, минуя dict и повторную проверку по response_model.
+        return FastJSONResponse(cached)
+
+    generation = settings_cache.begin_load()
     setting = (
-        db.execute(select(SystemSetting).where(SystemSetting.key == key))
+        (await db.execute(select(SystemSetting).where(SystemSetting.key == key)))
         .scalars()
         .first()
     )
     if setting is None:
         raise HTTPException(status_code=404, detail=f"Setting '{key}' not found")
-    return setting
+    response = SystemSettingResponse.model_validate(setting)
+    settings_cache.put(key, response, generation)
+    return FastJSONResponse(response)
 
 
 @app.put("/settings/{key}", response_model=SystemSettingResponse)
 async def upsert_setting(
     key: str,
     payload: SystemSettingPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Создаём или обновляем инфраструктурную настройку; пригодится DevOps-скриптам."""
     statement = select(SystemSetting).where(SystemSetting.key == key)
-    setting = db.execute(statement).scalars().first()
+    setting = (await db.execute(statement)).scalars().first()
 
     if setting is None:
         setting = SystemSetting(
@@ -310,7 +562,110 @@ async def upsert_setting(
         setting.value = payload.value
         setting.description = payload.description
 
-    db.commit()
-    db.refresh(setting)
-    return setting
+    await db.commit()
+    await db.refresh(setting)
+
+    response = SystemSettingResponse.model_validate(setting)
+    settings_cache.invalidate([key])
+    settings_cache.put(key, response)
+    await _broadcast_settings_invalidation([key])
+    return FastJSONResponse(response)
+
+
+@app.post("/settings:batchGet", response_model=SystemSettingBatchGetResponse)
+async def batch_get_settings(
+    payload: SystemSettingBatchGetRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Отдаём пачку настроек за раз: что есть в кэше — из памяти, остальное одним SELECT ... IN."""
+    keys = list(dict.fromkeys(payload.keys))
+    found: dict[str, SystemSettingResponse] = {}
+    to_load: list[str] = []
+    for key in keys:
+        cached = settings_cache.get(key)
+        if cached is not None:
+            found[key] = cached
+        else:
+            to_load.append(key)
+
+    if to_load:
+        generation = settings_cache.begin_load()
+        rows = (
+            await db.execute(select(SystemSetting).where(SystemSetting.key.in_(to_load)))
+        ).scalars()
+        for row in rows:
+            response = SystemSettingResponse.model_validate(row)
+            settings_cache.put(row.key, response, generation)
+            found[row.key] = response
+
+    return FastJSONResponse(
+        SystemSettingBatchGetResponse(
+            items=[found[key] for key in keys if key in found],
+            missing=[key for key in keys if key not in found],
+        )
+    )
 
+
+@app.put("/settings:batchUpsert", response_model=list[SystemSettingResponse])
+async def batch_upsert_settings(
+    payload: SystemSettingBatchUpsertRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Записываем пачку настроек одним INSERT ... ON CONFLICT DO UPDATE и одним коммитом."""
+    # Postgres не даёт обновить одну строку дважды в одном ON CONFLICT, поэтому побеждает последний дубль.
+    items = {item.key: item for item in payload.items}
+    statement = pg_insert(SystemSetting).values(
+        [
+            {"key": item.key, "value": item.value, "description": item.description}
+            for item in items.values()
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[SystemSetting.key],
+        set_={
+            "value": statement.excluded.value,
+            "description": statement.excluded.description,
+            "updated_at": func.now(),
+        },
+    ).returning(SystemSetting)
+
+    rows = (
+        await db.execute(statement, execution_options={"populate_existing": True})
+    ).scalars().all()
+    await db.commit()
+
+    responses = sorted(
+        (SystemSettingResponse.model_validate(row) for row in rows),
+        key=lambda response: response.key,
+    )
+    keys = [response.key for response in responses]
+    settings_cache.invalidate(keys)
+    for response in responses:
+        settings_cache.put(response.key, response)
+    await _broadcast_settings_invalidation(keys)
+    return FastJSONResponse(responses)
+
+
+@app.get("/settings", response_model=SystemSettingListResponse)
+async def list_settings(
+    prefix: str = "",
+    cursor: str | None = None,
+    limit: int = Query(default=100, ge=1, le=SETTINGS_PAGE_MAX_LIMIT),
+    db: AsyncSession = Depends(get_db),
+):
+    """Листаем настройки по префиксу страницами: keyset-пагинация по уникальному индексу ключа, без OFFSET."""
+    statement = select(SystemSetting).order_by(SystemSetting.key).limit(limit + 1)
+    if prefix:
+        statement = statement.where(SystemSetting.key.startswith(prefix, autoescape=True))
+    if cursor is not None:
+        statement = statement.where(SystemSetting.key > cursor)
+
+    rows = (await db.execute(statement)).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return FastJSONResponse(
+        SystemSettingListResponse(
+            items=[SystemSettingResponse.model_validate(row) for row in rows],
+            next_cursor=rows[-1].key if has_more else None,
+        )
+    )
@@ -0,0 +1,188 @@
+import logging
+import os
+import random
+import time
+import zlib
+from typing import Optional
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import IdentityResponder
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - без пакета brotli отдаём только gzip
+    brotli = None
+
+from app.logging_config import request_id_var
+from app.telemetry import record_http_request_metrics, route_template
+
+LOG_SUCCESS_SAMPLE_RATE = float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", "1.0"))
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))
+API_COMPRESSION_ENABLED = os.getenv("API_COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+API_COMPRESSION_MIN_SIZE = int(os.getenv("API_COMPRESSION_MIN_SIZE", "1024"))
+API_GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+API_BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "4"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+logger = logging.getLogger("sbs.api")
+
+
+def _should_log_request(status_code: int, duration_ms: float) -> bool:
+    """Ошибки и медленные запросы пишем всегда, успешные — с долей LOG_SUCCESS_SAMPLE_RATE."""
+    if status_code >= 400 or duration_ms >= LOG_SLOW_REQUEST_MS:
+        return True
+    return LOG_SUCCESS_SAMPLE_RATE >= 1.0 or random.random() < LOG_SUCCESS_SAMPLE_RATE
+
+
+class RequestContextMiddleware:
+    """Чистый ASGI-middleware: request_id, время, метрики и одна запись в лог на запрос.
+
+    В отличие от ``@app.middleware("http")`` не заводит отдельную задачу и поток для тела ответа:
+    сообщения ``send`` идут насквозь, мы только дописываем заголовок ``X-Request-ID`` в
+    ``http.response.start`` и запоминаем статус. Стриминговые ответы отдаются без буферизации,
+    а время считается до отправки последнего куска тела.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")
+                break
+        if not request_id:
+            request_id = str(uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_token = request_id_var.set(request_id)
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            request = Request(scope)
+            logger.exception(
+                "request failed",
+                extra={
+                    "method": request.method,
+                    "path": scope["path"],
+                    "route": route_template(request),
+                    "status": 500,
+                    "duration_ms": round(duration_ms, 2),
+                },
+            )
+            record_http_request_metrics(request, 500, duration_ms / 1000)
+            raise
+        finally:
+            request_id_var.reset(request_id_token)
+
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        request = Request(scope)
+        if _should_log_request(status_code, duration_ms):
+            logger.info(
+                "request completed",
+                extra={
+                    "request_id": request_id,
+                    "method": request.method,
+                    "path": scope["path"],
+                    "route": route_template(request),
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 2),
+                },
+            )
+        record_http_request_metrics(request, status_code, duration_ms / 1000)
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Кодировки из Accept-Encoding без тех, что клиент явно запретил через q=0."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class _GzipResponder(IdentityResponder):
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int) -> None:
+        super().__init__(app, minimum_size)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        # Z_SYNC_FLUSH на каждом куске стрима: строки NDJSON доходят до клиента сразу, а не по заполнении буфера zlib.
+        data = self._compressor.compress(body)
+        return data + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class _BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int) -> None:
+        super().__init__(app, minimum_size)
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware:
+    """Сжатие ответов от minimum_size байт: brotli, если клиент его принимает и пакет установлен, иначе gzip.
+
+    Поверх механики ``GZipMiddleware`` из Starlette (маленькие ответы, уже сжатые и SSE не трогаем),
+    но стримы сбрасываются на каждом куске — батч-старт workflow продолжает отдавать строки по мере готовности.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = API_COMPRESSION_MIN_SIZE,
+        gzip_level: int = API_GZIP_LEVEL,
+        brotli_quality: int = API_BROTLI_QUALITY,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        responder: Optional[ASGIApp]
+        if brotli is not None and "br" in accepted:
+            responder = _BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = _GzipResponder(self.app, self.minimum_size, self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,16 @@
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ через Rust-сериализатор Pydantic вместо ``json.dumps``.
+
+    Понимает и обычные dict/list, и модели Pydantic напрямую: эндпоинт может вернуть
+    ``FastJSONResponse(model)``, и FastAPI не будет перегонять модель через dict и повторную
+    валидацию по ``response_model`` — для больших ответов это основная часть CPU.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
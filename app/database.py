@@ -1,4 +1,5 @@
 ﻿from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 import os
 
@@ -13,14 +14,36 @@ DATABASE_URL = os.getenv(
     f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
 )
 
+DB_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 Base = declarative_base()
 
-def get_db():
-    """Даём запросу свежую сессию БД и гарантируем, что в конце её аккуратно закроем."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Даём запросу свежую асинхронную сессию БД, чтобы не блокировать event loop, и закрываем её в конце."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def dispose_db() -> None:
+    """Закрываем пул асинхронных соединений, чтобы при остановке не висели коннекты к Postgres."""
+    await async_engine.dispose()
\ No newline at end of file
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import text
+
+from app.database import async_engine
+from app.services.cache import connect_redis
+from app.services.nats_client import get_nats
+from app.startup import STARTUP_OPTIONAL_DEPENDENCIES
+from app.temporal.client import get_temporal_client
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+
+logger = logging.getLogger("sbs.health")
+
+HealthCheck = Callable[[], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class DependencyStatus:
+    name: str
+    required: bool = True
+    healthy: bool = False
+    latency_ms: Optional[float] = None
+    last_checked: Optional[datetime] = None
+    last_success: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class _Probe:
+    check: HealthCheck
+    status: DependencyStatus
+
+
+class HealthProber:
+    """Фоновая проверка зависимостей: опрашиваем всех параллельно по таймеру, а /health читает готовый снимок."""
+
+    def __init__(
+        self,
+        interval: float = HEALTH_PROBE_INTERVAL,
+        timeout: float = HEALTH_PROBE_TIMEOUT,
+    ) -> None:
+        self._interval = interval
+        self._timeout = timeout
+        self._probes: dict[str, _Probe] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+        self._last_round: Optional[float] = None
+
+    def register(self, name: str, check: HealthCheck, required: bool = True) -> None:
+        """Добавляем зависимость в список проверок; required решает, влияет ли она на readiness."""
+        self._probes[name] = _Probe(
+            check=check,
+            status=DependencyStatus(name=name, required=required),
+        )
+
+    async def probe_once(self) -> None:
+        """Один раунд: все проверки параллельно, каждая под своим таймаутом, результат — в снимок."""
+        await asyncio.gather(*(self._run_probe(probe) for probe in self._probes.values()))
+        self._last_round = time.monotonic()
+
+    async def _run_probe(self, probe: _Probe) -> None:
+        status = probe.status
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe.check(), timeout=self._timeout)
+        except Exception as exc:
+            if status.healthy:
+                logger.warning("Зависимость %s перестала отвечать: %r", status.name, exc)
+            status.healthy = False
+            status.error = repr(exc)
+        else:
+            if not status.healthy and status.last_checked is not None:
+                logger.info("Зависимость %s снова доступна", status.name)
+            status.healthy = True
+            status.error = None
+            status.last_success = datetime.now(timezone.utc)
+        status.latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        status.last_checked = datetime.now(timezone.utc)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.probe_once()
+
+    def start(self) -> None:
+        """Запускаем фоновый цикл проверок, если он ещё не крутится."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="sbs-health-prober")
+
+    async def stop(self) -> None:
+        """Останавливаем фоновый цикл и дожидаемся, пока задача честно завершится."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def is_stale(self) -> bool:
+        """Снимок считается протухшим, если раунды не проходили дольше трёх интервалов."""
+        if self._last_round is None:
+            return True
+        return time.monotonic() - self._last_round > self._interval * 3 + self._timeout
+
+    @property
+    def is_ready(self) -> bool:
+        """Готовы принимать трафик, когда снимок свежий и все обязательные зависимости здоровы."""
+        if self.is_stale:
+            return False
+        return all(
+            probe.status.healthy
+            for probe in self._probes.values()
+            if probe.status.required
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        """Отдаём текущее состояние всех зависимостей без единого сетевого вызова."""
+        return {
+            "ready": self.is_ready,
+            "stale": self.is_stale,
+            "dependencies": {
+                name: asdict(probe.status) for name, probe in self._probes.items()
+            },
+        }
+
+
+async def check_temporal() -> None:
+    """Спрашиваем у Temporal frontend gRPC health-check."""
+    client = await get_temporal_client()
+    if not await client.service_client.check_health():
+        raise RuntimeError("Temporal health check returned SERVING=false")
+
+
+async def check_nats() -> None:
+    """PING/PONG через flush: подтверждает, что сервер NATS реально отвечает, а не только сокет открыт."""
+    client = await get_nats()
+    await client.flush(timeout=int(max(HEALTH_PROBE_TIMEOUT, 1)))
+
+
+async def check_redis() -> None:
+    """Один PING в Redis на раунд проверки."""
+    client = await connect_redis()
+    await client.ping()
+
+
+async def check_database() -> None:
+    """SELECT 1 через асинхронный пул."""
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+health_prober = HealthProber()
+# Опциональные при старте зависимости не влияют и на readiness: без них API работает в урезанном режиме.
+health_prober.register("temporal", check_temporal, required="temporal" not in STARTUP_OPTIONAL_DEPENDENCIES)
+health_prober.register("nats", check_nats, required="nats" not in STARTUP_OPTIONAL_DEPENDENCIES)
+health_prober.register("redis", check_redis, required="redis" not in STARTUP_OPTIONAL_DEPENDENCIES)
+health_prober.register("database", check_database, required="database" not in STARTUP_OPTIONAL_DEPENDENCIES)
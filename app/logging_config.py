@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from opentelemetry import trace
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+if LOG_FORMAT not in ("json", "text"):
+    raise ValueError(f"LOG_FORMAT must be 'json' or 'text', got {LOG_FORMAT!r}")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Всё, что есть у любой LogRecord; остальные атрибуты пришли через extra= и уходят в JSON как поля.
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["ContextQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись: время, уровень, логгер, сообщение, request/trace id и поля из extra."""
+
+    def __init__(self, service_name: str) -> None:
+        super().__init__()
+        self._service_name = service_name
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "service": self._service_name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                payload[key] = value
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler, который снимает контекст в потоке вызывающего и не блокируется на полной очереди.
+
+    request_id и trace id живут в contextvars, поэтому их нужно забрать до того, как запись уйдёт
+    в поток listener'а; там же заранее форматируем исключение. Если очередь переполнена, запись
+    выбрасываем и считаем — event loop важнее полноты логов.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped_records = 0
+        self._exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        request_id = request_id_var.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.is_valid:
+            record.trace_id = format(span_context.trace_id, "032x")
+            record.span_id = format(span_context.span_id, "016x")
+        # Склеиваем сообщение и снимаем exc_info здесь: аргументы и traceback могут не пережить передачу в другой поток.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped_records += 1
+
+
+def configure_logging(service_name: str) -> ContextQueueHandler:
+    """Переключаем root-логгер на очередь: запись в stdout делает отдельный поток listener'а, а не event loop."""
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, ContextQueueHandler):
+            _route_uvicorn_loggers()
+            return handler
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter(service_name))
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = ContextQueueHandler(log_queue)
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    _route_uvicorn_loggers()
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    _queue_handler = queue_handler
+    return queue_handler
+
+
+def _route_uvicorn_loggers() -> None:
+    """uvicorn вешает на свои логгеры синхронные StreamHandler'ы — пускаем их записи через ту же очередь."""
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+
+def dropped_records() -> int:
+    """Сколько записей выброшено из-за полной очереди; до configure_logging — ноль."""
+    return _queue_handler.dropped_records if _queue_handler is not None else 0
+
+
+def stop_logging() -> None:
+    """Дописываем остаток очереди и останавливаем поток listener'а."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.telemetry import create_event_loop_lag_histogram
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.5"))
+LOOP_MONITOR_DEBUG = os.getenv("LOOP_MONITOR_DEBUG", "false").lower() in ("1", "true", "yes")
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+logger = logging.getLogger("sbs.loop_monitor")
+
+
+class EventLoopMonitor:
+    """Следим за задержкой event loop: таймер на interval секунд, а всё, что сверху, — время, когда loop был занят.
+
+    В debug-режиме рядом работает сторожевой поток: если таймер не отметился дольше порога, он снимает
+    стек потока event loop прямо во время зависания — видно, какой код держит loop. Дополнительно
+    включается debug asyncio с ``slow_callback_duration``, который после зависания называет саму корутину.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_MONITOR_INTERVAL,
+        block_threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000,
+        debug: bool = LOOP_MONITOR_DEBUG,
+    ) -> None:
+        self._interval = interval
+        self._block_threshold = block_threshold
+        self._debug = debug
+        self._histogram = create_event_loop_lag_histogram()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self.max_lag = 0.0
+
+    def start(self) -> None:
+        """Запускаем замер лагов (и сторожа в debug-режиме), если ещё не запущены."""
+        if self._task is not None and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopped.clear()
+        self._task = loop.create_task(self._run(), name="sbs-loop-monitor")
+        if self._debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self._block_threshold
+            self._watchdog = threading.Thread(target=self._watch, name="sbs-loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self._interval + self._block_threshold)
+            self._watchdog = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            lag = max(loop.time() - scheduled, 0.0)
+            self._last_tick = time.monotonic()
+            self.max_lag = max(self.max_lag, lag)
+            self._histogram.record(lag)
+            if lag >= self._block_threshold:
+                logger.warning("Event loop был заблокирован %.0f мс", lag * 1000)
+
+    def _watch(self) -> None:
+        # Таймер должен отмечаться раз в interval; если тишина дольше interval + порог, loop чем-то занят.
+        stall_after = self._interval + self._block_threshold
+        reported_tick: Optional[float] = None
+        while not self._stopped.wait(self._block_threshold / 2):
+            last_tick = self._last_tick
+            if time.monotonic() - last_tick < stall_after or reported_tick == last_tick:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_tick = last_tick
+            logger.warning(
+                "Event loop не отвечает дольше %.0f мс, стек потока loop:\n%s",
+                (time.monotonic() - last_tick - self._interval) * 1000,
+                "".join(traceback.format_stack(frame)),
+            )
+
+
+loop_monitor = EventLoopMonitor()
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, Integer, String, func
+from sqlalchemy import DateTime, Index, Integer, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -12,6 +12,10 @@ class SystemSetting(Base):
     """Таблица для наших инфраструктурных настроек: ключ, значение и немного метаданных."""
 
     __tablename__ = "system_settings"
+    __table_args__ = (
+        # LIKE 'prefix%' при не-C collation не использует обычный индекс ключа — для листинга по префиксу нужен этот.
+        Index("ix_system_settings_key_pattern", "key", postgresql_ops={"key": "varchar_pattern_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     key: Mapped[str] = mapped_column(String(64), unique=True, nullable=False, index=True)
@@ -1,47 +1,381 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
 import os
-from typing import Optional
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Mapping,
+    Optional,
+    ParamSpec,
+    Sequence,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
 
-from redis.asyncio import Redis
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import RedisError
+
+from app.services.near_cache import _MISSING, REDIS_NEAR_CACHE, near_cache
+from app.telemetry import create_cache_metrics
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "sbs:cache:")
+CACHE_LOCK_LEASE = float(os.getenv("CACHE_LOCK_LEASE", "5"))
+CACHE_LOCAL_MAX_SIZE = int(os.getenv("CACHE_LOCAL_MAX_SIZE", "1024"))
+
+logger = logging.getLogger("sbs.cache")
+
+P = ParamSpec("P")
+R = TypeVar("R")
 
+_pool: Optional[ConnectionPool] = None
 _redis: Optional[Redis] = None
+_redis_lock = asyncio.Lock()
+
+
+def _build_pool() -> ConnectionPool:
+    """Собираем явный пул соединений: лимит коннектов, таймауты сокета и фоновые health-check'и."""
+    return ConnectionPool.from_url(
+        REDIS_URL,
+        encoding="utf-8",
+        decode_responses=True,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
 
 
 async def connect_redis() -> Redis:
-    """Лениво открываем соединение с Redis и сразу проверяем, что он отвечает."""
-    global _redis
+    """Лениво открываем соединение с Redis и сразу проверяем, что он отвечает.
+
+    Первыми сюда одновременно приходят параллельный старт зависимостей, health-проба и запросы:
+    под локом пул собирает один из них, остальные получают готовый клиент.
+    """
+    global _pool, _redis
     if _redis is None:
-        _redis = Redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
-        await _redis.ping()
+        async with _redis_lock:
+            if _redis is None:
+                pool = _build_pool()
+                client = Redis(connection_pool=pool)
+                try:
+                    await client.ping()
+                except BaseException:
+                    # Неудачный PING не должен оставлять висящий пул: следующий вызов соберёт новый.
+                    await client.aclose()
+                    await pool.aclose()
+                    raise
+                _pool, _redis = pool, client
+                if REDIS_NEAR_CACHE:
+                    near_cache.start(_pool)
     return _redis
 
 
 async def get_redis() -> Redis:
-    """Достаём готовый Redis-клиент и убеждаемся, что пинг проходит без сюрпризов."""
-    client = await connect_redis()
-    pong = await client.ping()
-    if pong not in ("PONG", True):
-        raise RuntimeError(f"Unexpected Redis PING response: {pong}")
-    return client
+    """Достаём готовый Redis-клиент без лишнего PING: живость соединений проверяет сам пул по health_check_interval."""
+    return await connect_redis()
 
 
 async def close_redis() -> None:
-    """Аккуратно закрываем соединение и очищаем кэш, чтобы не держать лишние коннекты."""
-    global _redis
-    if _redis is not None:
-        await _redis.close()
-        _redis = None
+    """Аккуратно закрываем клиента и пул, чтобы не держать лишние коннекты."""
+    global _pool, _redis
+    async with _redis_lock:
+        await near_cache.stop()
+        if _redis is not None:
+            await _redis.aclose()
+            _redis = None
+        if _pool is not None:
+            await _pool.aclose()
+            _pool = None
 
 
 async def set_value(key: str, value: str) -> None:
     """Кладём строку в Redis по заданному ключу, как в маленький временный блокнот."""
     client = await get_redis()
     await client.set(key, value)
+    near_cache.invalidate([key])
 
 
 async def get_value(key: str) -> Optional[str]:
-    """Читаем обратно, что лежит в Redis, если ключ ещё не протух."""
+    """Читаем обратно, что лежит в Redis, если ключ ещё не протух; с near-cache — сначала из памяти процесса."""
+    client = await get_redis()
+    if not near_cache.accepts(key):
+        return await client.get(key)
+    value = near_cache.get(key)
+    if value is not _MISSING:
+        return value
+    sequence = near_cache.begin_read()
+    value = await client.get(key)
+    near_cache.put(key, value, sequence)
+    return value
+
+
+async def mget_values(keys: Sequence[str]) -> list[Optional[str]]:
+    """Читаем много ключей одним MGET; порядок ответа совпадает с порядком ключей."""
+    if not keys:
+        return []
+    client = await get_redis()
+    return await client.mget(keys)
+
+
+async def mset_values(values: Mapping[str, str], ttl: Optional[float] = None) -> None:
+    """Пишем много ключей за один round-trip: MSET без TTL или пачка SET EX в одном pipeline."""
+    if not values:
+        return
     client = await get_redis()
-    return await client.get(key)
+    if ttl is None:
+        await client.mset(dict(values))
+    else:
+        async with client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, px=int(ttl * 1000))
+            await pipe.execute()
+    near_cache.invalidate(list(values))
+
+
+async def delete_values(keys: Sequence[str]) -> None:
+    """Удаляем много ключей одним DEL."""
+    if not keys:
+        return
+    client = await get_redis()
+    await client.delete(*keys)
+    near_cache.invalidate(list(keys))
+
+
+@asynccontextmanager
+async def pipeline(transaction: bool = False) -> AsyncIterator[Pipeline]:
+    """Отдаём pipeline: команды копятся в буфере и уходят одним пакетом на pipe.execute(); transaction=True оборачивает их в MULTI/EXEC."""
+    client = await get_redis()
+    async with client.pipeline(transaction=transaction) as pipe:
+        yield pipe
+
+
+# Снимаем лок только если он всё ещё наш: чужой лок после истечения лизы трогать нельзя.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _LocalTier:
+    """Первый, локальный уровень кэша: LRU в памяти процесса с истечением по времени."""
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, tuple[float, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, envelope = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return envelope
+
+    def put(self, key: str, envelope: tuple[float, Any], ttl: float) -> None:
+        if self._max_size <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, envelope)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+def _dumps_envelope(envelope: tuple[float, Any]) -> str:
+    return json.dumps(envelope, separators=(",", ":"), ensure_ascii=False)
+
+
+def _loads_envelope(raw: Optional[str]) -> Optional[tuple[float, Any]]:
+    if raw is None:
+        return None
+    try:
+        fresh_until, value = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return float(fresh_until), value
+
+
+def cached(
+    ttl: float,
+    key: Union[str, Callable[..., str], None] = None,
+    *,
+    stale_ttl: float = 0.0,
+    local_ttl: Optional[float] = None,
+    local_max_size: int = CACHE_LOCAL_MAX_SIZE,
+    lock_lease: float = CACHE_LOCK_LEASE,
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """Cache-aside для async-функций: локальный LRU, потом Redis, и только один вычислитель на ключ.
+
+    ``key`` — шаблон вида ``"settings:{key}"`` (подставляются аргументы функции) или callable,
+    возвращающий строку; по умолчанию ключ строится из имени функции и хэша аргументов.
+    ``stale_ttl`` включает stale-while-revalidate: протухшее значение ещё столько секунд отдаётся
+    сразу, а обновление идёт в фоне. ``local_ttl`` ограничивает, сколько локальный уровень может
+    отставать от Redis после инвалидации на другой реплике. Значения должны сериализоваться в JSON
+    и всегда возвращаются в JSON-форме: tuple приходит списком, ключи словарей — строками.
+    """
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        signature = inspect.signature(func)
+        namespace = f"{func.__module__}.{func.__qualname__}"
+        local = _LocalTier(local_max_size)
+        inflight: dict[str, asyncio.Future[Any]] = {}
+        metrics = create_cache_metrics(namespace)
+
+        def build_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> str:
+            if callable(key):
+                suffix = key(*args, **kwargs)
+            elif isinstance(key, str):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                suffix = key.format(**bound.arguments)
+            else:
+                digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode("utf-8"))
+                suffix = f"{namespace}:{digest.hexdigest()}"
+            return f"{CACHE_KEY_PREFIX}{suffix}"
+
+        def remember_locally(cache_key: str, envelope: tuple[float, Any]) -> None:
+            remaining = envelope[0] + stale_ttl - time.time()
+            if local_ttl is not None:
+                remaining = min(remaining, local_ttl)
+            local.put(cache_key, envelope, remaining)
+
+        async def read_remote(cache_key: str) -> Optional[tuple[float, Any]]:
+            try:
+                client = await get_redis()
+                return _loads_envelope(await client.get(cache_key))
+            except (RedisError, OSError):
+                logger.warning("Redis недоступен при чтении %s, идём в источник", cache_key, exc_info=True)
+                return None
+
+        async def write_remote(cache_key: str, payload: str) -> None:
+            try:
+                client = await get_redis()
+                await client.set(cache_key, payload, px=int((ttl + stale_ttl) * 1000))
+            except (RedisError, OSError):
+                logger.warning("Не удалось сохранить %s в Redis", cache_key, exc_info=True)
+
+        async def acquire_lock(lock_key: str, token: str) -> Optional[bool]:
+            """True — лок наш, False — его держит другая реплика, None — Redis недоступен."""
+            try:
+                client = await get_redis()
+                return bool(await client.set(lock_key, token, nx=True, px=int(lock_lease * 1000)))
+            except (RedisError, OSError):
+                return None
+
+        async def release_lock(lock_key: str, token: str) -> None:
+            try:
+                client = await get_redis()
+                await client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except (RedisError, OSError):
+                logger.warning("Не удалось снять лок %s, он истечёт сам", lock_key, exc_info=True)
+
+        async def wait_for_fill(cache_key: str) -> Optional[tuple[float, Any]]:
+            deadline = time.monotonic() + lock_lease
+            delay = 0.02
+            while time.monotonic() < deadline:
+                await asyncio.sleep(delay)
+                envelope = await read_remote(cache_key)
+                if envelope is not None and envelope[0] > time.time():
+                    return envelope
+                delay = min(delay * 2, 0.25)
+            return None
+
+        async def load(cache_key: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+            lock_key = f"{cache_key}:lock"
+            token = uuid4().hex
+            acquired = await acquire_lock(lock_key, token)
+            if acquired is False:
+                envelope = await wait_for_fill(cache_key)
+                if envelope is not None:
+                    remember_locally(cache_key, envelope)
+                    return envelope[1]
+            try:
+                value = await func(*args, **kwargs)
+                # Отдаём значение после круга через JSON: иначе промах вернул бы, скажем, tuple, а попадание в Redis — list.
+                payload = _dumps_envelope((time.time() + ttl, value))
+                envelope = _loads_envelope(payload)
+                remember_locally(cache_key, envelope)
+                await write_remote(cache_key, payload)
+                return envelope[1]
+            finally:
+                if acquired:
+                    await release_lock(lock_key, token)
+
+        def single_flight(cache_key: str, args: tuple[Any, ...], kwargs: dict[str, Any], background: bool) -> asyncio.Future[Any]:
+            task = inflight.get(cache_key)
+            if task is None:
+                task = asyncio.ensure_future(load(cache_key, args, kwargs))
+                inflight[cache_key] = task
+
+                def forget(done: asyncio.Future[Any]) -> None:
+                    if inflight.get(cache_key) is done:
+                        del inflight[cache_key]
+                    if done.cancelled():
+                        return
+                    # Забираем исключение всегда: все ждущие могли уйти по отмене, и asyncio ругался бы
+                    # «Future exception was never retrieved».
+                    error = done.exception()
+                    if background and error is not None:
+                        logger.warning("Фоновое обновление %s упало", cache_key, exc_info=error)
+
+                task.add_done_callback(forget)
+            return task
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            cache_key = build_key(args, kwargs)
+            envelope = local.get(cache_key)
+            if envelope is None:
+                envelope = await read_remote(cache_key)
+                if envelope is not None:
+                    remember_locally(cache_key, envelope)
+
+            if envelope is not None:
+                fresh_until, value = envelope
+                now = time.time()
+                if now < fresh_until:
+                    metrics.record("hit")
+                    return value
+                if now < fresh_until + stale_ttl:
+                    metrics.record("hit")
+                    single_flight(cache_key, args, kwargs, background=True)
+                    return value
+
+            metrics.record("miss")
+            return await asyncio.shield(single_flight(cache_key, args, kwargs, background=False))
+
+        async def invalidate(*args: P.args, **kwargs: P.kwargs) -> None:
+            """Удаляем значение для этих аргументов из локального уровня и из Redis."""
+            cache_key = build_key(args, kwargs)
+            local.pop(cache_key)
+            client = await get_redis()
+            await client.delete(cache_key)
+
+        wrapper.invalidate = invalidate  # type: ignore[attr-defined]
+        return wrapper
 
+    return decorator
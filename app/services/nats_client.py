@@ -1,27 +1,143 @@
 import asyncio
+import logging
 import os
-from typing import Optional
+import time
+from typing import Awaitable, Callable, Iterable, Optional
+from uuid import uuid4
 
 from nats.aio.client import Client as NATS
+from nats.aio.msg import Msg
+from nats.aio.subscription import Subscription
+from nats.errors import NoRespondersError, SlowConsumerError
+from nats.errors import TimeoutError as NATSTimeoutError
+from nats.js import JetStreamContext, api as js_api
+from nats.js.errors import BadRequestError, NotFoundError
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind
+
+from app.telemetry import create_nats_metrics, observe_gauge
 
 
 NATS_URL = os.getenv("NATS_URL", "nats://localhost:4222")
 NATS_SUBJECT = os.getenv("NATS_SUBJECT", "backup.test")
+NATS_QUEUE_MAX_SIZE = int(os.getenv("NATS_QUEUE_MAX_SIZE", "1000"))
+NATS_QUEUE_OVERFLOW = os.getenv("NATS_QUEUE_OVERFLOW", "drop_oldest")
+NATS_PUBLISH_FLUSH_INTERVAL = float(os.getenv("NATS_PUBLISH_FLUSH_INTERVAL", "0.05"))
+NATS_PUBLISH_FLUSH_BYTES = int(os.getenv("NATS_PUBLISH_FLUSH_BYTES", str(256 * 1024)))
+NATS_PUBLISH_MAX_PENDING_BYTES = int(os.getenv("NATS_PUBLISH_MAX_PENDING_BYTES", str(8 * 1024 * 1024)))
+NATS_FLUSH_TIMEOUT = int(os.getenv("NATS_FLUSH_TIMEOUT", "5"))
+NATS_CONNECT_TIMEOUT = int(os.getenv("NATS_CONNECT_TIMEOUT", "2"))
+NATS_MAX_RECONNECT_ATTEMPTS = int(os.getenv("NATS_MAX_RECONNECT_ATTEMPTS", "3"))
+NATS_JETSTREAM_ENABLED = os.getenv("NATS_JETSTREAM_ENABLED", "false").lower() in ("1", "true", "yes")
+NATS_STREAM_NAME = os.getenv("NATS_STREAM_NAME", "SBS_EVENTS")
+NATS_STREAM_SUBJECTS = [
+    subject for subject in os.getenv("NATS_STREAM_SUBJECTS", "sbs.events.>").split(",") if subject
+]
+NATS_STREAM_MAX_AGE = float(os.getenv("NATS_STREAM_MAX_AGE", str(7 * 24 * 3600)))
+NATS_STREAM_DUPLICATE_WINDOW = float(os.getenv("NATS_STREAM_DUPLICATE_WINDOW", "120"))
+
+if NATS_QUEUE_OVERFLOW not in ("drop_oldest", "drop_newest"):
+    raise ValueError(
+        f"NATS_QUEUE_OVERFLOW must be 'drop_oldest' or 'drop_newest', got {NATS_QUEUE_OVERFLOW!r}"
+    )
+
+logger = logging.getLogger("sbs.nats")
 
 _nats = NATS()
-_message_queue: "asyncio.Queue[bytes]" = asyncio.Queue()
-_subscription_sid: Optional[int] = None
+_message_queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=NATS_QUEUE_MAX_SIZE)
+_metrics = create_nats_metrics()
+_handlers: dict[str, Callable[[Msg], Awaitable[None]]] = {}
+_subscriptions: dict[str, Subscription] = {}
+_connection_reset_handlers: list[Callable[[], None]] = []
+_connect_lock = asyncio.Lock()
+_tracer = trace.get_tracer("sbs.nats")
+
+
+def _trace_headers(headers: Optional[dict[str, str]] = None) -> Optional[dict[str, str]]:
+    """Дописываем traceparent текущего контекста в заголовки; без активного трейса заголовки не трогаем."""
+    if not trace.get_current_span().get_span_context().is_valid:
+        return headers
+    carrier = dict(headers or {})
+    propagate.inject(carrier)
+    return carrier
+
+
+def _span_attributes(subject: str) -> dict[str, str]:
+    return {"messaging.system": "nats", "messaging.destination.name": subject}
+
+
+def _traced(handler: Callable[[Msg], Awaitable[None]]) -> Callable[[Msg], Awaitable[None]]:
+    """Оборачиваем обработчик в consumer-спан, продолжающий трейс отправителя из заголовков сообщения."""
+
+    async def wrapper(msg: Msg) -> None:
+        with _tracer.start_as_current_span(
+            f"{msg.subject} process",
+            context=propagate.extract(msg.headers or {}),
+            kind=SpanKind.CONSUMER,
+            attributes=_span_attributes(msg.subject),
+        ):
+            await handler(msg)
+
+    return wrapper
+
+
+def nats_connected() -> bool:
+    """Есть ли живое соединение прямо сейчас — без попытки подключиться."""
+    return _nats.is_connected
+
+
+def _connection_alive() -> bool:
+    # Во время переподключения клиент сам восстановит связь и подписки; второй connect() сломал бы ему пул серверов.
+    return _nats.is_connected or _nats.is_reconnecting
 
 
 async def connect_nats() -> NATS:
-    """Подключаемся к NATS и сразу вешаем тестовую подписку, чтобы ловить события."""
-    global _subscription_sid
-    if not _nats.is_connected:
-        await _nats.connect(servers=[NATS_URL])
-        _subscription_sid = await _nats.subscribe(NATS_SUBJECT, cb=_message_handler)
+    """Подключаемся к NATS и сразу вешаем тестовую подписку и все зарегистрированные обработчики."""
+    if _connection_alive():
+        return _nats
+    async with _connect_lock:
+        if _connection_alive():
+            return _nats
+        # Ту же попытку ждут старт, health-проба и запросы: NATS опционален, поэтому не висим на дефолтных
+        # 60 повторах по 2 с, а быстро сдаёмся и подключаемся заново при следующем обращении.
+        await _nats.connect(
+            servers=[NATS_URL],
+            error_cb=_error_callback,
+            disconnected_cb=_connection_reset,
+            reconnected_cb=_connection_reset,
+            connect_timeout=NATS_CONNECT_TIMEOUT,
+            max_reconnect_attempts=NATS_MAX_RECONNECT_ATTEMPTS,
+            pending_size=max(NATS_PUBLISH_MAX_PENDING_BYTES * 2, 2 * 1024 * 1024),
+        )
+        _subscriptions.clear()
+        _subscriptions[NATS_SUBJECT] = await _nats.subscribe(NATS_SUBJECT, cb=_traced(_message_handler))
+        for subject, handler in _handlers.items():
+            _subscriptions[subject] = await _nats.subscribe(subject, cb=handler)
     return _nats
 
 
+async def subscribe_subject(subject: str, handler: Callable[[Msg], Awaitable[None]]) -> None:
+    """Регистрируем постоянный обработчик subject: он переживёт и переподключение, и повторный connect."""
+    _handlers[subject] = _traced(handler)
+    client = await connect_nats()
+    if subject not in _subscriptions:
+        _subscriptions[subject] = await client.subscribe(subject, cb=_handlers[subject])
+
+
+def on_connection_reset(handler: Callable[[], None]) -> None:
+    """Регистрируем колбэк на разрыв и восстановление связи: всё, что пришло бы за это время, мы пропустили."""
+    if handler not in _connection_reset_handlers:
+        _connection_reset_handlers.append(handler)
+
+
+async def _connection_reset() -> None:
+    for handler in _connection_reset_handlers:
+        try:
+            handler()
+        except Exception:
+            logger.exception("Обработчик переподключения NATS упал")
+
+
 async def get_nats() -> NATS:
     """Возвращаем живой NATS-клиент и проверяем, что связь не отвалилась."""
     client = await connect_nats()
@@ -30,16 +146,170 @@ async def get_nats() -> NATS:
     return client
 
 
-async def _message_handler(msg) -> None:
-    """Складываем каждое входящее сообщение в очередь, чтобы тесты могли его подобрать."""
-    await _message_queue.put(msg.data)
+async def _error_callback(exc: Exception) -> None:
+    """Считаем slow consumer отдельно: это значит, что сервер или клиент уже выкинул наши сообщения."""
+    if isinstance(exc, SlowConsumerError):
+        _metrics.slow_consumer_events.add(1, attributes={"nats.subject": exc.subject})
+        logger.warning("NATS slow consumer на %s, сообщения отброшены", exc.subject)
+        return
+    logger.warning("Ошибка клиента NATS: %r", exc)
+
+
+async def _message_handler(msg: Msg) -> None:
+    """Запросы с reply отражаем эхом обратно, остальные сообщения складываем в ограниченную очередь."""
+    if msg.reply:
+        await msg.respond(msg.data)
+        return
+    _enqueue(msg.data)
+
+
+def _enqueue(data: bytes) -> None:
+    """Кладём сообщение в очередь без ожидания; при переполнении выкидываем старое или новое по политике."""
+    try:
+        _message_queue.put_nowait(data)
+        return
+    except asyncio.QueueFull:
+        pass
+    _metrics.dropped_messages.add(1, attributes={"nats.overflow_policy": NATS_QUEUE_OVERFLOW})
+    if NATS_QUEUE_OVERFLOW == "drop_newest":
+        return
+    _message_queue.get_nowait()
+    _message_queue.put_nowait(data)
+
+
+async def request(subject: str, payload: bytes, timeout: float = 1.0) -> bytes:
+    """Request/reply через общий мультиплексированный inbox клиента: ответ находим по токену, без общей очереди.
+
+    Поднимает ``asyncio.TimeoutError``, если ответ не пришёл вовремя, и ``nats.errors.NoRespondersError``,
+    если на subject никто не подписан.
+    """
+    client = await get_nats()
+    with _tracer.start_as_current_span(
+        f"{subject} request", kind=SpanKind.CLIENT, attributes=_span_attributes(subject)
+    ):
+        response = await client.request(subject, payload, timeout=timeout, headers=_trace_headers())
+    return response.data
 
 
 async def publish_message(subject: str, payload: bytes) -> None:
     """Публикуем сообщение и ждём flush, чтобы точно знать: NATS его увидел."""
     client = await get_nats()
-    await client.publish(subject, payload)
-    await client.flush()
+    with _tracer.start_as_current_span(
+        f"{subject} publish", kind=SpanKind.PRODUCER, attributes=_span_attributes(subject)
+    ):
+        await client.publish(subject, payload, headers=_trace_headers())
+        await client.flush()
+
+
+class BatchPublisher:
+    """Высокопроизводительная публикация: без flush на каждое сообщение, с подтверждением пачками.
+
+    ``publish`` только кладёт сообщение в буфер клиента; подтверждающий PING/PONG (``flush``) идёт
+    раз в ``flush_interval`` или когда накопилось ``flush_bytes`` неподтверждённых байт. Если
+    неподтверждённых байт больше ``max_pending_bytes``, вызывающий ждёт ближайший flush —
+    это и есть backpressure вместо бесконечного роста памяти.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = NATS_PUBLISH_FLUSH_INTERVAL,
+        flush_bytes: int = NATS_PUBLISH_FLUSH_BYTES,
+        max_pending_bytes: int = NATS_PUBLISH_MAX_PENDING_BYTES,
+    ) -> None:
+        self._flush_interval = flush_interval
+        self._flush_bytes = flush_bytes
+        self._max_pending_bytes = max_pending_bytes
+        self._pending_bytes = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    async def publish(self, subject: str, payload: bytes, headers: Optional[dict[str, str]] = None) -> None:
+        """Fire-and-forget публикация; ждём только если упёрлись в лимит неподтверждённых байт.
+
+        Отдельный спан на каждое сообщение не создаём — на горячем пути это дорого; в заголовки уходит
+        контекст вызывающего, и consumer продолжает его трейс.
+        """
+        client = await get_nats()
+        self._ensure_running()
+        size = len(subject) + len(payload)
+        while self._pending_bytes and self._pending_bytes + size > self._max_pending_bytes:
+            await self.flush()
+        await client.publish(subject, payload, headers=_trace_headers(headers))
+        self._pending_bytes += size
+        if self._pending_bytes >= self._flush_bytes:
+            self._flush_requested.set()
+
+    async def publish_many(self, messages: Iterable[tuple[str, bytes]]) -> int:
+        """Публикуем пачку сообщений подряд без промежуточных round-trip'ов; возвращаем их количество."""
+        count = 0
+        for subject, payload in messages:
+            await self.publish(subject, payload)
+            count += 1
+        return count
+
+    async def flush(self) -> None:
+        """Подтверждаем всё, что уже опубликовано; параллельные вызовы ждут один и тот же flush."""
+        async with self._flush_lock:
+            if not self._pending_bytes:
+                return
+            flushed = self._pending_bytes
+            started = time.perf_counter()
+            await _nats.flush(timeout=NATS_FLUSH_TIMEOUT)
+            _metrics.flush_duration.record(time.perf_counter() - started)
+            self._pending_bytes = max(self._pending_bytes - flushed, 0)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="sbs-nats-publisher")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.warning("Фоновый flush NATS не прошёл: %r", exc)
+
+    async def close(self) -> None:
+        """Останавливаем фоновый flush и дотправляем хвост, пока соединение ещё живо."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if _nats.is_connected:
+            await self.flush()
+
+
+publisher = BatchPublisher()
+
+observe_gauge(
+    "nats_publisher_pending_bytes",
+    "Bytes published through the batch publisher and not yet confirmed by a flush.",
+    lambda: float(publisher.pending_bytes),
+    unit="By",
+)
+
+
+async def publish_event(subject: str, payload: bytes) -> None:
+    """Быстрая публикация события без ожидания round-trip — для потоков событий, где важна пропускная способность."""
+    await publisher.publish(subject, payload)
+
+
+async def publish_many(messages: Iterable[tuple[str, bytes]]) -> int:
+    """Пакетная публикация через общий batch-publisher."""
+    return await publisher.publish_many(messages)
 
 
 async def wait_for_message(timeout: float = 1.0) -> bytes:
@@ -48,13 +318,195 @@ async def wait_for_message(timeout: float = 1.0) -> bytes:
     return await asyncio.wait_for(_message_queue.get(), timeout=timeout)
 
 
+async def get_jetstream() -> JetStreamContext:
+    """JetStream-контекст поверх общего соединения — отдельный коннект под durable-потоки не нужен."""
+    client = await get_nats()
+    return client.jetstream()
+
+
+async def ensure_stream(
+    name: str = NATS_STREAM_NAME,
+    subjects: Optional[list[str]] = None,
+    max_age: float = NATS_STREAM_MAX_AGE,
+    duplicate_window: float = NATS_STREAM_DUPLICATE_WINDOW,
+) -> js_api.StreamInfo:
+    """Создаём stream, если его нет, или приводим конфиг существующего к нужному — операция идемпотентна."""
+    client = await get_nats()
+    manager = client.jsm()
+    config = js_api.StreamConfig(
+        name=name,
+        subjects=subjects or NATS_STREAM_SUBJECTS,
+        storage=js_api.StorageType.FILE,
+        max_age=max_age,
+        duplicate_window=duplicate_window,
+    )
+    try:
+        await manager.stream_info(name)
+    except NotFoundError:
+        return await manager.add_stream(config)
+    return await manager.update_stream(config)
+
+
+async def ensure_consumer(
+    durable: str,
+    stream: str = NATS_STREAM_NAME,
+    filter_subject: Optional[str] = None,
+    ack_wait: float = 30.0,
+    max_deliver: int = 5,
+    max_ack_pending: int = 1000,
+) -> js_api.ConsumerInfo:
+    """Заводим durable pull-consumer; если он уже есть, сервер просто вернёт его описание."""
+    client = await get_nats()
+    config = js_api.ConsumerConfig(
+        durable_name=durable,
+        ack_policy=js_api.AckPolicy.EXPLICIT,
+        ack_wait=ack_wait,
+        max_deliver=max_deliver,
+        max_ack_pending=max_ack_pending,
+        filter_subject=filter_subject,
+    )
+    try:
+        return await client.jsm().add_consumer(stream, config)
+    except BadRequestError:
+        return await client.jsm().consumer_info(stream, durable)
+
+
+async def publish_durable(
+    subject: str,
+    payload: bytes,
+    msg_id: Optional[str] = None,
+    attempts: int = 3,
+    timeout: float = 2.0,
+) -> js_api.PubAck:
+    """Публикуем в JetStream с Nats-Msg-Id: повтор после таймаута с тем же id сервер отбросит как дубликат."""
+    js = await get_jetstream()
+    with _tracer.start_as_current_span(
+        f"{subject} publish", kind=SpanKind.PRODUCER, attributes=_span_attributes(subject)
+    ):
+        headers = _trace_headers({"Nats-Msg-Id": msg_id or uuid4().hex})
+        for attempt in range(1, attempts):
+            try:
+                return await js.publish(subject, payload, timeout=timeout, headers=headers)
+            except (NATSTimeoutError, NoRespondersError):
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        # Последняя попытка: её ошибка уходит вызывающему.
+        return await js.publish(subject, payload, timeout=timeout, headers=headers)
+
+
+class PullBatchConsumer:
+    """Пачечная обработка durable-consumer'а: fetch N сообщений, параллельно под семафором, ack одной пачкой.
+
+    Успешные сообщения подтверждаются ``ack`` без ожидания, неудачные — ``nak`` с задержкой для
+    повторной доставки; в конце пачки один flush подтверждает все ответы разом.
+    """
+
+    def __init__(
+        self,
+        durable: str,
+        handler: Callable[[Msg], Awaitable[None]],
+        subject: Optional[str] = None,
+        stream: str = NATS_STREAM_NAME,
+        batch_size: int = 100,
+        concurrency: int = 16,
+        fetch_timeout: float = 1.0,
+        nak_delay: float = 5.0,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 30.0,
+    ) -> None:
+        self._durable = durable
+        self._handler = _traced(handler)
+        self._subject = subject
+        self._stream = stream
+        self._batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._fetch_timeout = fetch_timeout
+        self._nak_delay = nak_delay
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def _process(self, msg: Msg) -> bool:
+        async with self._semaphore:
+            try:
+                await self._handler(msg)
+            except Exception:
+                logger.exception("Обработчик JetStream упал на %s", msg.subject)
+                return False
+            return True
+
+    async def process_batch(self, subscription: JetStreamContext.PullSubscription) -> int:
+        """Одна итерация: забрали пачку, обработали, подтвердили; возвращаем размер пачки."""
+        try:
+            messages = await subscription.fetch(self._batch_size, timeout=self._fetch_timeout)
+        except NATSTimeoutError:
+            return 0
+        results = await asyncio.gather(*(self._process(msg) for msg in messages))
+        for msg, ok in zip(messages, results):
+            if ok:
+                await msg.ack()
+            else:
+                await msg.nak(delay=self._nak_delay)
+        await _nats.flush(timeout=NATS_FLUSH_TIMEOUT)
+        return len(messages)
+
+    async def _subscribe(self) -> JetStreamContext.PullSubscription:
+        await ensure_consumer(self._durable, stream=self._stream, filter_subject=self._subject)
+        js = await get_jetstream()
+        return await js.pull_subscribe_bind(durable=self._durable, stream=self._stream)
+
+    async def _unsubscribe(self, subscription: Optional[JetStreamContext.PullSubscription]) -> None:
+        if subscription is None:
+            return
+        try:
+            await subscription.unsubscribe()
+        except Exception:
+            logger.debug("Не удалось отписать pull-consumer %s", self._durable, exc_info=True)
+
+    async def run(self) -> None:
+        """Крутим fetch-цикл, пока задачу не отменят.
+
+        Разрыв соединения, таймаут flush или недоступный на время переподключения JetStream не должны
+        навсегда убивать consumer: логируем, ждём с растущей паузой и подписываемся заново.
+        """
+        subscription: Optional[JetStreamContext.PullSubscription] = None
+        delay = self._retry_delay
+        try:
+            while True:
+                try:
+                    if subscription is None:
+                        subscription = await self._subscribe()
+                    await self.process_batch(subscription)
+                    delay = self._retry_delay
+                except Exception:
+                    logger.exception("Pull-consumer %s упал, повтор через %.1f с", self._durable, delay)
+                    await self._unsubscribe(subscription)
+                    subscription = None
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self._max_retry_delay)
+        finally:
+            await self._unsubscribe(subscription)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(), name=f"sbs-jetstream-{self._durable}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
 async def close_nats() -> None:
-    """Отписываемся от тестового subject и мягко дренируем соединение."""
-    global _subscription_sid
+    """Дотправляем буфер публикаций, отписываемся от всех subject и мягко дренируем соединение."""
+    await publisher.close()
     if _nats.is_connected:
-        if _subscription_sid is not None:
-            await _nats.unsubscribe(_subscription_sid)
-            _subscription_sid = None
+        for subscription in _subscriptions.values():
+            await subscription.unsubscribe()
+        _subscriptions.clear()
         await _nats.drain()
 
 
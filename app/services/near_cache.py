@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+from redis.asyncio import ConnectionPool
+from redis.asyncio.connection import AbstractConnection
+from redis.exceptions import RedisError
+
+from app.telemetry import create_cache_metrics, observe_gauge
+
+REDIS_NEAR_CACHE = os.getenv("REDIS_NEAR_CACHE", "false").lower() in ("1", "true", "yes")
+REDIS_NEAR_CACHE_MAX_SIZE = int(os.getenv("REDIS_NEAR_CACHE_MAX_SIZE", "10000"))
+REDIS_NEAR_CACHE_TTL = float(os.getenv("REDIS_NEAR_CACHE_TTL", "300"))
+REDIS_NEAR_CACHE_PREFIXES = tuple(
+    prefix for prefix in os.getenv("REDIS_NEAR_CACHE_PREFIXES", "").split(",") if prefix
+)
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+logger = logging.getLogger("sbs.near_cache")
+
+_MISSING = object()
+
+
+class NearCache:
+    """Near-cache поверх Redis client-side caching: держим значения в памяти, пока сервер не пришлёт инвалидацию.
+
+    Используем BCAST-режим CLIENT TRACKING с REDIRECT на отдельное соединение, подписанное на
+    ``__redis__:invalidate``: так отслеживание не зависит от того, какое соединение пула читало ключ.
+    Пока канал инвалидаций не поднят, кэш выключен и все чтения идут прямо в Redis.
+    """
+
+    def __init__(
+        self,
+        max_size: int = REDIS_NEAR_CACHE_MAX_SIZE,
+        ttl: float = REDIS_NEAR_CACHE_TTL,
+        prefixes: Sequence[str] = REDIS_NEAR_CACHE_PREFIXES,
+        ping_interval: float = 15.0,
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._prefixes = tuple(prefixes)
+        self._ping_interval = ping_interval
+        self._entries: "OrderedDict[str, tuple[float, Optional[str]]]" = OrderedDict()
+        self._sequence = 0
+        self._active = False
+        self._hits = 0
+        self._lookups = 0
+        self._task: Optional[asyncio.Task[None]] = None
+        self._metrics = create_cache_metrics("redis_near_cache")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    @property
+    def hit_ratio(self) -> float:
+        return self._hits / self._lookups if self._lookups else 0.0
+
+    def accepts(self, key: str) -> bool:
+        """Кэшируем только ключи под отслеживаемыми префиксами — на остальные инвалидации не придут."""
+        return self._active and (not self._prefixes or key.startswith(self._prefixes))
+
+    def get(self, key: str) -> Any:
+        """Значение из памяти или ``_MISSING``; None — это закэшированное отсутствие ключа."""
+        self._lookups += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._metrics.record("hit")
+                return value
+            del self._entries[key]
+            self._metrics.record("eviction", reason="expired")
+        self._metrics.record("miss")
+        return _MISSING
+
+    def begin_read(self) -> int:
+        """Номер последней инвалидации до похода в Redis: если за время чтения что-то прилетело, ответ не кэшируем."""
+        return self._sequence
+
+    def put(self, key: str, value: Optional[str], sequence: int) -> None:
+        if not self._active or sequence != self._sequence:
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._metrics.record("eviction", reason="size")
+
+    def invalidate(self, keys: Optional[Sequence[str]]) -> None:
+        """Выкидываем ключи; None от сервера (FLUSHALL/FLUSHDB) означает «забудь всё»."""
+        self._sequence += 1
+        if keys is None:
+            self._entries.clear()
+            return
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self._metrics.record("eviction", reason="invalidated")
+
+    def start(self, pool: ConnectionPool) -> None:
+        """Запускаем фоновое слушание инвалидаций; кэш включится, как только tracking подтвердится."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(pool), name="sbs-redis-near-cache")
+
+    async def stop(self) -> None:
+        self._deactivate()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _deactivate(self) -> None:
+        self._active = False
+        self.invalidate(None)
+
+    def _make_connection(self, pool: ConnectionPool) -> AbstractConnection:
+        # Отдельные соединения вне пула: канал инвалидаций должен жить, пока жив кэш, и без socket_timeout.
+        kwargs = dict(pool.connection_kwargs)
+        kwargs["socket_timeout"] = None
+        kwargs["socket_keepalive"] = True
+        return pool.connection_class(**kwargs)
+
+    async def _run(self, pool: ConnectionPool) -> None:
+        delay = 0.5
+        while True:
+            listener = self._make_connection(pool)
+            tracker = self._make_connection(pool)
+            try:
+                await self._enable_tracking(listener, tracker)
+                delay = 0.5
+                await self._listen(listener, tracker)
+            except (RedisError, OSError) as exc:
+                logger.warning("Канал инвалидаций Redis оборвался, near-cache выключен: %r", exc)
+            finally:
+                self._deactivate()
+                await listener.disconnect(nowait=True)
+                await tracker.disconnect(nowait=True)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    async def _enable_tracking(self, listener: AbstractConnection, tracker: AbstractConnection) -> None:
+        await listener.connect()
+        await listener.send_command("CLIENT", "ID")
+        listener_id = await listener.read_response()
+        await listener.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+        await listener.read_response()
+
+        await tracker.connect()
+        args: list[Any] = ["CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST"]
+        for prefix in self._prefixes:
+            args.extend(["PREFIX", prefix])
+        await tracker.send_command(*args)
+        await tracker.read_response()
+
+        self._sequence += 1
+        self._active = True
+        logger.info("Near-cache Redis включён (префиксы: %s)", ", ".join(self._prefixes) or "все ключи")
+
+    async def _listen(self, listener: AbstractConnection, tracker: AbstractConnection) -> None:
+        while True:
+            message = await listener.read_response(timeout=self._ping_interval)
+            if message is None:
+                # Тишина в канале: убеждаемся, что соединение с tracking ещё живо, иначе инвалидации перестанут приходить.
+                await tracker.send_command("PING")
+                await tracker.read_response()
+                continue
+            if len(message) == 3 and message[0] == "message" and message[1] == INVALIDATE_CHANNEL:
+                self.invalidate(message[2])
+
+
+near_cache = NearCache()
+
+observe_gauge(
+    "redis_near_cache_hit_ratio",
+    "Share of get_value lookups served from the Redis near-cache.",
+    lambda: near_cache.hit_ratio,
+)
+observe_gauge(
+    "redis_near_cache_entries",
+    "Number of keys currently held in the Redis near-cache.",
+    lambda: float(len(near_cache)),
+)
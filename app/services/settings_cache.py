@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Generic, Iterable, Optional, TypeVar
+from uuid import uuid4
+
+from app.telemetry import CacheMetrics, create_cache_metrics
+
+SETTINGS_CACHE_MAX_SIZE = int(os.getenv("SETTINGS_CACHE_MAX_SIZE", "1024"))
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "60"))
+SETTINGS_CACHE_WARM = os.getenv("SETTINGS_CACHE_WARM", "true").lower() in ("1", "true", "yes")
+SETTINGS_INVALIDATION_SUBJECT = os.getenv(
+    "SETTINGS_INVALIDATION_SUBJECT", "sbs.settings.invalidate"
+)
+SETTINGS_INVALIDATION_TIMEOUT = float(os.getenv("SETTINGS_INVALIDATION_TIMEOUT", "0.5"))
+
+# Метка этой реплики в рассылке: своё же событие не выселяет только что записанное значение.
+INSTANCE_ID = uuid4().hex
+
+logger = logging.getLogger("sbs.settings_cache")
+
+T = TypeVar("T")
+
+
+class SettingsCache(Generic[T]):
+    """Маленький LRU-кэш с TTL: держим горячие настройки в памяти процесса и не ходим лишний раз в Postgres."""
+
+    def __init__(
+        self,
+        max_size: int = SETTINGS_CACHE_MAX_SIZE,
+        ttl: float = SETTINGS_CACHE_TTL,
+        metrics: Optional[CacheMetrics] = None,
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, T]]" = OrderedDict()
+        self._generation = 0
+        self._metrics = metrics
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[T]:
+        """Отдаём значение из памяти, если оно есть и ещё не протухло; иначе считаем промах."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._record("hit")
+                return value
+            del self._entries[key]
+            self._record("eviction", reason="expired")
+        self._record("miss")
+        return None
+
+    def begin_load(self) -> int:
+        """Запоминаем поколение кэша перед походом в БД, чтобы не положить значение, которое уже инвалидировали."""
+        return self._generation
+
+    def put(self, key: str, value: T, generation: Optional[int] = None) -> None:
+        """Кладём значение в кэш, вытесняя самые старые записи, если упёрлись в лимит."""
+        if self._max_size <= 0:
+            return
+        if generation is not None and generation != self._generation:
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._record("eviction", reason="size")
+
+    def warm(self, items: Iterable[tuple[str, T]]) -> int:
+        """Прогреваем кэш пачкой записей на старте; возвращаем, сколько реально положили."""
+        loaded = 0
+        for key, value in items:
+            if loaded >= self._max_size:
+                break
+            self.put(key, value)
+            loaded += 1
+        return loaded
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Выкидываем ключи из кэша и сдвигаем поколение, чтобы параллельные чтения их не вернули."""
+        self._generation += 1
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self._record("eviction", reason="invalidated")
+
+    def clear(self) -> None:
+        """Полностью очищаем кэш — например, когда потеряли связь с шиной инвалидаций."""
+        self._generation += 1
+        self._entries.clear()
+
+    def _record(self, event: str, reason: Optional[str] = None) -> None:
+        if self._metrics is None:
+            return
+        self._metrics.record(event, reason=reason)
+
+
+settings_cache: SettingsCache = SettingsCache(metrics=create_cache_metrics("system_settings"))
+
+
+def encode_invalidation(keys: Iterable[str]) -> bytes:
+    """Упаковываем список ключей и отправителя в компактный JSON для рассылки по NATS."""
+    return json.dumps({"origin": INSTANCE_ID, "keys": list(keys)}, separators=(",", ":")).encode("utf-8")
+
+
+def _parse_invalidation(payload: bytes) -> tuple[Optional[str], list[str]]:
+    try:
+        event = json.loads(payload.decode("utf-8"))
+        keys = event["keys"]
+        origin = event.get("origin")
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Некорректное событие инвалидации настроек: %r", payload[:128])
+        return None, []
+    if not isinstance(keys, list):
+        return None, []
+    return origin, [key for key in keys if isinstance(key, str)]
+
+
+def decode_invalidation(payload: bytes) -> list[str]:
+    """Разбираем событие инвалидации; битые сообщения просто игнорируем с предупреждением."""
+    return _parse_invalidation(payload)[1]
+
+
+async def handle_invalidation_message(msg) -> None:
+    """Колбэк NATS-подписки: выселяем из локального кэша ключи, которые поменяли на другой реплике."""
+    origin, keys = _parse_invalidation(msg.data)
+    if keys and origin != INSTANCE_ID:
+        settings_cache.invalidate(keys)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from app.telemetry import create_startup_histogram
+
+STARTUP_OPTIONAL_DEPENDENCIES = frozenset(
+    name.strip()
+    for name in os.getenv("STARTUP_OPTIONAL_DEPENDENCIES", "temporal,nats").split(",")
+    if name.strip()
+)
+STARTUP_REQUIRED_TIMEOUT = float(os.getenv("STARTUP_REQUIRED_TIMEOUT", "60"))
+STARTUP_ATTEMPT_TIMEOUT = float(os.getenv("STARTUP_ATTEMPT_TIMEOUT", "5"))
+STARTUP_BACKOFF_BASE = float(os.getenv("STARTUP_BACKOFF_BASE", "0.5"))
+STARTUP_BACKOFF_MAX = float(os.getenv("STARTUP_BACKOFF_MAX", "10"))
+
+logger = logging.getLogger("sbs.startup")
+
+
+class StartupError(RuntimeError):
+    """Обязательная зависимость не поднялась за отведённое на старт время."""
+
+
+@dataclass(slots=True)
+class StartupPhase:
+    name: str
+    connect: Callable[[], Awaitable[None]]
+    required: bool
+    attempt_timeout: float
+    attempts: int = 0
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+
+def attempt_timeout_for(name: str) -> float:
+    """Таймаут одной попытки: STARTUP_TIMEOUT_<ИМЯ> или общий STARTUP_ATTEMPT_TIMEOUT."""
+    return float(os.getenv(f"STARTUP_TIMEOUT_{name.upper()}", str(STARTUP_ATTEMPT_TIMEOUT)))
+
+
+class StartupCoordinator:
+    """Поднимаем зависимости параллельно: обязательные — с общим дедлайном и fail-fast, опциональные — в фоне.
+
+    Каждая попытка идёт под своим таймаутом, между попытками — экспоненциальная пауза с джиттером,
+    чтобы реплики после общего рестарта не ломились в зависимость синхронно. Время каждой фазы
+    пишем в лог и в гистограмму ``app_startup_phase_duration_seconds``.
+    """
+
+    def __init__(
+        self,
+        required_timeout: float = STARTUP_REQUIRED_TIMEOUT,
+        backoff_base: float = STARTUP_BACKOFF_BASE,
+        backoff_max: float = STARTUP_BACKOFF_MAX,
+        optional: frozenset[str] = STARTUP_OPTIONAL_DEPENDENCIES,
+    ) -> None:
+        self._required_timeout = required_timeout
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._optional = optional
+        self._phases: dict[str, StartupPhase] = {}
+        self._background: set[asyncio.Task[None]] = set()
+        self._histogram = create_startup_histogram()
+
+    def add(
+        self,
+        name: str,
+        connect: Callable[[], Awaitable[None]],
+        attempt_timeout: Optional[float] = None,
+    ) -> None:
+        """Регистрируем зависимость; обязательна она или нет, решает STARTUP_OPTIONAL_DEPENDENCIES."""
+        self._phases[name] = StartupPhase(
+            name=name,
+            connect=connect,
+            required=name not in self._optional,
+            attempt_timeout=attempt_timeout if attempt_timeout is not None else attempt_timeout_for(name),
+        )
+
+    @property
+    def phases(self) -> dict[str, StartupPhase]:
+        return self._phases
+
+    async def run(self) -> None:
+        """Возвращаемся, как только поднялся обязательный набор; опциональные продолжают подключаться в фоне."""
+        started = time.monotonic()
+        deadline = started + self._required_timeout
+        for phase in self._phases.values():
+            if not phase.required:
+                task = asyncio.create_task(self._connect(phase, None), name=f"sbs-startup-{phase.name}")
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+
+        required = [
+            asyncio.create_task(self._connect(phase, deadline), name=f"sbs-startup-{phase.name}")
+            for phase in self._phases.values()
+            if phase.required
+        ]
+        try:
+            await asyncio.gather(*required)
+        except BaseException:
+            # Fail-fast: одна обязательная зависимость не поднялась — остальные не ждём.
+            for task in required:
+                task.cancel()
+            await asyncio.gather(*required, return_exceptions=True)
+            await self.stop()
+            self._record("required", time.monotonic() - started, "failed")
+            raise
+
+        elapsed = time.monotonic() - started
+        self._record("required", elapsed, "ok")
+        logger.info(
+            "Обязательные зависимости готовы за %.2f с",
+            elapsed,
+            extra={
+                "startup_phases": {
+                    phase.name: {
+                        "required": phase.required,
+                        "attempts": phase.attempts,
+                        "duration_s": None if phase.duration is None else round(phase.duration, 3),
+                    }
+                    for phase in self._phases.values()
+                }
+            },
+        )
+
+    async def stop(self) -> None:
+        """Гасим фоновые подключения опциональных зависимостей (на shutdown или при провале старта)."""
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+
+    def _backoff(self, attempt: int) -> float:
+        # «Equal jitter»: половина паузы фиксирована, половина случайна — и разброс, и никаких нулевых пауз.
+        cap = min(self._backoff_base * 2 ** (attempt - 1), self._backoff_max)
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def _connect(self, phase: StartupPhase, deadline: Optional[float]) -> None:
+        started = time.monotonic()
+        while True:
+            phase.attempts += 1
+            timeout = phase.attempt_timeout
+            if deadline is not None:
+                timeout = max(min(timeout, deadline - time.monotonic()), 0.001)
+            try:
+                await asyncio.wait_for(phase.connect(), timeout=timeout)
+                break
+            except Exception as exc:
+                phase.error = repr(exc)
+                delay = self._backoff(phase.attempts)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._record(phase.name, time.monotonic() - started, "failed")
+                    logger.error(
+                        "Зависимость %s не поднялась за %d попыток: %r", phase.name, phase.attempts, exc
+                    )
+                    raise StartupError(f"{phase.name}: {exc!r}") from exc
+                logger.warning(
+                    "Зависимость %s недоступна (попытка %d): %r, повтор через %.1f с",
+                    phase.name,
+                    phase.attempts,
+                    exc,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+        phase.duration = time.monotonic() - started
+        phase.error = None
+        self._record(phase.name, phase.duration, "ok")
+        logger.info(
+            "Зависимость %s подключена за %.2f с (попыток: %d)", phase.name, phase.duration, phase.attempts
+        )
+
+    def _record(self, phase: str, duration: float, outcome: str) -> None:
+        self._histogram.record(duration, attributes={"startup.phase": phase, "startup.outcome": outcome})
@@ -1,16 +1,53 @@
 from __future__ import annotations
 
 import os
+import sys
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from typing import Callable, Optional, Sequence
 
 from fastapi import FastAPI, Request
-from opentelemetry import metrics
+from opentelemetry import metrics, trace
 from opentelemetry.exporter.prometheus import PrometheusMetricReader
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.redis import RedisInstrumentor
+from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
 from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
 from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from prometheus_client import REGISTRY, make_asgi_app
+from sqlalchemy.engine import Engine
+
+HTTP_DURATION_BUCKETS = tuple(
+    float(bound)
+    for bound in os.getenv(
+        "HTTP_DURATION_BUCKETS",
+        "0.005,0.01,0.025,0.05,0.075,0.1,0.25,0.5,0.75,1,2.5,5,7.5,10",
+    ).split(",")
+    if bound.strip()
+)
+
+# Свои имена, а не стандартные OTEL_TRACES_*: те же переменные читает opentelemetry-distro и допускает в них
+# списки вроде ``otlp,console``, а провайдеры здесь собирает само приложение.
+SBS_TRACES_EXPORTER = os.getenv("SBS_TRACES_EXPORTER", "none").lower()
+SBS_TRACES_FILE = os.getenv("SBS_TRACES_FILE", "")
+SBS_TRACES_SAMPLER_RATIO = float(os.getenv("SBS_TRACES_SAMPLER_RATIO", "1.0"))
+
+if SBS_TRACES_EXPORTER not in ("otlp", "console", "none"):
+    raise ValueError(
+        f"SBS_TRACES_EXPORTER must be 'otlp', 'console' or 'none', got {SBS_TRACES_EXPORTER!r}"
+    )
+
+_tracer_provider: Optional[TracerProvider] = None
+
+STARTUP_PHASE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+EVENT_LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Метка для запросов, не попавших ни в один маршрут (404 и сканеры): не даём им плодить серии по сырому пути.
+UNMATCHED_ROUTE = "unmatched"
 
 
 @dataclass(slots=True)
@@ -19,27 +56,221 @@ class _HttpMetrics:
     duration_histogram: metrics.Histogram
 
 
-def _build_meter_provider(service_name: str) -> tuple[MeterProvider, PrometheusMetricReader]:
-    resource = Resource.create(
+@dataclass(slots=True)
+class CacheMetrics:
+    cache_name: str
+    hits: metrics.Counter
+    misses: metrics.Counter
+    evictions: metrics.Counter
+
+    def record(self, event: str, reason: Optional[str] = None) -> None:
+        """Отмечаем попадание, промах или вытеснение в счётчиках конкретного кэша."""
+        attributes = {"cache.name": self.cache_name}
+        if event == "hit":
+            self.hits.add(1, attributes=attributes)
+        elif event == "miss":
+            self.misses.add(1, attributes=attributes)
+        elif event == "eviction":
+            if reason is not None:
+                attributes["cache.eviction_reason"] = reason
+            self.evictions.add(1, attributes=attributes)
+
+
+@lru_cache(maxsize=1)
+def _cache_counters() -> tuple[metrics.Counter, metrics.Counter, metrics.Counter]:
+    meter = metrics.get_meter("sbs.telemetry", version="0.1.0")
+    return (
+        meter.create_counter(
+            name="cache_hits_total",
+            unit="1",
+            description="Number of in-process cache hits.",
+        ),
+        meter.create_counter(
+            name="cache_misses_total",
+            unit="1",
+            description="Number of in-process cache misses.",
+        ),
+        meter.create_counter(
+            name="cache_evictions_total",
+            unit="1",
+            description="Number of entries evicted from an in-process cache.",
+        ),
+    )
+
+
+def create_cache_metrics(cache_name: str) -> CacheMetrics:
+    """Отдаём счётчики hit/miss/eviction для in-process кэша; все кэши делят одни инструменты и различаются атрибутом."""
+    hits, misses, evictions = _cache_counters()
+    return CacheMetrics(cache_name=cache_name, hits=hits, misses=misses, evictions=evictions)
+
+
+@dataclass(slots=True)
+class NatsMetrics:
+    dropped_messages: metrics.Counter
+    slow_consumer_events: metrics.Counter
+    flush_duration: metrics.Histogram
+
+
+@lru_cache(maxsize=1)
+def create_nats_metrics() -> NatsMetrics:
+    """Инструменты для клиента NATS; создаём один раз на процесс."""
+    meter = metrics.get_meter("sbs.telemetry", version="0.1.0")
+    return NatsMetrics(
+        dropped_messages=meter.create_counter(
+            name="nats_messages_dropped_total",
+            unit="1",
+            description="Messages dropped because a local NATS buffer was full.",
+        ),
+        slow_consumer_events=meter.create_counter(
+            name="nats_slow_consumer_events_total",
+            unit="1",
+            description="Slow consumer errors reported by the NATS client.",
+        ),
+        flush_duration=meter.create_histogram(
+            name="nats_flush_duration_seconds",
+            unit="s",
+            description="Round-trip time of NATS flush (PING/PONG) confirmations.",
+        ),
+    )
+
+
+@lru_cache(maxsize=1)
+def create_event_loop_lag_histogram() -> metrics.Histogram:
+    """Гистограмма задержки event loop: насколько позже запланированного просыпается таймер монитора."""
+    meter = metrics.get_meter("sbs.telemetry", version="0.1.0")
+    return meter.create_histogram(
+        name="event_loop_lag_seconds",
+        unit="s",
+        description="Delay between a scheduled event loop wake-up and the actual one.",
+    )
+
+
+@lru_cache(maxsize=1)
+def create_startup_histogram() -> metrics.Histogram:
+    """Длительность фаз старта: подключение каждой зависимости и готовность обязательного набора целиком."""
+    meter = metrics.get_meter("sbs.telemetry", version="0.1.0")
+    return meter.create_histogram(
+        name="app_startup_phase_duration_seconds",
+        unit="s",
+        description="Time spent in each application startup phase.",
+    )
+
+
+def observe_gauge(
+    name: str,
+    description: str,
+    callback: Callable[[], float],
+    unit: str = "1",
+) -> None:
+    """Регистрируем асинхронный gauge: значение снимается колбэком в момент скрейпа, без фоновых задач."""
+    meter = metrics.get_meter("sbs.telemetry", version="0.1.0")
+
+    def _observe(_options: metrics.CallbackOptions):
+        yield metrics.Observation(callback())
+
+    meter.create_observable_gauge(
+        name=name,
+        callbacks=[_observe],
+        unit=unit,
+        description=description,
+    )
+
+
+def _build_resource(service_name: str) -> Resource:
+    return Resource.create(
         {
             "service.name": service_name,
             "service.namespace": "sbs",
             "service.instance.id": os.getenv("HOSTNAME", "local"),
         }
     )
+
+
+def _build_meter_provider(service_name: str) -> tuple[MeterProvider, PrometheusMetricReader]:
+    resource = _build_resource(service_name)
     prometheus_reader = PrometheusMetricReader()
-    provider = MeterProvider(resource=resource, metric_readers=[prometheus_reader])
+    # Дефолтные бакеты OTel рассчитаны на миллисекунды (0..10000), а мы пишем секунды — задаём свои границы.
+    views = [
+        View(
+            instrument_name="http_server_request_duration_seconds",
+            aggregation=ExplicitBucketHistogramAggregation(boundaries=HTTP_DURATION_BUCKETS),
+        ),
+        View(
+            instrument_name="app_startup_phase_duration_seconds",
+            aggregation=ExplicitBucketHistogramAggregation(boundaries=STARTUP_PHASE_BUCKETS),
+        ),
+        View(
+            instrument_name="event_loop_lag_seconds",
+            aggregation=ExplicitBucketHistogramAggregation(boundaries=EVENT_LOOP_LAG_BUCKETS),
+        ),
+    ]
+    provider = MeterProvider(resource=resource, metric_readers=[prometheus_reader], views=views)
     return provider, prometheus_reader
 
 
-def configure_telemetry(app: FastAPI, service_name: Optional[str] = None) -> None:
-    """Включаем метрики через OpenTelemetry и отдаём их в Prometheus."""
+def _build_span_exporter() -> SpanExporter:
+    if SBS_TRACES_EXPORTER == "otlp":
+        # Импорт здесь: gRPC-экспортер тянет grpcio, а без OTLP он не нужен. Адрес — из OTEL_EXPORTER_OTLP_ENDPOINT.
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    out = open(SBS_TRACES_FILE, "a", encoding="utf-8") if SBS_TRACES_FILE else sys.stdout
+    return ConsoleSpanExporter(out=out)
+
+
+def configure_tracing(service_name: str, engines: Sequence[Engine] = ()) -> Optional[TracerProvider]:
+    """Поднимаем трейсинг: провайдер с ratio-сэмплингом, экспорт в OTLP или консоль/файл, клиенты Redis и SQLAlchemy.
+
+    Сэмплер parent-based: решение, принятое на входе в API, доезжает до worker'а через заголовки Temporal
+    и NATS, и трейс не рвётся посередине. При ``SBS_TRACES_EXPORTER=none`` ничего не делаем.
+    """
+    global _tracer_provider
+    if SBS_TRACES_EXPORTER == "none":
+        return None
+    if _tracer_provider is None:
+        _tracer_provider = TracerProvider(
+            resource=_build_resource(service_name),
+            sampler=ParentBased(TraceIdRatioBased(SBS_TRACES_SAMPLER_RATIO)),
+        )
+        _tracer_provider.add_span_processor(BatchSpanProcessor(_build_span_exporter()))
+        trace.set_tracer_provider(_tracer_provider)
+        RedisInstrumentor().instrument(tracer_provider=_tracer_provider)
+    if engines:
+        SQLAlchemyInstrumentor().instrument(
+            engines=list(engines),
+            tracer_provider=_tracer_provider,
+            enable_commenter=False,
+        )
+    return _tracer_provider
+
+
+def shutdown_tracing() -> None:
+    """Досылаем накопленные спаны перед выходом процесса."""
+    global _tracer_provider
+    if _tracer_provider is not None:
+        _tracer_provider.shutdown()
+        _tracer_provider = None
+
+
+def configure_telemetry(
+    app: FastAPI,
+    service_name: Optional[str] = None,
+    engines: Sequence[Engine] = (),
+) -> None:
+    """Включаем метрики через OpenTelemetry и отдаём их в Prometheus; трейсинг — если задан экспортёр."""
     resolved_service_name = service_name or os.getenv("OTEL_SERVICE_NAME", "sbs-api")
 
     provider, prometheus_reader = _build_meter_provider(resolved_service_name)
     metrics.set_meter_provider(provider)
+    configure_tracing(resolved_service_name, engines)
 
-    FastAPIInstrumentor().instrument_app(app, excluded_urls="/metrics")
+    # Инструментор оставляем ради трейсов, а метрики HTTP пишет только наш middleware: иначе каждый запрос
+    # измерялся бы дважды (http_server_duration от инструментора и http_server_request_duration_seconds).
+    FastAPIInstrumentor().instrument_app(
+        app,
+        excluded_urls="/metrics",
+        meter_provider=metrics.NoOpMeterProvider(),
+    )
 
     meter = metrics.get_meter("sbs.telemetry", version="0.1.0")
     http_metrics = _HttpMetrics(
@@ -65,6 +296,13 @@ def configure_telemetry(app: FastAPI, service_name: Optional[str] = None) -> Non
     }
 
 
+def route_template(request: Request) -> str:
+    """Шаблон маршрута (``/settings/{key}``) вместо сырого пути — кардинальность метрик не растёт с числом ключей."""
+    route = request.scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else UNMATCHED_ROUTE
+
+
 def record_http_request_metrics(
     request: Request,
     status_code: int,
@@ -79,7 +317,7 @@ def record_http_request_metrics(
     attributes = {
         "http.method": request.method,
         "http.status_code": str(status_code),
-        "http.route": request.url.path,
+        "http.route": route_template(request),
     }
     http_metrics.request_counter.add(1, attributes=attributes)
     http_metrics.duration_histogram.record(duration_seconds, attributes=attributes)
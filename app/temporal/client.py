@@ -1,46 +1,236 @@
 import asyncio
+import dataclasses
+import logging
 import os
-from typing import Optional
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, AsyncIterator, Callable, Optional, Sequence, Union
 
-from temporalio.client import Client
-from temporalio.service import RPCError
+from temporalio.client import (
+    CancelWorkflowInput,
+    Client,
+    DescribeWorkflowInput,
+    Interceptor,
+    OutboundInterceptor,
+    QueryWorkflowInput,
+    SignalWorkflowInput,
+    StartWorkflowInput,
+    StartWorkflowUpdateInput,
+    TerminateWorkflowInput,
+    WorkflowHandle,
+)
+from temporalio.contrib.opentelemetry import TracingInterceptor
+from temporalio.runtime import Runtime
+from temporalio.service import KeepAliveConfig, RetryConfig, RPCError
 
 TEMPORAL_HOST = os.getenv("TEMPORAL_HOST", "localhost")
 TEMPORAL_PORT = os.getenv("TEMPORAL_PORT", "7233")
 TEMPORAL_NAMESPACE = os.getenv("TEMPORAL_NAMESPACE", "default")
 
 TEMPORAL_ADDRESS = f"{TEMPORAL_HOST}:{TEMPORAL_PORT}"
+TEMPORAL_BATCH_START_CONCURRENCY = int(os.getenv("TEMPORAL_BATCH_START_CONCURRENCY", "64"))
+# Очередь, которую слушает worker; API стартует workflow в неё же.
+WORKER_TASK_QUEUE = os.getenv("WORKER_TASK_QUEUE", "test-task-queue")
+
+TEMPORAL_KEEPALIVE_INTERVAL = float(os.getenv("TEMPORAL_KEEPALIVE_INTERVAL", "30"))
+TEMPORAL_KEEPALIVE_TIMEOUT = float(os.getenv("TEMPORAL_KEEPALIVE_TIMEOUT", "15"))
+TEMPORAL_RPC_TIMEOUT = float(os.getenv("TEMPORAL_RPC_TIMEOUT", "10"))
+TEMPORAL_RPC_RETRY_INITIAL_INTERVAL = float(os.getenv("TEMPORAL_RPC_RETRY_INITIAL_INTERVAL", "0.1"))
+TEMPORAL_RPC_RETRY_MAX_INTERVAL = float(os.getenv("TEMPORAL_RPC_RETRY_MAX_INTERVAL", "5"))
+TEMPORAL_RPC_RETRY_MAX_ELAPSED = float(os.getenv("TEMPORAL_RPC_RETRY_MAX_ELAPSED", "10"))
+TEMPORAL_RPC_MAX_RETRIES = int(os.getenv("TEMPORAL_RPC_MAX_RETRIES", "10"))
+
+logger = logging.getLogger("sbs.temporal")
 
 _client: Optional[Client] = None
+_client_lock = asyncio.Lock()
+_runtime: Optional[Runtime] = None
+
+
+class TemporalConnectError(ConnectionError):
+    """Не удалось подключиться к Temporal: SDK сообщает об этом голым RuntimeError, отделяем его от прочих."""
+
+
+class _RpcTimeoutOutbound(OutboundInterceptor):
+    """Короткие unary-вызовы без явного rpc_timeout получают TEMPORAL_RPC_TIMEOUT.
+
+    Чтение истории (``handle.result()``) и листинги сюда не входят: это long-poll, который сервер
+    держит сам, и общий таймаут оборвал бы ожидание результата.
+    """
+
+    def __init__(self, next: OutboundInterceptor, rpc_timeout: timedelta) -> None:
+        super().__init__(next)
+        self._rpc_timeout = rpc_timeout
+
+    def _with_timeout(self, input: Any) -> Any:
+        if input.rpc_timeout is None:
+            return dataclasses.replace(input, rpc_timeout=self._rpc_timeout)
+        return input
+
+    async def start_workflow(self, input: StartWorkflowInput) -> WorkflowHandle[Any, Any]:
+        return await self.next.start_workflow(self._with_timeout(input))
+
+    async def signal_workflow(self, input: SignalWorkflowInput) -> None:
+        await self.next.signal_workflow(self._with_timeout(input))
+
+    async def query_workflow(self, input: QueryWorkflowInput) -> Any:
+        return await self.next.query_workflow(self._with_timeout(input))
+
+    async def describe_workflow(self, input: DescribeWorkflowInput) -> Any:
+        return await self.next.describe_workflow(self._with_timeout(input))
+
+    async def cancel_workflow(self, input: CancelWorkflowInput) -> None:
+        await self.next.cancel_workflow(self._with_timeout(input))
+
+    async def terminate_workflow(self, input: TerminateWorkflowInput) -> None:
+        await self.next.terminate_workflow(self._with_timeout(input))
+
+    async def start_workflow_update(self, input: StartWorkflowUpdateInput) -> Any:
+        return await self.next.start_workflow_update(self._with_timeout(input))
+
+
+class RpcTimeoutInterceptor(Interceptor):
+    def __init__(self, rpc_timeout: float = TEMPORAL_RPC_TIMEOUT) -> None:
+        self._rpc_timeout = timedelta(seconds=rpc_timeout)
 
+    def intercept_client(self, next: OutboundInterceptor) -> OutboundInterceptor:
+        return _RpcTimeoutOutbound(next, self._rpc_timeout)
 
-async def wait_for_temporal(attempts: int = 30, delay: float = 2.0) -> None:
+
+def configure_temporal_runtime(runtime: Optional[Runtime]) -> None:
+    """Runtime SDK для клиента процесса (у worker'а — с Prometheus-метриками); задаётся до первого подключения."""
+    global _runtime
+    if _client is not None:
+        raise RuntimeError("Temporal client is already connected, runtime must be configured before it")
+    _runtime = runtime
+
+
+async def _connect() -> Client:
+    try:
+        return await _connect_sdk()
+    except RuntimeError as exc:
+        if str(exc).startswith("Failed client connect"):
+            raise TemporalConnectError(str(exc)) from exc
+        raise
+
+
+async def _connect_sdk() -> Client:
+    return await Client.connect(
+        TEMPORAL_ADDRESS,
+        namespace=TEMPORAL_NAMESPACE,
+        # Контекст трейса уходит в заголовки Temporal: старт workflow, workflow и activity попадают в трейс запроса.
+        interceptors=[TracingInterceptor(), RpcTimeoutInterceptor()],
+        # Keepalive замечает полуоткрытое соединение (после рестарта frontend или балансировщика) без ожидания RPC.
+        keep_alive_config=KeepAliveConfig(
+            interval_millis=int(TEMPORAL_KEEPALIVE_INTERVAL * 1000),
+            timeout_millis=int(TEMPORAL_KEEPALIVE_TIMEOUT * 1000),
+        ),
+        retry_config=RetryConfig(
+            initial_interval_millis=int(TEMPORAL_RPC_RETRY_INITIAL_INTERVAL * 1000),
+            max_interval_millis=int(TEMPORAL_RPC_RETRY_MAX_INTERVAL * 1000),
+            max_elapsed_time_millis=int(TEMPORAL_RPC_RETRY_MAX_ELAPSED * 1000),
+            max_retries=TEMPORAL_RPC_MAX_RETRIES,
+        ),
+        runtime=_runtime,
+    )
+
+
+async def wait_for_temporal(attempts: int = 30, delay: float = 2.0) -> Client:
     """Дружелюбно стучимся к Temporal, пока он не ответит, делая паузы между подходами."""
-    for attempt in range(1, attempts + 1):
+    attempt = 1
+    while True:
         try:
-            await get_temporal_client()
-            return
-        except (RPCError, OSError, ConnectionRefusedError) as exc:
-            global _client
-            _client = None
-            if attempt == attempts:
-                raise exc
+            return await get_temporal_client()
+        except (RPCError, TemporalConnectError) as exc:
+            if attempt >= attempts:
+                raise
+            logger.warning("Temporal недоступен (попытка %d/%d): %r", attempt, attempts, exc)
+            attempt += 1
             await asyncio.sleep(delay)
 
 
 async def get_temporal_client() -> Client:
-    """Отдаём готовый Temporal-клиент, создавая подключение только один раз."""
+    """Один клиент на процесс: создаём лениво под локом, чтобы параллельные вызовы не открыли несколько каналов.
+
+    Неудачное подключение не кэшируется — следующий вызов попробует снова. Уже открытый канал
+    SDK переподключает сам, поэтому на ошибках отдельных RPC клиент не пересоздаём.
+    """
     global _client
     if _client is None:
-        _client = await Client.connect(
-            TEMPORAL_ADDRESS,
-            namespace=TEMPORAL_NAMESPACE,
-        )
+        async with _client_lock:
+            if _client is None:
+                _client = await _connect()
+                logger.info("Подключились к Temporal %s, namespace %s", TEMPORAL_ADDRESS, TEMPORAL_NAMESPACE)
     return _client
 
 
 async def close_temporal_client() -> None:
-    """Забываем кэшированный клиент, чтобы следующий запрос открыл свежий канал связи."""
+    """Отпускаем клиент процесса: следующий вызов get_temporal_client подключится заново.
+
+    Отдельного close() у клиента SDK нет — gRPC-канал принадлежит Rust-ядру и закрывается, когда
+    уходит последняя ссылка на клиент. Поэтому worker и API держат клиент только через этот модуль
+    и сбрасывают его на shutdown, после того как остановлено всё, что им пользуется.
+    """
     global _client
-    _client = None
+    async with _client_lock:
+        _client = None
+
+
+def started_new_run(handle: WorkflowHandle) -> bool:
+    """Создал ли start_workflow новый run, или при ``USE_EXISTING`` вернул уже идущий.
+
+    Признак ``started`` приходит в ответе StartWorkflowExecution, но публично SDK его не отдаёт.
+    """
+    response = getattr(handle, "_start_workflow_response", None)
+    return response is None or bool(getattr(response, "started", True))
+
+
+@dataclass(slots=True)
+class WorkflowStart:
+    workflow_id: str
+    args: Sequence[Any]
+
+
+async def start_workflows_concurrently(
+    workflow: Union[str, Callable[..., Any]],
+    starts: Sequence[WorkflowStart],
+    *,
+    task_queue: str,
+    concurrency: int = TEMPORAL_BATCH_START_CONCURRENCY,
+    **start_options: Any,
+) -> AsyncIterator[tuple[int, Union[WorkflowHandle, Exception]]]:
+    """Стартуем пачку workflow через общий клиент, держа в полёте не больше concurrency RPC.
+
+    Результаты отдаются по мере готовности парами ``(индекс, handle или исключение)``, поэтому
+    ответ можно стримить, не дожидаясь конца пачки. Если потребитель перестал читать, недостартовавшие
+    элементы отменяются.
+    """
+    client = await get_temporal_client()
+    results: "asyncio.Queue[tuple[int, Union[WorkflowHandle, Exception]]]" = asyncio.Queue(
+        maxsize=concurrency * 2
+    )
+    pending = iter(range(len(starts)))
+
+    async def submit() -> None:
+        for index in pending:
+            start = starts[index]
+            try:
+                outcome: Union[WorkflowHandle, Exception] = await client.start_workflow(
+                    workflow,
+                    args=start.args,
+                    id=start.workflow_id,
+                    task_queue=task_queue,
+                    **start_options,
+                )
+            except Exception as exc:
+                outcome = exc
+            await results.put((index, outcome))
 
+    workers = [asyncio.create_task(submit()) for _ in range(min(concurrency, len(starts)))]
+    try:
+        for _ in range(len(starts)):
+            yield await results.get()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,90 @@
+"""Interceptor'ы worker'а: свои метрики длительности и ошибок для activity и workflow.
+
+Модуль импортирует только stdlib и temporalio — workflow-часть исполняется внутри sandbox.
+"""
+
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Optional, Type
+
+from temporalio import activity, workflow
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    ExecuteWorkflowInput,
+    Interceptor,
+    WorkflowInboundInterceptor,
+    WorkflowInterceptorClassInput,
+)
+
+ACTIVITY_DURATION_METRIC = "sbs_activity_execution_duration"
+ACTIVITY_FAILURES_METRIC = "sbs_activity_execution_failures"
+WORKFLOW_DURATION_METRIC = "sbs_workflow_execution_duration"
+WORKFLOW_FAILURES_METRIC = "sbs_workflow_execution_failures"
+
+
+def _error_type(exc: BaseException) -> str:
+    return type(exc).__name__
+
+
+class _ActivityMetricsInterceptor(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        # Метр activity уже несёт namespace, task_queue и activity_type — добавляем только исход.
+        meter = activity.metric_meter()
+        duration = meter.create_histogram_timedelta(
+            ACTIVITY_DURATION_METRIC, "Wall time of a single activity attempt.", "duration"
+        )
+        started = time.monotonic()
+        outcome = "completed"
+        try:
+            return await self.next.execute_activity(input)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as exc:
+            outcome = "failed"
+            meter.create_counter(
+                ACTIVITY_FAILURES_METRIC, "Activity attempts that ended with an exception.", "1"
+            ).add(1, {"error_type": _error_type(exc)})
+            raise
+        finally:
+            duration.record(timedelta(seconds=time.monotonic() - started), {"outcome": outcome})
+
+
+class _WorkflowMetricsInterceptor(WorkflowInboundInterceptor):
+    async def execute_workflow(self, input: ExecuteWorkflowInput) -> Any:
+        # Время берём по часам истории, а не по monotonic, — так код остаётся детерминированным.
+        # При replay метр workflow ничего не пишет, так что после вытеснения из кэша дублей не будет.
+        try:
+            result = await self.next.execute_workflow(input)
+        except workflow.ContinueAsNewError:
+            self._record_duration("continued_as_new")
+            raise
+        except Exception as exc:
+            workflow.metric_meter().create_counter(
+                WORKFLOW_FAILURES_METRIC, "Workflow runs that ended with an exception.", "1"
+            ).add(1, {"error_type": _error_type(exc)})
+            self._record_duration("failed")
+            raise
+        self._record_duration("completed")
+        return result
+
+    @staticmethod
+    def _record_duration(outcome: str) -> None:
+        elapsed = max(workflow.now() - workflow.info().workflow_start_time, timedelta(0))
+        workflow.metric_meter().create_histogram_timedelta(
+            WORKFLOW_DURATION_METRIC, "Wall time of a workflow run from its start.", "duration"
+        ).record(elapsed, {"outcome": outcome})
+
+
+class WorkerMetricsInterceptor(Interceptor):
+    """Пишем длительность и ошибки каждой activity-попытки и каждого workflow run в метрики runtime."""
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ActivityMetricsInterceptor(next)
+
+    def workflow_interceptor_class(
+        self, input: WorkflowInterceptorClassInput
+    ) -> Optional[Type[WorkflowInboundInterceptor]]:
+        return _WorkflowMetricsInterceptor
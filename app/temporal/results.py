@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Optional, Sequence
+
+from redis.exceptions import RedisError
+from temporalio.client import WorkflowExecutionDescription, WorkflowExecutionStatus, WorkflowFailureError
+from temporalio.service import RPCError, RPCStatusCode
+
+from app.services.cache import CACHE_KEY_PREFIX, delete_values, get_value, mset_values
+from app.telemetry import create_cache_metrics
+from app.temporal.client import get_temporal_client
+
+WORKFLOW_RESULT_CACHE_TTL = float(os.getenv("WORKFLOW_RESULT_CACHE_TTL", str(24 * 3600)))
+WORKFLOW_RESULT_MAX_WAIT = float(os.getenv("WORKFLOW_RESULT_MAX_WAIT", "60"))
+WORKFLOW_RESULT_CACHE_PREFIX = f"{CACHE_KEY_PREFIX}workflow-result:"
+
+logger = logging.getLogger("sbs.workflow_results")
+
+_OPEN_STATUSES = frozenset(
+    status.name for status in (WorkflowExecutionStatus.RUNNING, WorkflowExecutionStatus.CONTINUED_AS_NEW)
+)
+
+_metrics = create_cache_metrics("workflow_results")
+
+
+class WorkflowNotFoundError(LookupError):
+    """Workflow с таким id в namespace нет."""
+
+
+@dataclass(slots=True)
+class WorkflowOutcome:
+    workflow_id: str
+    status: str
+    run_id: Optional[str] = None
+    workflow_type: Optional[str] = None
+    start_time: Optional[str] = None
+    close_time: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def is_closed(self) -> bool:
+        return self.status not in _OPEN_STATUSES
+
+
+@dataclass(slots=True)
+class _SharedWait:
+    task: asyncio.Task[WorkflowOutcome]
+    waiters: int = 0
+
+
+_waits: dict[str, _SharedWait] = {}
+
+
+def _cache_key(workflow_id: str) -> str:
+    return f"{WORKFLOW_RESULT_CACHE_PREFIX}{workflow_id}"
+
+
+def _from_description(description: WorkflowExecutionDescription) -> WorkflowOutcome:
+    return WorkflowOutcome(
+        workflow_id=description.id,
+        status=description.status.name if description.status is not None else "UNSPECIFIED",
+        run_id=description.run_id,
+        workflow_type=description.workflow_type,
+        start_time=description.start_time.isoformat() if description.start_time else None,
+        close_time=description.close_time.isoformat() if description.close_time else None,
+    )
+
+
+async def _read_cached(workflow_id: str) -> Optional[WorkflowOutcome]:
+    """Завершённый исход из Redis; недоступный Redis — не повод не ответить, идём в Temporal.
+
+    Запись живёт, пока id не перезапустят: старты через API сбрасывают её ``forget_workflow_results``,
+    перезапуск в обход API (CLI, другой сервис) увидим только по истечении ``WORKFLOW_RESULT_CACHE_TTL``.
+    """
+    key = _cache_key(workflow_id)
+    try:
+        raw = await get_value(key)
+    except (RedisError, OSError):
+        logger.warning("Redis недоступен при чтении результата %s", workflow_id, exc_info=True)
+        return None
+    if raw is None:
+        _metrics.record("miss")
+        return None
+    try:
+        cached = WorkflowOutcome(**json.loads(raw))
+    except (ValueError, TypeError):
+        # Битая запись или запись старой схемы: выбрасываем и читаем заново из Temporal.
+        logger.warning("Некорректный результат %s в кэше, сбрасываем", workflow_id)
+        _metrics.record("miss")
+        await forget_workflow_results([workflow_id])
+        return None
+    _metrics.record("hit")
+    return cached
+
+
+async def _store(outcome: WorkflowOutcome) -> None:
+    try:
+        payload = json.dumps(asdict(outcome), ensure_ascii=False)
+    except (TypeError, ValueError):
+        logger.warning("Результат %s не сериализуется в JSON, не кэшируем", outcome.workflow_id)
+        return
+    try:
+        await mset_values({_cache_key(outcome.workflow_id): payload}, ttl=WORKFLOW_RESULT_CACHE_TTL)
+    except (RedisError, OSError):
+        logger.warning("Не удалось сохранить результат %s в Redis", outcome.workflow_id, exc_info=True)
+
+
+async def forget_workflow_results(workflow_ids: Sequence[str]) -> None:
+    """Сбрасываем кэш результатов: id перезапущен, и закэшированный исход прошлого запуска больше не актуален."""
+    try:
+        await delete_values([_cache_key(workflow_id) for workflow_id in workflow_ids])
+    except (RedisError, OSError):
+        logger.warning("Не удалось сбросить кэш результатов %d workflow", len(workflow_ids), exc_info=True)
+
+
+async def _describe(workflow_id: str) -> WorkflowExecutionDescription:
+    client = await get_temporal_client()
+    try:
+        return await client.get_workflow_handle(workflow_id).describe()
+    except RPCError as exc:
+        if exc.status == RPCStatusCode.NOT_FOUND:
+            raise WorkflowNotFoundError(workflow_id) from None
+        raise
+
+
+async def _fetch_outcome(workflow_id: str) -> WorkflowOutcome:
+    """Long-poll истории через ``handle.result()`` до закрытия workflow (с переходом по continue-as-new)."""
+    client = await get_temporal_client()
+    handle = client.get_workflow_handle(workflow_id)
+    result: Any = None
+    error: Optional[str] = None
+    try:
+        result = await handle.result()
+    except WorkflowFailureError as exc:
+        error = str(exc.cause or exc)
+    except RPCError as exc:
+        if exc.status == RPCStatusCode.NOT_FOUND:
+            raise WorkflowNotFoundError(workflow_id) from None
+        raise
+    # Точный статус закрытия (FAILED, CANCELED, TERMINATED, TIMED_OUT), run id и время берём из describe.
+    outcome = _from_description(await _describe(workflow_id))
+    outcome.result = result
+    outcome.error = error
+    # Между result() и describe id мог быть перезапущен — открытый запуск в кэш не кладём.
+    if outcome.is_closed:
+        await _store(outcome)
+    return outcome
+
+
+def _shared_wait(workflow_id: str) -> _SharedWait:
+    shared = _waits.get(workflow_id)
+    if shared is None:
+        task = asyncio.create_task(_fetch_outcome(workflow_id), name=f"sbs-workflow-result-{workflow_id}")
+        shared = _SharedWait(task)
+        _waits[workflow_id] = shared
+
+        def forget(done: asyncio.Task[WorkflowOutcome]) -> None:
+            if _waits.get(workflow_id) is shared:
+                del _waits[workflow_id]
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(forget)
+    return shared
+
+
+async def wait_for_result(workflow_id: str, timeout: float) -> Optional[WorkflowOutcome]:
+    """Ждём исход не дольше timeout; None — workflow ещё идёт.
+
+    Все ожидающие одного workflow в процессе делят один long-poll к Temporal. Когда уходит последний
+    из них (таймаут или разрыв соединения клиента), long-poll отменяется, чтобы не висеть на
+    workflow, результат которого больше никто не ждёт.
+    """
+    cached = await _read_cached(workflow_id)
+    if cached is not None:
+        return cached
+    return await _wait_shared(workflow_id, timeout)
+
+
+async def _wait_shared(workflow_id: str, timeout: float) -> Optional[WorkflowOutcome]:
+    shared = _shared_wait(workflow_id)
+    shared.waiters += 1
+    try:
+        return await asyncio.wait_for(asyncio.shield(shared.task), timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        shared.waiters -= 1
+        if shared.waiters == 0 and not shared.task.done():
+            # Убираем из реестра сразу: отмена доедет до задачи позже, а новый ожидающий не должен к ней прицепиться.
+            if _waits.get(workflow_id) is shared:
+                del _waits[workflow_id]
+            shared.task.cancel()
+
+
+async def workflow_status(workflow_id: str) -> WorkflowOutcome:
+    """Закрытый workflow — из кэша без обращения к Temporal; иначе статус одним describe."""
+    cached = await _read_cached(workflow_id)
+    if cached is not None:
+        return cached
+    outcome = _from_description(await _describe(workflow_id))
+    if outcome.is_closed:
+        # Workflow уже закрыт: результат читается одним запросом истории, после этого идёт из кэша.
+        closed = await _wait_shared(workflow_id, timeout=WORKFLOW_RESULT_MAX_WAIT)
+        if closed is not None:
+            return closed
+    return outcome
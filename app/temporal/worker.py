@@ -1,32 +1,185 @@
 import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
 from temporalio.client import Client
-from temporalio.worker import Worker
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.worker import (
+    PollerBehavior,
+    PollerBehaviorAutoscaling,
+    PollerBehaviorSimpleMaximum,
+    SharedStateManager,
+    Worker,
+)
 
-from app.temporal.client import TEMPORAL_ADDRESS, TEMPORAL_NAMESPACE, wait_for_temporal
+from app.logging_config import configure_logging
+from app.telemetry import configure_tracing, shutdown_tracing
+from app.temporal.client import (
+    TEMPORAL_ADDRESS,
+    TEMPORAL_NAMESPACE,
+    WORKER_TASK_QUEUE,
+    close_temporal_client,
+    configure_temporal_runtime,
+    wait_for_temporal,
+)
+from app.temporal.interceptors import (
+    ACTIVITY_DURATION_METRIC,
+    WORKFLOW_DURATION_METRIC,
+    WorkerMetricsInterceptor,
+)
+from app.workflows.batch_workflow import BatchPartitionWorkflow, BatchWorkflow
 from app.workflows.test_workflow import TestWorkflow
+from app.activities.batch_activity import process_batch_partition
 from app.activities.test_activity import sample_activity
 
 
+def _optional_int(name: str) -> Optional[int]:
+    """Читаем целое из окружения; пустое значение оставляет дефолт SDK."""
+    raw = os.getenv(name, "").strip()
+    return int(raw) if raw else None
+
+
+WORKER_MAX_CONCURRENT_ACTIVITIES = _optional_int("WORKER_MAX_CONCURRENT_ACTIVITIES")
+WORKER_MAX_CONCURRENT_WORKFLOW_TASKS = _optional_int("WORKER_MAX_CONCURRENT_WORKFLOW_TASKS")
+WORKER_MAX_CACHED_WORKFLOWS = int(os.getenv("WORKER_MAX_CACHED_WORKFLOWS", "1000"))
+WORKER_WORKFLOW_TASK_POLLERS = int(os.getenv("WORKER_WORKFLOW_TASK_POLLERS", "5"))
+WORKER_ACTIVITY_TASK_POLLERS = int(os.getenv("WORKER_ACTIVITY_TASK_POLLERS", "5"))
+WORKER_POLLER_AUTOSCALING = os.getenv("WORKER_POLLER_AUTOSCALING", "false").lower() in ("1", "true", "yes")
+WORKER_ACTIVITY_EXECUTOR = os.getenv("WORKER_ACTIVITY_EXECUTOR", "async")
+WORKER_ACTIVITY_EXECUTOR_WORKERS = _optional_int("WORKER_ACTIVITY_EXECUTOR_WORKERS")
+WORKER_GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+WORKER_METRICS_ENABLED = os.getenv("WORKER_METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+WORKER_METRICS_HOST = os.getenv("WORKER_METRICS_HOST", "0.0.0.0")
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9464"))
+SERVICE_NAME = os.getenv("SERVICE_NAME", "sbs-worker")
+
+# Бакеты в секундах: schedule-to-start и короткие activity живут в миллисекундах, workflow — в минутах.
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+WORKFLOW_DURATION_BUCKETS = [0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 3600]
+
+if WORKER_ACTIVITY_EXECUTOR not in ("async", "thread", "process"):
+    raise ValueError(
+        f"WORKER_ACTIVITY_EXECUTOR must be 'async', 'thread' or 'process', got {WORKER_ACTIVITY_EXECUTOR!r}"
+    )
+
+
+def _poller_behavior(maximum: int) -> PollerBehavior:
+    """Фиксированное число поллеров или автоскейлинг до того же максимума."""
+    if WORKER_POLLER_AUTOSCALING:
+        return PollerBehaviorAutoscaling(maximum=maximum)
+    return PollerBehaviorSimpleMaximum(maximum=maximum)
+
+
+def build_activity_executor() -> tuple[Optional[Executor], Optional[SharedStateManager]]:
+    """Подбираем исполнителя для sync-activity: async-activity крутятся в event loop и его не используют.
+
+    Пул процессов нужен для CPU-bound activity; для него SDK требует SharedStateManager, чтобы
+    heartbeat'ы и отмена доходили до дочерних процессов.
+    """
+    if WORKER_ACTIVITY_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=WORKER_ACTIVITY_EXECUTOR_WORKERS), None
+    if WORKER_ACTIVITY_EXECUTOR == "process":
+        executor = ProcessPoolExecutor(
+            max_workers=WORKER_ACTIVITY_EXECUTOR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        manager = SharedStateManager.create_from_multiprocessing(multiprocessing.Manager())
+        return executor, manager
+    return None, None
+
+
+def build_runtime() -> Optional[Runtime]:
+    """Runtime SDK с Prometheus-эндпоинтом: отсюда забираем метрики ядра (слоты, поллеры, schedule-to-start) и свои.
+
+    Под супервизором каждый процесс слушает свой порт: WORKER_METRICS_PORT + номер слота.
+    """
+    if not WORKER_METRICS_ENABLED:
+        return None
+    port = WORKER_METRICS_PORT + int(os.getenv("WORKER_SLOT", "0"))
+    return Runtime(
+        telemetry=TelemetryConfig(
+            metrics=PrometheusConfig(
+                bind_address=f"{WORKER_METRICS_HOST}:{port}",
+                durations_as_seconds=True,
+                histogram_bucket_overrides={
+                    "temporal_activity_schedule_to_start_latency": LATENCY_BUCKETS,
+                    "temporal_workflow_task_schedule_to_start_latency": LATENCY_BUCKETS,
+                    "temporal_activity_execution_latency": LATENCY_BUCKETS,
+                    "temporal_workflow_task_execution_latency": LATENCY_BUCKETS,
+                    ACTIVITY_DURATION_METRIC: LATENCY_BUCKETS,
+                    WORKFLOW_DURATION_METRIC: WORKFLOW_DURATION_BUCKETS,
+                },
+            ),
+            global_tags={"service_name": SERVICE_NAME},
+            attach_service_name=False,
+        )
+    )
+
+
+def build_worker(
+    client: Client,
+    activity_executor: Optional[Executor] = None,
+    shared_state_manager: Optional[SharedStateManager] = None,
+) -> Worker:
+    """Собираем Worker с лимитами конкурентности, поллерами и sticky-кэшем из окружения."""
+    return Worker(
+        client,
+        task_queue=WORKER_TASK_QUEUE,
+        workflows=[TestWorkflow, BatchWorkflow, BatchPartitionWorkflow],
+        activities=[sample_activity, process_batch_partition],
+        activity_executor=activity_executor,
+        shared_state_manager=shared_state_manager,
+        max_concurrent_activities=WORKER_MAX_CONCURRENT_ACTIVITIES,
+        max_concurrent_workflow_tasks=WORKER_MAX_CONCURRENT_WORKFLOW_TASKS,
+        max_cached_workflows=WORKER_MAX_CACHED_WORKFLOWS,
+        workflow_task_poller_behavior=_poller_behavior(WORKER_WORKFLOW_TASK_POLLERS),
+        activity_task_poller_behavior=_poller_behavior(WORKER_ACTIVITY_TASK_POLLERS),
+        graceful_shutdown_timeout=timedelta(seconds=WORKER_GRACEFUL_SHUTDOWN_TIMEOUT),
+        interceptors=[WorkerMetricsInterceptor()],
+    )
+
+
 async def run_worker():
     """Поднимаем worker, рассказываем ему про очередь и спокойно ждём входящих задач."""
+    configure_logging(SERVICE_NAME)
+    configure_tracing(SERVICE_NAME)
+    # Один клиент на процесс: runtime с Prometheus-эндпоинтом задаём до подключения, и worker работает
+    # через тот же канал, которым wait_for_temporal проверял связь. TracingInterceptor клиента worker
+    # подхватывает сам: спаны workflow и activity продолжают трейс стартера.
+    configure_temporal_runtime(build_runtime())
     print(f"Ожидание подключения к Temporal на {TEMPORAL_ADDRESS}...")
-    await wait_for_temporal()
+    client = await wait_for_temporal()
     print(f"Подключение к Temporal установлено, namespace: {TEMPORAL_NAMESPACE}")
-    
-    client = await Client.connect(TEMPORAL_ADDRESS, namespace=TEMPORAL_NAMESPACE)
-    
-    worker = Worker(
-        client,
-        task_queue="test-task-queue",
-        workflows=[TestWorkflow],
-        activities=[sample_activity],
+
+    activity_executor, shared_state_manager = build_activity_executor()
+    worker = build_worker(client, activity_executor, shared_state_manager)
+
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop_requested.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    print(
+        f"Temporal Worker запущен (очередь {WORKER_TASK_QUEUE}, executor {WORKER_ACTIVITY_EXECUTOR}), ожидание задач..."
     )
-    
-    print("Temporal Worker запущен, ожидание задач...")
-    
-    await worker.run()
+
+    try:
+        async with worker:
+            await stop_requested.wait()
+        print("Temporal Worker остановлен, незавершённые задачи доработаны.")
+    finally:
+        if activity_executor is not None:
+            activity_executor.shutdown(wait=False, cancel_futures=True)
+        await close_temporal_client()
+        shutdown_tracing()
 
 
 if __name__ == "__main__":
     asyncio.run(run_worker())
-
@@ -0,0 +1,142 @@
+import asyncio
+import dataclasses
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ApplicationError, ChildWorkflowError
+
+with workflow.unsafe.imports_passed_through():
+    from app.activities.batch_activity import PartitionInput, process_batch_partition
+
+PARTITION_HEARTBEAT_TIMEOUT = timedelta(seconds=30)
+PARTITION_START_TO_CLOSE_TIMEOUT = timedelta(hours=1)
+
+
+@dataclass(slots=True)
+class BatchSummary:
+    processed_items: int = 0
+    completed_partitions: int = 0
+    failed_partitions: int = 0
+    runs: int = 1
+
+
+@dataclass(slots=True)
+class BatchJobInput:
+    job_id: str
+    # Имя обработчика партиций, зарегистрированного на worker'е через ``register_partition_handler``.
+    handler: str
+    total_items: int
+    partition_size: int = 1000
+    max_parallel: int = 20
+    # Сколько партиций запускать в одном run до continue-as-new: на партицию в истории родителя ~5 событий,
+    # 500 партиций держат историю далеко от лимитов Temporal (50k событий / 50 МБ) даже для миллиона элементов.
+    partitions_per_run: int = 500
+    next_offset: int = 0
+    summary: BatchSummary = field(default_factory=BatchSummary)
+
+
+def _validate_job(job: BatchJobInput) -> None:
+    """Отсекаем параметры, на которых цикл батча не двигается: без этого run уходит в бесконечный
+    continue-as-new или валит workflow task на каждом ретрае."""
+    for name in ("partition_size", "max_parallel", "partitions_per_run"):
+        if getattr(job, name) <= 0:
+            raise ApplicationError(
+                f"{name} must be positive, got {getattr(job, name)}", type="InvalidBatchInput", non_retryable=True
+            )
+    if job.total_items < 0 or job.next_offset < 0:
+        raise ApplicationError(
+            f"total_items and next_offset must not be negative, got {job.total_items} and {job.next_offset}",
+            type="InvalidBatchInput",
+            non_retryable=True,
+        )
+
+
+@workflow.defn(name="BatchPartitionWorkflow")
+class BatchPartitionWorkflow:
+    """Дочерний workflow на одну партицию: своя история, свой retry и heartbeat activity."""
+
+    @workflow.run
+    async def run(self, partition: PartitionInput) -> int:
+        return await workflow.execute_activity(
+            process_batch_partition,
+            partition,
+            start_to_close_timeout=PARTITION_START_TO_CLOSE_TIMEOUT,
+            heartbeat_timeout=PARTITION_HEARTBEAT_TIMEOUT,
+            retry_policy=RetryPolicy(maximum_attempts=5),
+        )
+
+
+@workflow.defn(name="BatchWorkflow")
+class BatchWorkflow:
+    """Шаблон fan-out/fan-in: режем [0, total_items) на партиции, гоняем их дочерними workflow окном
+    не шире max_parallel, собираем итог и через continue-as-new держим историю короткой."""
+
+    def __init__(self) -> None:
+        self._summary = BatchSummary()
+        self._offset = 0
+
+    @workflow.query
+    def progress(self) -> BatchSummary:
+        """Итог на текущий момент, с учётом предыдущих run'ов."""
+        return self._summary
+
+    @workflow.run
+    async def run(self, job: BatchJobInput) -> BatchSummary:
+        _validate_job(job)
+        self._summary = job.summary
+        self._offset = job.next_offset
+        pending: set[asyncio.Task[Optional[int]]] = set()
+        started = 0
+
+        while self._offset < job.total_items:
+            if started >= job.partitions_per_run or workflow.info().is_continue_as_new_suggested():
+                break
+            if len(pending) >= job.max_parallel:
+                await self._collect(pending, asyncio.FIRST_COMPLETED)
+                continue
+            end = min(self._offset + job.partition_size, job.total_items)
+            pending.add(asyncio.create_task(self._run_partition(job, self._offset, end)))
+            self._offset = end
+            started += 1
+
+        # Перед continue-as-new дожидаемся всех детей: новый run не должен наследовать незавершённые партиции.
+        while pending:
+            await self._collect(pending, asyncio.ALL_COMPLETED)
+
+        if self._offset < job.total_items:
+            workflow.logger.info(f"Батч {job.job_id}: обработано до {self._offset} из {job.total_items}, continue-as-new")
+            workflow.continue_as_new(
+                dataclasses.replace(
+                    job,
+                    next_offset=self._offset,
+                    summary=dataclasses.replace(self._summary, runs=self._summary.runs + 1),
+                )
+            )
+        workflow.logger.info(f"Батч {job.job_id} завершён: {self._summary}")
+        return self._summary
+
+    async def _run_partition(self, job: BatchJobInput, start: int, end: int) -> Optional[int]:
+        try:
+            return await workflow.execute_child_workflow(
+                BatchPartitionWorkflow.run,
+                PartitionInput(job_id=job.job_id, handler=job.handler, start=start, end=end),
+                id=f"{workflow.info().workflow_id}/partition-{start}",
+            )
+        except ChildWorkflowError as exc:
+            # Упавшая партиция не валит весь батч: считаем её и идём дальше, детали — в истории ребёнка.
+            workflow.logger.warning(f"Партиция [{start}, {end}) батча {job.job_id} упала: {exc.cause!r}")
+            return None
+
+    async def _collect(self, pending: set[asyncio.Task[Optional[int]]], return_when: str) -> None:
+        done, _ = await workflow.wait(pending, return_when=return_when)
+        pending.difference_update(done)
+        for task in done:
+            processed = task.result()
+            if processed is None:
+                self._summary.failed_partitions += 1
+            else:
+                self._summary.processed_items += processed
+                self._summary.completed_partitions += 1
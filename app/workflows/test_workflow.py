@@ -2,6 +2,10 @@ from datetime import timedelta
 
 from temporalio import workflow
 from temporalio.common import RetryPolicy
+from temporalio.workflow import ActivityCancellationType
+
+# Без heartbeat'а за это время считаем worker мёртвым и перезапускаем activity с последнего чекпоинта.
+SAMPLE_HEARTBEAT_TIMEOUT = timedelta(seconds=10)
 
 
 @workflow.defn(name="TestWorkflow")
@@ -18,6 +22,8 @@ class TestWorkflow:
             sample_activity,
             name,
             start_to_close_timeout=timedelta(seconds=60),
+            heartbeat_timeout=SAMPLE_HEARTBEAT_TIMEOUT,
+            cancellation_type=ActivityCancellationType.WAIT_CANCELLATION_COMPLETED,
             retry_policy=RetryPolicy(maximum_attempts=3),
         )
         
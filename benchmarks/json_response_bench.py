@@ -0,0 +1,137 @@
+"""Сколько CPU уходит на отдачу JSON: прежний ``JSONResponse``, ``FastJSONResponse`` и сжатие поверх него.
+
+Запросы подаются прямо в ASGI-приложение без сокетов, обработчик отдаёт заранее собранный
+``SystemSettingListResponse`` — в цифрах только сериализация и обвязка FastAPI вокруг неё.
+Варианты:
+
+* ``json`` — как было: ``JSONResponse``, модель проходит через dict и ``json.dumps``;
+* ``fast`` — ``FastJSONResponse`` как ``default_response_class``, обработчик по-прежнему возвращает модель;
+* ``direct`` — обработчик сам возвращает ``FastJSONResponse(model)``, FastAPI модель не трогает;
+* ``direct+gzip`` / ``direct+br`` — то же за ``CompressionMiddleware``.
+
+    python -m benchmarks.json_response_bench --requests 2000 --sizes 1 100 500
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp
+
+from app.api.main import SystemSettingListResponse, SystemSettingResponse
+from app.api.middleware import CompressionMiddleware, brotli
+from app.api.responses import FastJSONResponse
+
+VARIANTS = ("json", "fast", "direct", "direct+gzip", "direct+br")
+
+
+def build_payload(size: int) -> SystemSettingListResponse:
+    now = datetime.now(timezone.utc)
+    return SystemSettingListResponse(
+        items=[
+            SystemSettingResponse(
+                key=f"bench.setting.{index:05d}",
+                value=f"значение-{index}",
+                description="настройка для замера сериализации",
+                created_at=now,
+                updated_at=now,
+            )
+            for index in range(size)
+        ],
+        next_cursor=f"bench.setting.{size:05d}",
+    )
+
+
+def build_app(variant: str, payload: SystemSettingListResponse) -> ASGIApp:
+    if variant == "json":
+        bench_app = FastAPI(default_response_class=JSONResponse)
+    else:
+        bench_app = FastAPI(default_response_class=FastJSONResponse)
+
+    if variant.startswith("direct"):
+        @bench_app.get("/settings", response_model=SystemSettingListResponse)
+        async def direct_settings():
+            return FastJSONResponse(payload)
+    else:
+        @bench_app.get("/settings", response_model=SystemSettingListResponse)
+        async def settings():
+            return payload
+
+    if variant.endswith(("+gzip", "+br")):
+        return CompressionMiddleware(bench_app, minimum_size=1024)
+    return bench_app
+
+
+async def call(app: ASGIApp, accept_encoding: str) -> int:
+    """Один GET напрямую в ASGI; возвращаем размер тела ответа."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/settings",
+        "raw_path": b"/settings",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding.encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message) -> None:
+        nonlocal size
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"/settings answered {message['status']}")
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+async def measure(app: ASGIApp, accept_encoding: str, requests: int) -> tuple[float, int]:
+    """CPU процесса на один ответ (мкс) и размер тела; запросы идут подряд, без конкуренции."""
+    size = 0
+    started = time.process_time()
+    for _ in range(requests):
+        size = await call(app, accept_encoding)
+    return (time.process_time() - started) / requests * 1e6, size
+
+
+async def run(sizes: list[int], requests: int, rounds: int) -> None:
+    variants = [variant for variant in VARIANTS if brotli is not None or not variant.endswith("+br")]
+    print(f"{'items':>6} {'variant':<12} {'cpu us/resp':>12} {'bytes':>9}")
+    for size in sizes:
+        payload = build_payload(size)
+        apps = {variant: build_app(variant, payload) for variant in variants}
+        encodings = {variant: variant.partition("+")[2] for variant in variants}
+        for variant, app in apps.items():
+            await measure(app, encodings[variant], max(requests // 10, 1))
+
+        results: dict[str, list[float]] = {variant: [] for variant in variants}
+        sizes_out: dict[str, int] = {}
+        # Чередуем варианты по раундам, чтобы прогрев и фон машины не играли за одного из них.
+        for _ in range(rounds):
+            for variant, app in apps.items():
+                cpu_us, sizes_out[variant] = await measure(app, encodings[variant], requests)
+                results[variant].append(cpu_us)
+        for variant, samples in results.items():
+            print(f"{size:>6} {variant:<12} {statistics.median(samples):>12.1f} {sizes_out[variant]:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Стоимость сериализации и сжатия JSON-ответов")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 500], help="настроек в ответе")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на один замер")
+    parser.add_argument("--rounds", type=int, default=3, help="повторов каждого замера, берём медиану")
+    arguments = parser.parse_args()
+    asyncio.run(run(arguments.sizes, arguments.requests, arguments.rounds))
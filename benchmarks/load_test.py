@@ -0,0 +1,337 @@
+"""Нагрузочный прогон API: пропускная способность и p50/p95/p99 по основным маршрутам с отчётом в JSON.
+
+API поднимается прямо в процессе (``app.api.main`` со своим startup/shutdown) и ходит в зависимости
+из переменных окружения — локальные Postgres/Redis/NATS/Temporal из ``docker-compose up -d db redis nats temporal``.
+Любую из них можно заменить подменой в памяти (``--stand-in``, см. ``benchmarks/standins.py``), а с ``--url``
+нагрузка идёт по HTTP в уже запущенный экземпляр. Отчёт сравнивается с сохранённым baseline: падение
+req/s или рост p95/p99 больше порога — регрессия и ненулевой код выхода.
+
+    python -m benchmarks.load_test run --stand-in all --concurrency 32 --duration 5 --rounds 3 --output bench.json
+    python -m benchmarks.load_test run --stand-in all --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.load_test compare bench.json benchmarks/baseline.json --threshold 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import AsyncExitStack, nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+from uuid import uuid4
+
+import httpx
+
+from benchmarks.standins import BENCH_SETTING_KEY, STAND_INS
+
+DEFAULT_THRESHOLD = 0.2
+# Рост задержки меньше этого не считаем регрессией: у маршрутов с субмиллисекундным p99 +20% — это шум GC и планировщика.
+LATENCY_NOISE_FLOOR_MS = 1.0
+DEPENDENCIES_TIMEOUT = 30.0
+
+
+@dataclass(slots=True)
+class Scenario:
+    name: str
+    method: str
+    path: str
+    body: Optional[Callable[[int], dict[str, Any]]] = None
+
+
+_RUN_ID = uuid4().hex[:8]
+
+SCENARIOS: dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("health", "GET", "/health"),
+        Scenario("settings", "GET", f"/settings/{BENCH_SETTING_KEY}"),
+        Scenario("redis", "POST", "/redis/test", lambda n: {"key": f"bench:{n % 1024}", "value": str(n)}),
+        Scenario("nats", "POST", "/nats/test", lambda n: {"message": f"bench-{n}"}),
+        # id workflow строится из имени, поэтому имена уникальны в пределах запуска — иначе Temporal ответит конфликтом.
+        Scenario("workflow", "POST", "/test-workflow", lambda n: {"name": f"bench-{_RUN_ID}-{n}"}),
+    )
+}
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу из уже отсортированного списка."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(math.ceil(q * len(ordered)) - 1, 0))]
+
+
+async def measure(
+    client: httpx.AsyncClient, scenario: Scenario, duration: float, concurrency: int
+) -> dict[str, Any]:
+    """Закрытый цикл: concurrency воркеров шлют запрос за запросом duration секунд."""
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    counter = iter(range(sys.maxsize))
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            # Маршрут без настоящего I/O в процессе отрабатывает, ни разу не отдав управление loop'у: без явной
+            # уступки один воркер крутился бы весь замер, а фоновые задачи API (health-пробер) стояли бы.
+            await asyncio.sleep(0)
+            body = scenario.body(next(counter)) if scenario.body is not None else None
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, scenario.path, json=body)
+            except httpx.HTTPError as exc:
+                outcome = type(exc).__name__
+            else:
+                if response.is_success:
+                    latencies.append(time.perf_counter() - started)
+                    continue
+                outcome = str(response.status_code)
+            errors[outcome] = errors.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies) + sum(errors.values()),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 3)
+            for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+    }
+
+
+async def _wait_for_dependencies(client: httpx.AsyncClient) -> None:
+    """Опциональные зависимости подключаются в фоне — ждём, пока пробер увидит их здоровыми, чтобы не мерить ошибки старта."""
+    deadline = time.monotonic() + DEPENDENCIES_TIMEOUT
+    while True:
+        dependencies = (await client.get("/health/deps")).json()["dependencies"]
+        unhealthy = sorted(name for name, status in dependencies.items() if not status["healthy"])
+        if not unhealthy:
+            return
+        if time.monotonic() >= deadline:
+            print(f"warning: не дождались зависимостей {', '.join(unhealthy)}", file=sys.stderr)
+            return
+        await asyncio.sleep(0.5)
+
+
+async def _prepare(client: httpx.AsyncClient, stand_ins: frozenset[str]) -> dict[str, Any]:
+    """Ключ для ``/settings/{key}`` и версия сборки — для отчёта."""
+    await _wait_for_dependencies(client)
+    if "postgres" not in stand_ins:
+        response = await client.put(
+            f"/settings/{BENCH_SETTING_KEY}", json={"value": "42", "description": "benchmark"}
+        )
+        response.raise_for_status()
+    response = await client.get("/version")
+    response.raise_for_status()
+    return response.json()
+
+
+async def run(
+    scenarios: list[Scenario],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    stand_ins: frozenset[str],
+    url: Optional[str],
+    rounds: int = 1,
+) -> dict[str, Any]:
+    async with AsyncExitStack() as stack:
+        if url is not None:
+            target = url
+            transport: Optional[httpx.AsyncBaseTransport] = None
+        else:
+            from app.api import main
+            from benchmarks.standins import stand_ins as install_stand_ins
+
+            target = "in-process"
+            stack.enter_context(install_stand_ins(main, stand_ins) if stand_ins else nullcontext())
+            # ASGITransport не шлёт lifespan-события — прогоняем startup/shutdown приложения сами.
+            await stack.enter_async_context(main.app.router.lifespan_context(main.app))
+            transport = httpx.ASGITransport(app=main.app)
+
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(
+                transport=transport,
+                base_url=url or "http://bench",
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            )
+        )
+        build = await _prepare(client, stand_ins)
+        results: dict[str, Any] = {}
+        for scenario in scenarios:
+            if warmup > 0:
+                await measure(client, scenario, warmup, concurrency)
+            samples = [await measure(client, scenario, duration, concurrency) for _ in range(rounds)]
+            results[scenario.name] = _median(samples)
+            print(_format_row(scenario.name, results[scenario.name]), flush=True)
+
+    return {
+        "meta": {
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "target": target,
+            "stand_ins": sorted(stand_ins),
+            "concurrency": concurrency,
+            "duration_s": duration,
+            "warmup_s": warmup,
+            "rounds": rounds,
+            "build": build,
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU",
+        },
+        "scenarios": results,
+    }
+
+
+def _median(samples: list[dict[str, Any]]) -> dict[str, Any]:
+    """Сводим раунды: медиана req/s и каждого перцентиля, запросы и ошибки — суммой."""
+    errors: dict[str, int] = {}
+    for sample in samples:
+        for outcome, count in sample["errors"].items():
+            errors[outcome] = errors.get(outcome, 0) + count
+    return {
+        "requests": sum(sample["requests"] for sample in samples),
+        "errors": errors,
+        "throughput_rps": statistics.median(sample["throughput_rps"] for sample in samples),
+        "latency_ms": {
+            name: statistics.median(sample["latency_ms"][name] for sample in samples)
+            for name in samples[0]["latency_ms"]
+        },
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Регрессии относительно baseline: req/s ниже на threshold, p95/p99 выше на threshold (и на шумовой порог) или новые ошибки."""
+    regressions: list[str] = []
+    for name, base in baseline["scenarios"].items():
+        result = current["scenarios"].get(name)
+        if result is None:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {result['throughput_rps']:.1f} req/s < baseline {base['throughput_rps']:.1f}"
+            )
+        for quantile in ("p95", "p99"):
+            value, reference = result["latency_ms"][quantile], base["latency_ms"][quantile]
+            if value > reference * (1 + threshold) and value - reference > LATENCY_NOISE_FLOOR_MS:
+                regressions.append(f"{name}: {quantile} {value:.2f} ms > baseline {reference:.2f} ms")
+        if sum(result["errors"].values()) and not sum(base["errors"].values()):
+            regressions.append(f"{name}: errors {result['errors']}")
+    return regressions
+
+
+def _format_row(name: str, result: dict[str, Any]) -> str:
+    latency = result["latency_ms"]
+    return (
+        f"{name:<10} {result['throughput_rps']:>10.1f} {latency['p50']:>8.2f} {latency['p95']:>8.2f} "
+        f"{latency['p99']:>8.2f} {sum(result['errors'].values()):>7}"
+    )
+
+
+def _report(current: dict[str, Any], baseline_path: Path, threshold: float) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if sorted(baseline["meta"]["stand_ins"]) != current["meta"]["stand_ins"]:
+        print(
+            f"warning: baseline записан с подменами {baseline['meta']['stand_ins']}, "
+            f"текущий прогон — с {current['meta']['stand_ins']}",
+            file=sys.stderr,
+        )
+    regressions = compare(current, baseline, threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"Регрессий относительно {baseline_path} нет (порог {threshold:.0%})")
+    return 1 if regressions else 0
+
+
+def _parse_stand_ins(value: str) -> frozenset[str]:
+    names = frozenset(name.strip() for name in value.split(",") if name.strip())
+    if "all" in names:
+        return frozenset(STAND_INS)
+    unknown = names - set(STAND_INS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"неизвестные подмены: {', '.join(sorted(unknown))}")
+    return names
+
+
+def cli(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API с отчётом и сравнением с baseline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="прогнать сценарии и записать отчёт")
+    run_parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help=f"через запятую из: {', '.join(SCENARIOS)}"
+    )
+    run_parser.add_argument("--concurrency", type=int, default=32, help="одновременных запросов")
+    run_parser.add_argument("--duration", type=float, default=5.0, help="секунд на один замер")
+    run_parser.add_argument("--rounds", type=int, default=3, help="замеров на сценарий, в отчёт идёт медиана")
+    run_parser.add_argument("--warmup", type=float, default=2.0, help="секунд прогрева перед замером")
+    run_parser.add_argument(
+        "--stand-in",
+        type=_parse_stand_ins,
+        default=frozenset(),
+        help=f"подменить зависимости в памяти: {', '.join(STAND_INS)} или all",
+    )
+    run_parser.add_argument("--url", help="бить по HTTP в запущенный API вместо запуска в процессе")
+    run_parser.add_argument("--output", type=Path, default=Path("bench-results.json"), help="куда записать отчёт")
+    run_parser.add_argument("--baseline", type=Path, help="сравнить с сохранённым отчётом")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="допустимое ухудшение, доля")
+
+    compare_parser = commands.add_parser("compare", help="сравнить готовый отчёт с baseline")
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    arguments = parser.parse_args(argv)
+    if arguments.command == "compare":
+        current = json.loads(arguments.current.read_text(encoding="utf-8"))
+        return _report(current, arguments.baseline, arguments.threshold)
+
+    if arguments.url and arguments.stand_in:
+        parser.error("--stand-in работает только при запуске API в процессе, без --url")
+    names = [name.strip() for name in arguments.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+    if not arguments.url:
+        # Успешные запросы не логируем, чтобы запись в stdout не попала в замер и не смешалась с отчётом.
+        os.environ.setdefault("LOG_SUCCESS_SAMPLE_RATE", "0")
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        if "nats" in arguments.stand_in:
+            # JetStream у подмены NATS нет.
+            os.environ["NATS_JETSTREAM_ENABLED"] = "false"
+
+    print(f"{'scenario':<10} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    current = asyncio.run(
+        run(
+            [SCENARIOS[name] for name in names],
+            arguments.concurrency,
+            arguments.duration,
+            arguments.warmup,
+            arguments.stand_in,
+            arguments.url,
+            arguments.rounds,
+        )
+    )
+    arguments.output.write_text(json.dumps(current, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"Отчёт записан в {arguments.output}")
+    if arguments.baseline is not None:
+        return _report(current, arguments.baseline, arguments.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
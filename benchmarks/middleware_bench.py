@@ -0,0 +1,179 @@
+"""Сравниваем пропускную способность API с чистым ASGI-middleware и с прежним ``@app.middleware("http")``.
+
+Запросы подаются прямо в ASGI-приложение, без сокетов и HTTP-клиента, поэтому в цифрах только стоимость
+стека FastAPI: маршрутизация, middleware, обработчик. Оба варианта используют одни и те же маршруты
+и метрики из ``app.api.main``; ``/settings/{key}`` отвечает из прогретого кэша настроек, так что
+Postgres, Redis и Temporal не нужны.
+
+    python -m benchmarks.middleware_bench --duration 5 --concurrency 50 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+# Успешные запросы не логируем, чтобы stdout не стал узким местом и не смешивался с отчётом.
+os.environ.setdefault("LOG_SUCCESS_SAMPLE_RATE", "0")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from starlette.types import ASGIApp  # noqa: E402
+
+from app.api import main  # noqa: E402
+from app.api.middleware import RequestContextMiddleware, _should_log_request, logger  # noqa: E402
+from app.logging_config import request_id_var  # noqa: E402
+from app.telemetry import record_http_request_metrics, route_template  # noqa: E402
+
+BENCH_SETTING_KEY = "bench.key"
+PATHS = ("/version", f"/settings/{BENCH_SETTING_KEY}")
+
+
+async def _legacy_request_middleware(request: Request, call_next):
+    """Прежняя реализация на BaseHTTPMiddleware — эталон для сравнения."""
+    request_id = request.headers.get("X-Request-ID", str(uuid4()))
+    request.state.request_id = request_id
+    request_id_token = request_id_var.set(request_id)
+    start_time = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(request_id_token)
+    duration_ms = (time.perf_counter() - start_time) * 1000
+    if _should_log_request(response.status_code, duration_ms):
+        logger.info(
+            "request completed",
+            extra={
+                "request_id": request_id,
+                "method": request.method,
+                "path": request.url.path,
+                "route": route_template(request),
+                "status": response.status_code,
+                "duration_ms": round(duration_ms, 2),
+            },
+        )
+    record_http_request_metrics(request, response.status_code, duration_ms / 1000)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def build_app(variant: str) -> ASGIApp:
+    """Отдельное приложение с маршрутами основного и нужным middleware."""
+    bench_app = FastAPI()
+    bench_app.router.routes.extend(main.app.router.routes)
+    bench_app.state.telemetry = main.app.state.telemetry
+    if variant == "asgi":
+        bench_app.add_middleware(RequestContextMiddleware)
+    else:
+        bench_app.middleware("http")(_legacy_request_middleware)
+    return bench_app
+
+
+def warm_settings_cache() -> None:
+    generation = main.settings_cache.begin_load()
+    main.settings_cache.put(
+        BENCH_SETTING_KEY,
+        main.SystemSettingResponse(
+            key=BENCH_SETTING_KEY,
+            value="42",
+            description="benchmark",
+            created_at=datetime.now(timezone.utc),
+            updated_at=None,
+        ),
+        generation,
+    )
+
+
+async def call(app: ASGIApp, path: str) -> int:
+    """Один GET напрямую в ASGI; возвращаем статус ответа."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    status = 0
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app: ASGIApp, path: str, duration: float, concurrency: int) -> dict[str, float]:
+    """Гоняем concurrency воркеров duration секунд; отдаём req/s и перцентили задержки."""
+    latencies: list[float] = []
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = await call(app, path)
+            if status != 200:
+                raise RuntimeError(f"{path} answered {status}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+async def run(duration: float, concurrency: int, rounds: int) -> None:
+    warm_settings_cache()
+    apps = {variant: build_app(variant) for variant in ("legacy", "asgi")}
+    for app in apps.values():
+        for path in PATHS:
+            await measure(app, path, 0.5, concurrency)
+
+    print(f"{'path':<24} {'variant':<8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for path in PATHS:
+        results: dict[str, list[dict[str, float]]] = {variant: [] for variant in apps}
+        # Чередуем варианты по раундам, чтобы прогрев и фон машины не играли за одного из них.
+        for _ in range(rounds):
+            for variant, app in apps.items():
+                results[variant].append(await measure(app, path, duration, concurrency))
+        for variant, samples in results.items():
+            print(
+                f"{path:<24} {variant:<8} "
+                f"{statistics.median(s['rps'] for s in samples):>10.0f} "
+                f"{statistics.median(s['p50_ms'] for s in samples):>8.2f} "
+                f"{statistics.median(s['p99_ms'] for s in samples):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ASGI middleware против BaseHTTPMiddleware")
+    parser.add_argument("--duration", type=float, default=5.0, help="секунд на один замер")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных запросов")
+    parser.add_argument("--rounds", type=int, default=3, help="повторов каждого замера, берём медиану")
+    arguments = parser.parse_args()
+    asyncio.run(run(arguments.duration, arguments.concurrency, arguments.rounds))
@@ -0,0 +1,176 @@
+"""Подменные зависимости для нагрузочного прогона без Docker: Redis, NATS, Temporal и Postgres в памяти процесса.
+
+Подмены встают на место модульных клиентов (``cache._redis``, ``nats_client._nats``, ``client._client``),
+поэтому старт, health-пробы и маршруты API работают своим обычным кодом и не знают о подмене. Сетевой
+задержки у подмен нет: цифры показывают стоимость самого API, а не зависимостей.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Iterator, Optional
+from uuid import uuid4
+
+from nats.aio.msg import Msg
+from nats.errors import NoRespondersError
+
+STAND_INS = ("postgres", "redis", "nats", "temporal")
+BENCH_SETTING_KEY = "bench.key"
+
+
+class _Subscription:
+    def __init__(self, broker: "InProcessNats", subject: str) -> None:
+        self._broker = broker
+        self.subject = subject
+
+    async def unsubscribe(self) -> None:
+        self._broker._subscribers.pop(self.subject, None)
+
+
+class InProcessNats:
+    """Брокер NATS в памяти: publish/subscribe и request/reply через настоящие ``Msg`` с точным совпадением subject."""
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, Callable[[Msg], Awaitable[None]]] = {}
+        self._replies: dict[str, asyncio.Future[Msg]] = {}
+        self._inbox_ids = itertools.count()
+        self.is_connected = False
+        self.is_reconnecting = False
+
+    async def connect(self, *args: Any, **kwargs: Any) -> None:
+        self.is_connected = True
+
+    async def subscribe(self, subject: str, cb: Callable[[Msg], Awaitable[None]]) -> _Subscription:
+        self._subscribers[subject] = cb
+        return _Subscription(self, subject)
+
+    async def publish(
+        self, subject: str, payload: bytes = b"", reply: str = "", headers: Optional[dict[str, str]] = None
+    ) -> None:
+        waiter = self._replies.pop(subject, None)
+        if waiter is not None:
+            if not waiter.done():
+                waiter.set_result(Msg(_client=self, subject=subject, data=payload, headers=headers))
+            return
+        handler = self._subscribers.get(subject)
+        if handler is not None:
+            await handler(Msg(_client=self, subject=subject, reply=reply, data=payload, headers=headers))
+
+    async def request(
+        self, subject: str, payload: bytes = b"", timeout: float = 0.5, headers: Optional[dict[str, str]] = None
+    ) -> Msg:
+        if subject not in self._subscribers:
+            raise NoRespondersError
+        inbox = f"_INBOX.bench.{next(self._inbox_ids)}"
+        waiter: asyncio.Future[Msg] = asyncio.get_running_loop().create_future()
+        self._replies[inbox] = waiter
+        try:
+            await self.publish(subject, payload, reply=inbox, headers=headers)
+            return await asyncio.wait_for(waiter, timeout=timeout)
+        finally:
+            self._replies.pop(inbox, None)
+
+    async def flush(self, timeout: int = 10) -> None:
+        return None
+
+    async def drain(self) -> None:
+        self._subscribers.clear()
+        self.is_connected = False
+
+    async def close(self) -> None:
+        await self.drain()
+
+
+@dataclass(slots=True)
+class _StartedWorkflow:
+    id: str
+    result_run_id: str
+
+
+class _ServiceClient:
+    async def check_health(self, **kwargs: Any) -> bool:
+        return True
+
+
+class InProcessTemporal:
+    """Клиент Temporal, который «стартует» workflow мгновенно и отдаёт свежий run_id."""
+
+    def __init__(self) -> None:
+        self.service_client = _ServiceClient()
+        self.started = 0
+
+    async def start_workflow(self, workflow: Any, *args: Any, id: str, **kwargs: Any) -> _StartedWorkflow:
+        self.started += 1
+        return _StartedWorkflow(id=id, result_run_id=str(uuid4()))
+
+
+async def _noop() -> None:
+    return None
+
+
+def warm_settings_cache(main: Any) -> None:
+    """Кладём ключ бенчмарка в кэш настроек: ``/settings/{key}`` отвечает без похода в Postgres."""
+    generation = main.settings_cache.begin_load()
+    main.settings_cache.put(
+        BENCH_SETTING_KEY,
+        main.SystemSettingResponse(
+            key=BENCH_SETTING_KEY,
+            value="42",
+            description="benchmark",
+            created_at=datetime.now(timezone.utc),
+            updated_at=None,
+        ),
+        generation,
+    )
+
+
+@contextmanager
+def stand_ins(main: Any, names: frozenset[str]) -> Iterator[None]:
+    """Ставим подмены на время прогона и возвращаем настоящие клиенты и проверки после него."""
+    from app import health
+    from app.services import cache, nats_client
+    from app.temporal import client as temporal_client
+
+    unknown = names - set(STAND_INS)
+    if unknown:
+        raise ValueError(f"unknown stand-ins: {', '.join(sorted(unknown))}")
+
+    saved_redis, saved_nats, saved_temporal = cache._redis, nats_client._nats, temporal_client._client
+    try:
+        if "redis" in names:
+            import fakeredis
+
+            cache._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        if "nats" in names:
+            nats_client._nats = InProcessNats()
+        if "temporal" in names:
+            temporal_client._client = InProcessTemporal()
+        if "postgres" in names:
+            # Postgres в памяти не поднять: фаза старта вместо записи версии и прогрева кэша кладёт в кэш ключ бенчмарка.
+            async def warm() -> None:
+                warm_settings_cache(main)
+
+            main.startup.add("database", warm)
+            health.health_prober.register(
+                "database", _noop, required="database" not in health.STARTUP_OPTIONAL_DEPENDENCIES
+            )
+        yield
+    finally:
+        # Подмены не должны пережить прогон: в том же процессе дальше идут другие тесты и бенчмарки.
+        if "redis" in names:
+            cache._redis = saved_redis
+        if "nats" in names:
+            nats_client._nats = saved_nats
+        if "temporal" in names:
+            temporal_client._client = saved_temporal
+        if "postgres" in names:
+            main.startup.add("database", main._connect_database)
+            health.health_prober.register(
+                "database",
+                health.check_database,
+                required="database" not in health.STARTUP_OPTIONAL_DEPENDENCIES,
+            )
@@ -8,6 +8,8 @@ if __name__ == "__main__":
         app,
         host="0.0.0.0",
         port=8000,
+        # Каждый запрос и так логирует middleware (через очередь); access-лог uvicorn дублировал бы его синхронно.
+        access_log=False,
     )
 
 
@@ -1,10 +1,98 @@
-"""Простой запуск Temporal worker без магии — используем в Docker и локально."""
+"""Простой запуск Temporal worker без магии — используем в Docker и локально.
 
+С ``WORKER_PROCESSES`` > 1 (или ``--processes N``) поднимаем супервизор: он запускает N процессов
+worker'а на одной очереди, чтобы занять все ядра, и перезапускает упавших детей с паузой.
+"""
+
+import argparse
 import asyncio
+import multiprocessing
+import os
+import signal
+import time
+
 from app.temporal.worker import run_worker
 
-if __name__ == "__main__":
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+WORKER_RESTART_BACKOFF_MAX = float(os.getenv("WORKER_RESTART_BACKOFF_MAX", "30"))
+WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "60"))
+
+
+def _run_child(slot: int) -> None:
+    """Точка входа дочернего процесса: свой event loop, свой Worker и свой порт метрик."""
+    os.environ["WORKER_SLOT"] = str(slot)
     asyncio.run(run_worker())
 
 
+def supervise(processes: int) -> None:
+    """Держим N дочерних worker'ов живыми; по SIGTERM/SIGINT мягко гасим всех и выходим."""
+    # spawn вместо fork: Rust-ядро Temporal SDK держит потоки, и форкать процесс с ними небезопасно.
+    context = multiprocessing.get_context("spawn")
+    children: dict[int, multiprocessing.Process] = {}
+    failures: dict[int, int] = {}
+    restart_at: dict[int, float] = {}
+    started_at: dict[int, float] = {}
+    stopping = False
+
+    def request_stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        print(f"Супервизор получил сигнал {signum}, останавливаем worker'ов...")
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    def start(slot: int) -> None:
+        process = context.Process(target=_run_child, args=(slot,), name=f"sbs-worker-{slot}")
+        process.start()
+        children[slot] = process
+        started_at[slot] = time.monotonic()
+        print(f"Worker #{slot} запущен, pid={process.pid}")
+
+    for slot in range(processes):
+        start(slot)
+
+    while not stopping:
+        now = time.monotonic()
+        for slot, process in list(children.items()):
+            if process.is_alive():
+                continue
+            if slot not in restart_at:
+                # Если ребёнок прожил дольше минуты, считаем падение разовым и сбрасываем backoff.
+                if now - started_at[slot] > 60:
+                    failures[slot] = 0
+                failures[slot] = failures.get(slot, 0) + 1
+                delay = min(2 ** (failures[slot] - 1), WORKER_RESTART_BACKOFF_MAX)
+                restart_at[slot] = now + delay
+                print(f"Worker #{slot} (pid={process.pid}) завершился с кодом {process.exitcode}, перезапуск через {delay:.0f} с")
+            elif now >= restart_at[slot]:
+                del restart_at[slot]
+                start(slot)
+        time.sleep(0.5)
+
+    for process in children.values():
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+    for process in children.values():
+        process.join(timeout=max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            process.kill()
+            process.join()
+    print("Все worker'ы остановлены.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запуск Temporal worker'а SBS")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=WORKER_PROCESSES,
+        help="сколько процессов worker'а держать на одной очереди",
+    )
+    arguments = parser.parse_args()
 
+    if arguments.processes > 1:
+        supervise(arguments.processes)
+    else:
+        asyncio.run(run_worker())
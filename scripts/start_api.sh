@@ -6,5 +6,7 @@ python /app/entrypoint.py
 
 export OTEL_SERVICE_NAME="${OTEL_SERVICE_NAME:-sbs-api}"
 
-exec opentelemetry-instrument uvicorn app.api.main:app --host 0.0.0.0 --port 8000
+# Без opentelemetry-instrument: провайдеры метрик и трейсов собирает app.telemetry, авто-конфигурация distro
+# поставила бы свои первой, и наши (Prometheus, сэмплер, экспортёр) отклонились бы.
+exec uvicorn app.api.main:app --host 0.0.0.0 --port 8000 --no-access-log
 
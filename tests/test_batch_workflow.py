@@ -0,0 +1,102 @@
+import asyncio
+import dataclasses
+from uuid import uuid4
+
+import pytest
+from temporalio.client import Client, WorkflowHistory
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import ActivityEnvironment, WorkflowEnvironment
+from temporalio.worker import Replayer, Worker
+
+from app.activities.batch_activity import PartitionInput, process_batch_partition, register_partition_handler
+from app.temporal.interceptors import WorkerMetricsInterceptor
+from app.workflows.batch_workflow import BatchJobInput, BatchPartitionWorkflow, BatchSummary, BatchWorkflow
+
+REPLAY_HANDLER = "tests.replay"
+FAILING_PARTITION_START = 2
+
+
+async def _replay_handler(start: int, end: int) -> None:
+    if start == FAILING_PARTITION_START:
+        raise ApplicationError(f"partition [{start}, {end}) is broken", non_retryable=True)
+
+
+register_partition_handler(REPLAY_HANDLER, _replay_handler)
+
+
+async def _run_histories(client: Client, workflow_id: str, first_run_id: str) -> list[WorkflowHistory]:
+    """Истории всех run'ов цепочки continue-as-new, начиная с первого."""
+    histories = []
+    run_id: str | None = first_run_id
+    while run_id:
+        history = await client.get_workflow_handle(workflow_id, run_id=run_id).fetch_history()
+        histories.append(history)
+        attributes = history.events[-1].workflow_execution_continued_as_new_event_attributes
+        run_id = attributes.new_execution_run_id or None
+    return histories
+
+
+async def _record_and_replay() -> tuple[BatchSummary, list[WorkflowHistory]]:
+    try:
+        env = await WorkflowEnvironment.start_time_skipping()
+    except RuntimeError as exc:
+        pytest.skip(f"Temporal test server недоступен: {exc}")
+    async with env:
+        task_queue = f"batch-replay-{uuid4()}"
+        workflow_id = f"batch-replay-{uuid4()}"
+        async with Worker(
+            env.client,
+            task_queue=task_queue,
+            workflows=[BatchWorkflow, BatchPartitionWorkflow],
+            activities=[process_batch_partition],
+        ):
+            # 7 элементов по 2, окно 2, по 2 партиции на run: два ребёнка параллельно, одна партиция падает,
+            # затем continue-as-new и второй run с остатком.
+            handle = await env.client.start_workflow(
+                BatchWorkflow.run,
+                BatchJobInput(
+                    job_id="replay",
+                    handler=REPLAY_HANDLER,
+                    total_items=7,
+                    partition_size=2,
+                    max_parallel=2,
+                    partitions_per_run=2,
+                ),
+                id=workflow_id,
+                task_queue=task_queue,
+                result_type=BatchSummary,
+            )
+            summary = await handle.result()
+            histories = await _run_histories(env.client, workflow_id, handle.first_execution_run_id or handle.run_id)
+
+    replayer = Replayer(
+        workflows=[BatchWorkflow, BatchPartitionWorkflow],
+        interceptors=[WorkerMetricsInterceptor()],
+    )
+    for history in histories:
+        await replayer.replay_workflow(history)
+    return summary, histories
+
+
+def test_batch_workflow_replays_deterministically():
+    # История записывается с настоящего прогона на test server, а не собирается руками.
+    summary, histories = asyncio.run(_record_and_replay())
+    assert len(histories) == 2
+    assert summary == BatchSummary(processed_items=5, completed_partitions=3, failed_partitions=1, runs=2)
+
+
+@pytest.mark.parametrize("field", ["partition_size", "max_parallel", "partitions_per_run"])
+def test_batch_workflow_rejects_parameters_that_never_progress(field):
+    job = dataclasses.replace(BatchJobInput(job_id="bad", handler=REPLAY_HANDLER, total_items=10), **{field: 0})
+    with pytest.raises(ApplicationError) as exc_info:
+        asyncio.run(BatchWorkflow().run(job))
+    assert exc_info.value.non_retryable
+    assert exc_info.value.type == "InvalidBatchInput"
+
+
+def test_partition_with_unknown_handler_fails_instead_of_reporting_success():
+    partition = PartitionInput(job_id="job", handler="missing", start=0, end=10)
+    with pytest.raises(ApplicationError) as exc_info:
+        asyncio.run(ActivityEnvironment().run(process_batch_partition, partition))
+    assert exc_info.value.non_retryable
+    assert exc_info.value.type == "UnknownPartitionHandler"
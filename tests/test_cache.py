@@ -0,0 +1,206 @@
+import asyncio
+import gc
+import json
+import time
+
+import fakeredis
+import pytest
+
+from app.services import cache
+from app.services.cache import CACHE_KEY_PREFIX, cached
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_redis", client)
+    return client
+
+
+def _loader(calls: list, delay: float = 0.0):
+    async def load(name: str) -> str:
+        calls.append(name)
+        await asyncio.sleep(delay)
+        return f"value-{name}-{len(calls)}"
+
+    return load
+
+
+def test_hits_local_tier_then_redis_tier(redis):
+    calls: list = []
+    load = cached(ttl=60, key="test:{name}")(_loader(calls))
+    # Другая «реплика»: свой локальный уровень, общий Redis.
+    other_replica = cached(ttl=60, key="test:{name}")(_loader(calls))
+
+    async def scenario():
+        first = await load("a")
+        await redis.delete(f"{CACHE_KEY_PREFIX}test:a")
+        from_local = await load("a")
+        await load("b")
+        from_redis = await other_replica("b")
+        return first, from_local, from_redis
+
+    first, from_local, from_redis = asyncio.run(scenario())
+    assert first == from_local == "value-a-1"
+    assert from_redis == "value-b-2"
+    assert calls == ["a", "b"]
+
+
+def test_concurrent_misses_call_loader_once(redis):
+    calls: list = []
+    load = cached(ttl=60, key="test:{name}")(_loader(calls, delay=0.05))
+
+    async def scenario():
+        return await asyncio.gather(*(load("a") for _ in range(20)))
+
+    assert set(asyncio.run(scenario())) == {"value-a-1"}
+    assert calls == ["a"]
+
+
+def test_waits_for_replica_that_holds_the_lock(redis):
+    calls: list = []
+    load = cached(ttl=60, key="test:{name}", lock_lease=2)(_loader(calls))
+    cache_key = f"{CACHE_KEY_PREFIX}test:a"
+
+    async def other_replica_fills() -> None:
+        await asyncio.sleep(0.1)
+        await redis.set(cache_key, json.dumps([time.time() + 60, "from-replica"]))
+
+    async def scenario():
+        await redis.set(f"{cache_key}:lock", "someone-else", px=2000)
+        filler = asyncio.create_task(other_replica_fills())
+        value = await load("a")
+        await filler
+        return value
+
+    assert asyncio.run(scenario()) == "from-replica"
+    assert calls == []
+
+
+def test_serves_stale_value_and_refreshes_in_background(redis):
+    calls: list = []
+    load = cached(ttl=60, key="test:{name}", stale_ttl=30)(_loader(calls, delay=0.05))
+    cache_key = f"{CACHE_KEY_PREFIX}test:a"
+
+    async def scenario():
+        await redis.set(cache_key, json.dumps([time.time() - 1, "stale"]))
+        stale = await load("a")
+        calls_when_served = list(calls)
+        await asyncio.sleep(0.2)
+        fresh_until, value = json.loads(await redis.get(cache_key))
+        return stale, calls_when_served, fresh_until, value, await load("a")
+
+    stale, calls_when_served, fresh_until, value, after = asyncio.run(scenario())
+    assert stale == "stale"
+    # Протухшее отдали сразу, не дожидаясь загрузчика; обновление прошло в фоне.
+    assert calls_when_served == []
+    assert value == after == "value-a-1"
+    assert fresh_until > time.time()
+    assert calls == ["a"]
+
+
+def test_loader_error_is_not_cached(redis):
+    calls: list = []
+
+    @cached(ttl=60, key="test:{name}")
+    async def flaky(name: str) -> str:
+        calls.append(name)
+        if len(calls) == 1:
+            raise RuntimeError("source down")
+        return "recovered"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await flaky("a")
+        lock_left = await redis.exists(f"{CACHE_KEY_PREFIX}test:a:lock")
+        return lock_left, await flaky("a")
+
+    lock_left, value = asyncio.run(scenario())
+    assert lock_left == 0
+    assert value == "recovered"
+    assert calls == ["a", "a"]
+
+
+def test_concurrent_connects_build_one_pool_and_failed_ping_closes_it(monkeypatch):
+    pools: list = []
+
+    class StubPool:
+        closed = False
+
+        async def aclose(self) -> None:
+            self.closed = True
+
+    class StubRedis:
+        def __init__(self, connection_pool) -> None:
+            self.pool = connection_pool
+
+        async def ping(self) -> None:
+            await asyncio.sleep(0.01)
+            if len(pools) == 1:
+                raise ConnectionError("redis is down")
+
+        async def aclose(self) -> None:
+            pass
+
+    def build_pool():
+        pools.append(StubPool())
+        return pools[-1]
+
+    monkeypatch.setattr(cache, "_build_pool", build_pool)
+    monkeypatch.setattr(cache, "Redis", StubRedis)
+    monkeypatch.setattr(cache, "_redis", None)
+    monkeypatch.setattr(cache, "_pool", None)
+
+    async def scenario():
+        with pytest.raises(ConnectionError):
+            await cache.connect_redis()
+        assert cache._pool is None and cache._redis is None
+        clients = await asyncio.gather(*(cache.connect_redis() for _ in range(10)))
+        await cache.close_redis()
+        return clients
+
+    clients = asyncio.run(scenario())
+    # Первый пул закрыт после неудачного PING; десять параллельных вызовов собрали ровно один новый.
+    assert len(pools) == 2
+    assert pools[0].closed
+    assert all(client is clients[0] and client.pool is pools[1] for client in clients)
+    assert pools[1].closed
+
+
+def test_returns_json_form_on_miss_and_on_every_hit(redis):
+    @cached(ttl=60, key="test:{name}")
+    async def load(name: str):
+        return (name, {1: "one"})
+
+    other_replica = cached(ttl=60, key="test:{name}")(load.__wrapped__)
+
+    async def scenario():
+        return await load("a"), await load("a"), await other_replica("a")
+
+    expected = ["a", {"1": "one"}]
+    # Промах, локальный уровень и Redis отдают одно и то же, а не tuple в одном случае и list в другом.
+    assert list(asyncio.run(scenario())) == [expected, expected, expected]
+
+
+def test_failed_load_after_caller_cancelled_is_retrieved(redis):
+    unretrieved: list = []
+
+    @cached(ttl=60, key="test:{name}")
+    async def failing(name: str) -> str:
+        await asyncio.sleep(0.05)
+        raise RuntimeError("source down")
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        caller = asyncio.create_task(failing("a"))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        # Загрузка продолжилась под shield и упала уже без ждущих.
+        await asyncio.sleep(0.1)
+        gc.collect()
+
+    asyncio.run(scenario())
+    gc.collect()
+    assert unretrieved == []
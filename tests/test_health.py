@@ -0,0 +1,27 @@
+import asyncio
+
+from app.health import HealthProber
+
+
+async def _ok() -> None:
+    return None
+
+
+async def _broken() -> None:
+    raise RuntimeError("down")
+
+
+def test_readiness_follows_required_dependencies():
+    prober = HealthProber(interval=60, timeout=0.1)
+    prober.register("db", _ok)
+    prober.register("cache", _broken, required=False)
+    assert not prober.is_ready
+
+    asyncio.run(prober.probe_once())
+    snapshot = prober.snapshot()
+    assert prober.is_ready
+    assert snapshot["dependencies"]["cache"]["healthy"] is False
+
+    prober.register("broker", _broken)
+    asyncio.run(prober.probe_once())
+    assert not prober.is_ready
@@ -0,0 +1,48 @@
+import asyncio
+import dataclasses
+from datetime import timedelta
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+
+from app.activities.heartbeat import process_in_chunks
+
+
+def _environment(heartbeats: list, resume_offset: int | None = None) -> ActivityEnvironment:
+    env = ActivityEnvironment()
+    env.info = dataclasses.replace(
+        env.info,
+        heartbeat_timeout=timedelta(seconds=1),
+        heartbeat_details=[{"offset": resume_offset}] if resume_offset is not None else [],
+    )
+    env.on_heartbeat = lambda *details: heartbeats.append(details)
+    return env
+
+
+def test_chunks_resume_from_last_checkpoint():
+    heartbeats: list = []
+    processed: list[tuple[int, int]] = []
+
+    async def chunk(start: int, end: int) -> None:
+        processed.append((start, end))
+
+    env = _environment(heartbeats, resume_offset=4)
+    resumed_from = asyncio.run(env.run(process_in_chunks, 10, 3, chunk))
+
+    assert resumed_from == 4
+    assert processed == [(4, 7), (7, 10)]
+    assert heartbeats == [({"offset": 7},), ({"offset": 10},)]
+
+
+def test_cancellation_keeps_checkpoint():
+    heartbeats: list = []
+    env = _environment(heartbeats)
+
+    async def chunk(start: int, end: int) -> None:
+        if start == 2:
+            env.cancel()
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(env.run(process_in_chunks, 10, 1, chunk))
+    assert heartbeats[-1] == ({"offset": 2},)
@@ -0,0 +1,50 @@
+import asyncio
+
+from app.services import cache, nats_client
+from app.temporal import client as temporal_client
+from benchmarks.load_test import SCENARIOS, compare, percentile, run
+
+
+def _report(rps: float, p95: float, p99: float, errors: int = 0) -> dict:
+    return {
+        "scenarios": {
+            "health": {
+                "throughput_rps": rps,
+                "errors": {"503": errors} if errors else {},
+                "latency_ms": {"p50": 1.0, "p95": p95, "p99": p99, "max": p99},
+            }
+        }
+    }
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = _report(1000.0, 5.0, 10.0)
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.0
+    assert compare(_report(900.0, 5.4, 10.9), baseline, threshold=0.15) == []
+    # +50% к субмиллисекундному p99 — шум, а не регрессия.
+    assert compare(_report(1000.0, 0.5, 1.4), _report(1000.0, 0.5, 0.9), threshold=0.15) == []
+
+    regressions = compare(_report(800.0, 6.5, 10.0, errors=3), baseline, threshold=0.15)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("health: throughput")
+    assert regressions[1].startswith("health: p95")
+    assert regressions[2].startswith("health: errors")
+
+
+def test_run_in_process_with_stand_ins(monkeypatch):
+    real = object()
+    monkeypatch.setattr(cache, "_redis", real)
+    monkeypatch.setattr(nats_client, "_nats", real)
+    monkeypatch.setattr(temporal_client, "_client", real)
+    stand_ins = frozenset({"postgres", "redis", "nats", "temporal"})
+    scenarios = [SCENARIOS[name] for name in ("settings", "redis", "nats", "workflow")]
+    report = asyncio.run(run(scenarios, concurrency=4, duration=0.2, warmup=0, stand_ins=stand_ins, url=None))
+    # После прогона на месте снова настоящие клиенты, а не подмены.
+    assert cache._redis is nats_client._nats is temporal_client._client is real
+
+    assert report["meta"]["stand_ins"] == sorted(stand_ins)
+    for name in ("settings", "redis", "nats", "workflow"):
+        result = report["scenarios"][name]
+        assert result["errors"] == {}
+        assert result["requests"] > 0
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
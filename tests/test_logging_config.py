@@ -0,0 +1,69 @@
+import json
+import logging
+import logging.config
+import queue
+import subprocess
+import sys
+from pathlib import Path
+
+from uvicorn.config import LOGGING_CONFIG
+
+from app import logging_config
+from app.logging_config import ContextQueueHandler, JsonFormatter, request_id_var
+
+
+def test_queue_handler_captures_request_context():
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=1)
+    handler = ContextQueueHandler(log_queue)
+    logger = logging.getLogger("sbs.test.logging")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("hello %s", "world", extra={"status": 200})
+        logger.info("dropped")
+    finally:
+        request_id_var.reset(token)
+        logger.removeHandler(handler)
+
+    payload = json.loads(JsonFormatter("sbs-test").format(log_queue.get_nowait()))
+    assert payload["message"] == "hello world"
+    assert payload["request_id"] == "req-1"
+    assert payload["status"] == 200
+    assert handler.dropped_records == 1
+
+
+
+def test_importing_the_app_leaves_logging_alone():
+    # В отдельном процессе: в этом процессе старт приложения мог уже прогнать, например, нагрузочный тест.
+    probe = (
+        "import logging, app.api.main\n"
+        "from app import logging_config\n"
+        "assert not any(isinstance(h, logging_config.ContextQueueHandler) for h in logging.getLogger().handlers)\n"
+        "assert logging_config._listener is None\n"
+    )
+    subprocess.run([sys.executable, "-c", probe], check=True, cwd=Path(__file__).resolve().parent.parent)
+
+
+def test_configure_logging_reroutes_uvicorn_after_its_dict_config(monkeypatch):
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.setattr(logging_config, "_listener", None)
+    monkeypatch.setattr(logging_config, "_queue_handler", None)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        monkeypatch.setattr(logging.getLogger(name), "handlers", [])
+
+    # Так uvicorn настраивает логи до старта приложения.
+    logging.config.dictConfig(LOGGING_CONFIG)
+    try:
+        handler = logging_config.configure_logging("sbs-test")
+        assert root.handlers == [handler]
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            assert logging.getLogger(name).handlers == []
+            assert logging.getLogger(name).propagate
+        assert logging_config.dropped_records() == 0
+    finally:
+        logging_config.stop_logging()
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import time
+
+from app.loop_monitor import EventLoopMonitor
+
+
+class _Collect(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.messages: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+def _blocking_handler() -> None:
+    time.sleep(0.3)
+
+
+def test_monitor_measures_lag_and_captures_blocking_stack():
+    collector = _Collect()
+    logger = logging.getLogger("sbs.loop_monitor")
+    logger.addHandler(collector)
+    logger.setLevel(logging.WARNING)
+
+    async def scenario() -> EventLoopMonitor:
+        monitor = EventLoopMonitor(interval=0.02, block_threshold=0.05, debug=True)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        _blocking_handler()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor
+
+    try:
+        monitor = asyncio.run(scenario())
+    finally:
+        logger.removeHandler(collector)
+
+    assert monitor.max_lag >= 0.2
+    assert any("_blocking_handler" in message for message in collector.messages)
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.api.middleware import RequestContextMiddleware
+from app.logging_config import request_id_var
+
+
+def test_request_id_propagates_and_streaming_is_not_buffered():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+    seen: list[str | None] = []
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                seen.append(request_id_var.get())
+                yield f"{index}\n"
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    async def scenario() -> httpx.Response:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/stream", headers={"X-Request-ID": "req-42"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.text == "0\n1\n2\n"
+    assert response.headers["X-Request-ID"] == "req-42"
+    # Тело стримится в той же задаче, что и middleware, поэтому контекст запроса виден генератору.
+    assert seen == ["req-42", "req-42", "req-42"]
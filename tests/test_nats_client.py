@@ -0,0 +1,414 @@
+import asyncio
+
+import httpx
+import pytest
+from nats.errors import ConnectionClosedError
+from nats.errors import TimeoutError as NATSTimeoutError
+from nats.js.errors import BadRequestError
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from prometheus_client import REGISTRY
+
+from app.api import main
+from app.services import nats_client
+from benchmarks.standins import InProcessNats
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    fake = InProcessNats()
+    monkeypatch.setattr(nats_client, "_nats", fake)
+    monkeypatch.setattr(nats_client, "_subscriptions", {})
+    return fake
+
+
+def _dropped(policy: str) -> float:
+    return REGISTRY.get_sample_value("nats_messages_dropped_total", {"nats_overflow_policy": policy}) or 0.0
+
+
+def test_nats_test_maps_no_responders_and_timeout(broker):
+    async def ignore(msg) -> None:
+        pass
+
+    async def scenario():
+        broker._subscribers["sbs.silent"] = ignore
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            echo = await client.post("/nats/test", json={"message": "ping"})
+            nobody = await client.post("/nats/test", json={"message": "ping", "subject": "sbs.nobody"})
+            silent = await client.post("/nats/test", json={"message": "ping", "subject": "sbs.silent"})
+        return echo, nobody, silent
+
+    echo, nobody, silent = asyncio.run(scenario())
+    assert (echo.status_code, echo.json()["received"]) == (200, "ping")
+    assert nobody.status_code == 503
+    assert silent.status_code == 504
+
+
+@pytest.mark.parametrize(("policy", "kept"), [("drop_oldest", [b"2", b"3"]), ("drop_newest", [b"1", b"2"])])
+def test_overflow_policy_drops_and_counts(monkeypatch, policy, kept):
+    monkeypatch.setattr(nats_client, "NATS_QUEUE_OVERFLOW", policy)
+
+    async def scenario():
+        queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=2)
+        monkeypatch.setattr(nats_client, "_message_queue", queue)
+        for data in (b"1", b"2", b"3"):
+            nats_client._enqueue(data)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    before = _dropped(policy)
+    assert asyncio.run(scenario()) == kept
+    assert _dropped(policy) == before + 1
+
+
+class _StubConnection:
+    """Соединение NATS для BatchPublisher: публикации копятся, flush можно задержать."""
+
+    is_connected = True
+    is_reconnecting = False
+
+    def __init__(self) -> None:
+        self.published: list[tuple[str, bytes]] = []
+        self.flushes = 0
+        self.flush_gate = asyncio.Event()
+        self.flush_gate.set()
+
+    async def publish(self, subject: str, payload: bytes, headers=None) -> None:
+        self.published.append((subject, payload))
+
+    async def flush(self, timeout: int = 10) -> None:
+        await self.flush_gate.wait()
+        self.flushes += 1
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    stub = _StubConnection()
+    monkeypatch.setattr(nats_client, "_nats", stub)
+    return stub
+
+
+def test_publisher_flushes_by_interval(connection):
+    publisher = nats_client.BatchPublisher(flush_interval=0.05, flush_bytes=1 << 20)
+
+    async def scenario():
+        await publisher.publish("sbs.events.a", b"x" * 10)
+        pending = publisher.pending_bytes
+        await asyncio.sleep(0.2)
+        await publisher.close()
+        return pending
+
+    assert asyncio.run(scenario()) == len("sbs.events.a") + 10
+    assert connection.flushes == 1
+    assert publisher.pending_bytes == 0
+
+
+def test_publisher_flushes_by_bytes_before_interval(connection):
+    publisher = nats_client.BatchPublisher(flush_interval=60, flush_bytes=100, max_pending_bytes=1000)
+
+    async def scenario():
+        await publisher.publish("s", b"x" * 50)
+        await asyncio.sleep(0.02)
+        below_threshold = connection.flushes
+        await publisher.publish("s", b"x" * 60)
+        await asyncio.sleep(0.02)
+        flushes = connection.flushes
+        await publisher.close()
+        return below_threshold, flushes
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_max_pending_bytes_blocks_publishers_until_flush(connection):
+    publisher = nats_client.BatchPublisher(flush_interval=60, flush_bytes=1000, max_pending_bytes=100)
+
+    async def scenario():
+        connection.flush_gate.clear()
+        await publisher.publish("s", b"x" * 59)
+        blocked = asyncio.create_task(publisher.publish("s", b"x" * 59))
+        await asyncio.sleep(0.05)
+        # Второе сообщение превысило бы лимит: публикатор ждёт flush и ещё ничего не отправил.
+        waiting = (blocked.done(), len(connection.published))
+        connection.flush_gate.set()
+        await blocked
+        await publisher.close()
+        return waiting
+
+    assert asyncio.run(scenario()) == (False, 1)
+    assert len(connection.published) == 2
+    assert connection.flushes == 2
+
+
+def test_pending_bytes_gauge(connection, monkeypatch):
+    publisher = nats_client.BatchPublisher(flush_interval=60, flush_bytes=1000)
+    monkeypatch.setattr(nats_client, "publisher", publisher)
+
+    async def scenario():
+        await publisher.publish("s", b"x" * 9)
+        pending = REGISTRY.get_sample_value("nats_publisher_pending_bytes")
+        await publisher.close()
+        return pending, REGISTRY.get_sample_value("nats_publisher_pending_bytes")
+
+    assert asyncio.run(scenario()) == (10.0, 0.0)
+
+
+class _StubJetStream:
+    """JetStream и JSM поверх _StubConnection: add_consumer и publish падают столько раз, сколько задано."""
+
+    def __init__(self, add_consumer_error: Exception | None = None, publish_failures: int = 0) -> None:
+        self.add_consumer_error = add_consumer_error
+        self.publish_failures = publish_failures
+        self.publish_headers: list[dict[str, str]] = []
+
+    async def add_consumer(self, stream, config):
+        if self.add_consumer_error is not None:
+            raise self.add_consumer_error
+        return ("created", stream, config.durable_name)
+
+    async def consumer_info(self, stream, durable):
+        return ("existing", stream, durable)
+
+    async def publish(self, subject, payload, timeout, headers):
+        self.publish_headers.append(headers)
+        if len(self.publish_headers) <= self.publish_failures:
+            raise NATSTimeoutError
+        return ("ack", subject)
+
+
+def _with_jetstream(connection: _StubConnection, jetstream: _StubJetStream) -> None:
+    connection.jsm = lambda: jetstream
+    connection.jetstream = lambda: jetstream
+
+
+def test_ensure_consumer_falls_back_to_existing_on_bad_request(connection):
+    _with_jetstream(connection, _StubJetStream(add_consumer_error=BadRequestError(code=400)))
+    assert asyncio.run(nats_client.ensure_consumer("worker", stream="S")) == ("existing", "S", "worker")
+
+    _with_jetstream(connection, _StubJetStream())
+    assert asyncio.run(nats_client.ensure_consumer("worker", stream="S")) == ("created", "S", "worker")
+
+
+def test_publish_durable_retries_with_the_same_msg_id(connection):
+    jetstream = _StubJetStream(publish_failures=2)
+    _with_jetstream(connection, jetstream)
+
+    assert asyncio.run(nats_client.publish_durable("sbs.events.a", b"{}", msg_id="order-1")) == ("ack", "sbs.events.a")
+    # Все попытки несут один Nats-Msg-Id: повтор после таймаута сервер отбросит как дубликат.
+    assert [headers["Nats-Msg-Id"] for headers in jetstream.publish_headers] == ["order-1"] * 3
+
+    exhausted = _StubJetStream(publish_failures=5)
+    _with_jetstream(connection, exhausted)
+    with pytest.raises(NATSTimeoutError):
+        asyncio.run(nats_client.publish_durable("sbs.events.a", b"{}", attempts=2))
+    generated = {headers["Nats-Msg-Id"] for headers in exhausted.publish_headers}
+    assert len(exhausted.publish_headers) == 2 and len(generated) == 1
+
+
+class _StubMsg:
+    def __init__(self, index: int) -> None:
+        self.subject = "sbs.events.a"
+        self.headers = None
+        self.data = str(index).encode()
+        self.acked = False
+        self.nak_delay = None
+
+    async def ack(self) -> None:
+        self.acked = True
+
+    async def nak(self, delay=None) -> None:
+        self.nak_delay = delay
+
+
+class _StubPullSubscription:
+    def __init__(self, messages: list[_StubMsg]) -> None:
+        self.messages = messages
+
+    async def fetch(self, batch, timeout):
+        return self.messages[:batch]
+
+
+def test_pull_consumer_acks_successes_naks_failures_under_semaphore(connection):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(msg) -> None:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if msg.data == b"3":
+            raise ValueError("bad message")
+
+    messages = [_StubMsg(index) for index in range(6)]
+
+    async def scenario():
+        consumer = nats_client.PullBatchConsumer("worker", handler, batch_size=10, concurrency=2, nak_delay=7)
+        return await consumer.process_batch(_StubPullSubscription(messages))
+
+    assert asyncio.run(scenario()) == 6
+    assert max_in_flight == 2
+    assert [msg.acked for msg in messages] == [True, True, True, False, True, True]
+    assert messages[3].nak_delay == 7
+    # Ответы на всю пачку подтверждены одним flush.
+    assert connection.flushes == 1
+
+
+@pytest.fixture
+def spans(broker, monkeypatch):
+    """Свой провайдер с экспортом в память вместо глобального: проверяем только заголовки и связи спанов."""
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(nats_client, "_tracer", provider.get_tracer("sbs.nats"))
+    monkeypatch.setattr(nats_client, "_handlers", {})
+    yield provider.get_tracer("sbs.test"), exporter
+    provider.shutdown()
+
+
+def _by_name(exporter: InMemorySpanExporter) -> dict:
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+def test_publish_carries_traceparent_to_subscriber(spans):
+    tracer, exporter = spans
+    received: list = []
+
+    async def handler(msg) -> None:
+        received.append((msg.headers, trace.get_current_span().get_span_context()))
+
+    async def scenario():
+        await nats_client.subscribe_subject("sbs.traced", handler)
+        with tracer.start_as_current_span("api request") as root:
+            await nats_client.publish_message("sbs.traced", b"x")
+        return root.get_span_context()
+
+    root = asyncio.run(scenario())
+    headers, consumer_context = received[0]
+    finished = _by_name(exporter)
+    publish = finished["sbs.traced publish"].get_span_context()
+    assert headers["traceparent"] == f"00-{root.trace_id:032x}-{publish.span_id:016x}-01"
+    assert consumer_context.trace_id == root.trace_id
+    assert finished["sbs.traced process"].parent.span_id == publish.span_id
+
+
+def test_request_reply_continues_the_trace(spans):
+    tracer, exporter = spans
+
+    async def responder(msg) -> None:
+        await msg.respond(msg.data)
+
+    async def scenario():
+        await nats_client.subscribe_subject("sbs.echo", responder)
+        with tracer.start_as_current_span("api request") as root:
+            reply = await nats_client.request("sbs.echo", b"ping")
+        return reply, root.get_span_context()
+
+    reply, root = asyncio.run(scenario())
+    assert reply == b"ping"
+    finished = _by_name(exporter)
+    request_span = finished["sbs.echo request"]
+    assert request_span.parent.span_id == root.span_id
+    assert finished["sbs.echo process"].parent.span_id == request_span.get_span_context().span_id
+    assert finished["sbs.echo process"].context.trace_id == root.trace_id
+
+
+
+class _ConnectingClient(_StubConnection):
+    """Клиент, который подключается не сразу: видно, сколько раз connect() позвали одновременно."""
+
+    is_connected = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.connects: list[dict] = []
+
+    async def connect(self, **options) -> None:
+        self.connects.append(options)
+        await asyncio.sleep(0.02)
+        self.is_connected = True
+
+    async def subscribe(self, subject, cb):
+        return subject
+
+
+def test_concurrent_connects_share_one_attempt(monkeypatch):
+    client = _ConnectingClient()
+    monkeypatch.setattr(nats_client, "_nats", client)
+    monkeypatch.setattr(nats_client, "_subscriptions", {})
+    monkeypatch.setattr(nats_client, "_connect_lock", asyncio.Lock())
+
+    async def scenario():
+        return await asyncio.gather(*(nats_client.connect_nats() for _ in range(10)))
+
+    assert all(connected is client for connected in asyncio.run(scenario()))
+    assert len(client.connects) == 1
+    assert client.connects[0]["connect_timeout"] == nats_client.NATS_CONNECT_TIMEOUT
+    assert client.connects[0]["max_reconnect_attempts"] == nats_client.NATS_MAX_RECONNECT_ATTEMPTS
+
+
+def test_reconnecting_client_is_not_connected_again(monkeypatch):
+    client = _ConnectingClient()
+    client.is_reconnecting = True
+    monkeypatch.setattr(nats_client, "_nats", client)
+    monkeypatch.setattr(nats_client, "_connect_lock", asyncio.Lock())
+
+    assert asyncio.run(nats_client.connect_nats()) is client
+    with pytest.raises(RuntimeError):
+        asyncio.run(nats_client.get_nats())
+    assert client.connects == []
+
+
+class _FlakyPullSubscription(_StubPullSubscription):
+    """Первый fetch рвётся, как при закрытом соединении; дальше отдаёт пачку один раз и ждёт."""
+
+    def __init__(self, messages: list[_StubMsg], fail: bool) -> None:
+        super().__init__(messages)
+        self.fail = fail
+        self.unsubscribed = False
+
+    async def fetch(self, batch, timeout):
+        if self.fail:
+            raise ConnectionClosedError
+        if not self.messages:
+            await asyncio.sleep(timeout)
+            raise NATSTimeoutError
+        messages, self.messages = self.messages, []
+        return messages
+
+    async def unsubscribe(self) -> None:
+        self.unsubscribed = True
+
+
+def test_pull_consumer_survives_fetch_errors_and_resubscribes(connection):
+    jetstream = _StubJetStream()
+    _with_jetstream(connection, jetstream)
+    subscriptions: list[_FlakyPullSubscription] = []
+
+    async def pull_subscribe_bind(durable, stream):
+        subscriptions.append(_FlakyPullSubscription([_StubMsg(1)], fail=not subscriptions))
+        return subscriptions[-1]
+
+    jetstream.pull_subscribe_bind = pull_subscribe_bind
+    handled: list[bytes] = []
+
+    async def handler(msg) -> None:
+        handled.append(msg.data)
+
+    async def scenario():
+        consumer = nats_client.PullBatchConsumer("worker", handler, fetch_timeout=0.01, retry_delay=0.01)
+        consumer.start()
+        deadline = asyncio.get_running_loop().time() + 2
+        while not handled and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.01)
+        alive = not consumer._task.done()
+        await consumer.stop()
+        return alive
+
+    assert asyncio.run(scenario())
+    assert handled == [b"1"]
+    # Сломанную подписку отпустили и привязались заново; при остановке отписались и от новой.
+    assert len(subscriptions) == 2
+    assert all(subscription.unsubscribed for subscription in subscriptions)
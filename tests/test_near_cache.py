@@ -0,0 +1,136 @@
+import asyncio
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from redis.asyncio import ConnectionPool, Redis
+
+import app.api.main  # noqa: F401  # поднимает Prometheus-экспорт, через который читаем gauge
+from app.services import near_cache as near_cache_module
+from app.services.near_cache import _MISSING, NearCache
+
+pytestmark = pytest.mark.skipif(shutil.which("redis-server") is None, reason="нужен локальный redis-server")
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        yield f"redis://127.0.0.1:{port}/0"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def _until(condition, timeout: float = 3.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.01)
+
+
+def _run(redis_url: str, scenario, **options) -> None:
+    """Гоняем сценарий с запущенным near-cache и отдельным клиентом, который играет роль другой реплики."""
+
+    async def main() -> None:
+        pool = ConnectionPool.from_url(redis_url, decode_responses=True)
+        other = Redis.from_url(redis_url, decode_responses=True)
+        cache = NearCache(**{"prefixes": ("nc:",), "ping_interval": 0.2, **options})
+        cache.start(pool)
+        try:
+            await _until(lambda: cache.active)
+            await scenario(cache, other)
+        finally:
+            await cache.stop()
+            await other.aclose()
+            await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_invalidation_push_evicts_local_entry(redis_url):
+    async def scenario(cache: NearCache, other: Redis) -> None:
+        cache.put("nc:a", "1", cache.begin_read())
+        cache.put("other:a", "1", cache.begin_read())
+        assert cache.get("nc:a") == "1"
+        await other.set("nc:a", "2")
+        await _until(lambda: cache.get("nc:a") is _MISSING)
+        assert not cache.accepts("other:a")
+
+    _run(redis_url, scenario)
+
+
+def test_value_read_before_invalidation_is_not_cached(redis_url):
+    async def scenario(cache: NearCache, other: Redis) -> None:
+        sequence = cache.begin_read()
+        # Пока «наше» чтение в полёте, другая реплика меняет ключ и прилетает инвалидация.
+        await other.set("nc:a", "new")
+        await _until(lambda: cache.begin_read() != sequence)
+        cache.put("nc:a", "old", sequence)
+        assert cache.get("nc:a") is _MISSING
+
+    _run(redis_url, scenario)
+
+
+def test_size_bound_evicts_least_recently_used(redis_url):
+    async def scenario(cache: NearCache, other: Redis) -> None:
+        for key in ("nc:a", "nc:b"):
+            cache.put(key, key, cache.begin_read())
+        assert cache.get("nc:a") == "nc:a"
+        cache.put("nc:c", "nc:c", cache.begin_read())
+        assert len(cache) == 2
+        assert cache.get("nc:b") is _MISSING
+        assert cache.get("nc:a") == "nc:a"
+
+    _run(redis_url, scenario, max_size=2)
+
+
+def test_hit_ratio_gauge(redis_url, monkeypatch):
+    def gauge(name: str) -> float:
+        return REGISTRY.get_sample_value(name)
+
+    async def scenario(cache: NearCache, other: Redis) -> None:
+        monkeypatch.setattr(near_cache_module, "near_cache", cache)
+        cache.put("nc:a", "1", cache.begin_read())
+        for key in ("nc:a", "nc:a", "nc:a", "nc:b"):
+            cache.get(key)
+        assert cache.hit_ratio == 0.75
+        assert gauge("redis_near_cache_hit_ratio") == 0.75
+        assert gauge("redis_near_cache_entries") == 1.0
+
+    _run(redis_url, scenario)
+
+
+def test_flush_and_dropped_tracking_connection_clear_cache(redis_url):
+    async def scenario(cache: NearCache, other: Redis) -> None:
+        cache.put("nc:a", "1", cache.begin_read())
+        await other.flushall()
+        await _until(lambda: len(cache) == 0)
+
+        cache.put("nc:b", "1", cache.begin_read())
+        # Рвём канал инвалидаций: пока его нет, кэш выключен и пуст, потом поднимается заново.
+        await other.execute_command("CLIENT", "KILL", "TYPE", "pubsub")
+        await _until(lambda: not cache.active)
+        assert len(cache) == 0
+        await _until(lambda: cache.active)
+
+    _run(redis_url, scenario)
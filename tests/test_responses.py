@@ -0,0 +1,89 @@
+import asyncio
+import gzip
+import zlib
+from datetime import datetime, timezone
+
+import brotli
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.api.main import SystemSettingListResponse, SystemSettingResponse
+from app.api.middleware import CompressionMiddleware, _accepted_encodings
+from app.api.responses import FastJSONResponse
+
+
+def _settings(count: int) -> SystemSettingListResponse:
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return SystemSettingListResponse(
+        items=[
+            SystemSettingResponse(key=f"ключ.{i}", value=str(i), description=None, created_at=created_at, updated_at=None)
+            for i in range(count)
+        ],
+        next_cursor=None,
+    )
+
+
+def test_fast_json_matches_default_encoding():
+    model = _settings(3)
+    assert FastJSONResponse(model).body == JSONResponse(jsonable_encoder(model)).body
+
+
+async def _call(app, accept_encoding: str) -> tuple[dict, list[bytes]]:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else [],
+    }
+    start: dict = {}
+    chunks: list[bytes] = []
+
+    requests = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+    async def receive():
+        request = next(requests, None)
+        if request is not None:
+            return request
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            start.update(headers=dict(message["headers"]))
+        elif message.get("body"):
+            chunks.append(message["body"])
+
+    await app(scope, receive, send)
+    return start["headers"], chunks
+
+
+def test_compression_picks_encoding_and_respects_threshold():
+    assert _accepted_encodings("gzip;q=1.0, br;q=0, identity") == {"gzip", "identity"}
+    body = FastJSONResponse(_settings(50)).body
+
+    # Starlette дописывает заголовки в raw_headers ответа, поэтому на каждый вызов — свой экземпляр.
+    headers, chunks = asyncio.run(_call(CompressionMiddleware(FastJSONResponse(_settings(50)), minimum_size=1024), "gzip, br"))
+    assert headers[b"content-encoding"] == b"br"
+    assert brotli.decompress(b"".join(chunks)) == body
+
+    headers, chunks = asyncio.run(_call(CompressionMiddleware(FastJSONResponse(_settings(50)), minimum_size=1024), "gzip, br;q=0"))
+    assert headers[b"content-encoding"] == b"gzip"
+    assert gzip.decompress(b"".join(chunks)) == body
+
+    headers, chunks = asyncio.run(_call(CompressionMiddleware(FastJSONResponse(_settings(1)), minimum_size=1024), "gzip"))
+    assert b"content-encoding" not in headers
+
+
+def test_streamed_lines_are_decodable_as_they_arrive():
+    lines = [b'{"index":%d,"status":"started"}\n' % i * 40 for i in range(3)]
+
+    async def stream():
+        for line in lines:
+            yield line
+
+    app = CompressionMiddleware(StreamingResponse(stream(), media_type="application/x-ndjson"), minimum_size=16)
+    headers, chunks = asyncio.run(_call(app, "gzip"))
+    assert headers[b"content-encoding"] == b"gzip"
+    # Каждый кусок сброшен целиком: клиент получает строку сразу, а не после конца стрима.
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert [decoder.decompress(chunk) for chunk in chunks[: len(lines)]] == lines
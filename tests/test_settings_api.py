@@ -0,0 +1,158 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.api import main
+from app.database import Base, get_db
+from app.services import nats_client
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+needs_postgres = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="нужен Postgres: TEST_DATABASE_URL=postgresql+psycopg://..."
+)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Гоняем сценарий против API; с TEST_DATABASE_URL — на чистой таблице system_settings в этой базе."""
+
+    async def broadcast(keys: list[str]) -> None:
+        pass
+
+    monkeypatch.setattr(main, "_broadcast_settings_invalidation", broadcast)
+    main.settings_cache.clear()
+
+    def run(scenario):
+        async def wrapped():
+            engine = create_async_engine(TEST_DATABASE_URL) if TEST_DATABASE_URL else None
+            if engine is not None:
+                async with engine.begin() as connection:
+                    await connection.run_sync(Base.metadata.drop_all)
+                    await connection.run_sync(Base.metadata.create_all)
+                sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+                async def test_db():
+                    async with sessions() as db:
+                        yield db
+
+                main.app.dependency_overrides[get_db] = test_db
+            transport = httpx.ASGITransport(app=main.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    return await scenario(client)
+            finally:
+                main.app.dependency_overrides.pop(get_db, None)
+                if engine is not None:
+                    await engine.dispose()
+
+        return asyncio.run(wrapped())
+
+    yield run
+    main.settings_cache.clear()
+
+
+async def _upsert(client: httpx.AsyncClient, items: list[dict]) -> list[dict]:
+    response = await client.put("/settings:batchUpsert", json={"items": items})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_oversized_values_are_rejected_before_the_database(api):
+    async def scenario(client):
+        batch = await client.put("/settings:batchUpsert", json={"items": [{"key": "k", "value": "x" * 257}]})
+        single = await client.put("/settings/k", json={"value": "ok", "description": "d" * 513})
+        return batch.status_code, single.status_code
+
+    assert api(scenario) == (422, 422)
+
+
+@needs_postgres
+def test_batch_upsert_updates_conflicts_and_keeps_last_duplicate(api):
+    async def scenario(client):
+        first = await _upsert(client, [{"key": "a", "value": "1"}, {"key": "b", "value": "1"}])
+        second = await _upsert(
+            client, [{"key": "a", "value": "2"}, {"key": "c", "value": "1"}, {"key": "c", "value": "3"}]
+        )
+        main.settings_cache.clear()
+        fetched = await client.post("/settings:batchGet", json={"keys": ["c", "a", "nope"]})
+        return first, second, fetched.json()
+
+    first, second, fetched = api(scenario)
+    assert [(row["key"], row["value"]) for row in second] == [("a", "2"), ("c", "3")]
+    # ON CONFLICT обновляет строку на месте: created_at прежний, updated_at сдвинулся.
+    assert second[0]["created_at"] == first[0]["created_at"]
+    assert second[0]["updated_at"] > first[0]["updated_at"]
+    assert [(row["key"], row["value"]) for row in fetched["items"]] == [("c", "3"), ("a", "2")]
+    assert fetched["missing"] == ["nope"]
+
+
+@needs_postgres
+def test_keyset_pages_have_no_gaps_or_duplicates(api):
+    keys = [f"page.{index:02d}" for index in range(7)]
+
+    async def scenario(client):
+        await _upsert(client, [{"key": key, "value": key} for key in reversed(keys)] + [{"key": "zzz"}])
+        seen: list[str] = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"prefix": "page.", "limit": 3, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/settings", params=params)).json()
+            seen.extend(item["key"] for item in page["items"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen, pages
+
+    seen, pages = api(scenario)
+    assert seen == keys
+    assert pages == 3
+
+
+@needs_postgres
+def test_prefix_is_matched_literally(api):
+    async def scenario(client):
+        await _upsert(client, [{"key": key} for key in ("a%b.x", "a_b.x", "axb.x", "aXb.y")])
+        percent = (await client.get("/settings", params={"prefix": "a%b"})).json()
+        underscore = (await client.get("/settings", params={"prefix": "a_b"})).json()
+        return percent, underscore
+
+    percent, underscore = api(scenario)
+    assert [item["key"] for item in percent["items"]] == ["a%b.x"]
+    assert [item["key"] for item in underscore["items"]] == ["a_b.x"]
+
+
+def test_invalidation_broadcast_never_blocks_the_write(monkeypatch):
+    class Client:
+        is_connected = False
+        is_reconnecting = True
+
+        def __init__(self) -> None:
+            self.published: list = []
+
+        async def connect(self, **options) -> None:
+            raise AssertionError("запись не должна ждать подключения к NATS")
+
+        async def publish(self, subject, payload, headers=None) -> None:
+            self.published.append(subject)
+
+        async def flush(self, timeout: int = 10) -> None:
+            await asyncio.sleep(60)
+
+    client = Client()
+    monkeypatch.setattr(nats_client, "_nats", client)
+    monkeypatch.setattr(main, "SETTINGS_INVALIDATION_TIMEOUT", 0.05)
+
+    async def scenario():
+        await main._broadcast_settings_invalidation(["a"])
+        client.is_connected = True
+        client.is_reconnecting = False
+        # Связь есть, но сервер не подтверждает flush: ждём не дольше таймаута.
+        await asyncio.wait_for(main._broadcast_settings_invalidation(["a"]), timeout=1)
+
+    asyncio.run(scenario())
+    assert client.published == [main.SETTINGS_INVALIDATION_SUBJECT]
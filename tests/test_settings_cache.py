@@ -0,0 +1,73 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.services import nats_client
+from app.services import settings_cache as settings_cache_module
+from app.services.settings_cache import (
+    SettingsCache,
+    decode_invalidation,
+    encode_invalidation,
+    handle_invalidation_message,
+)
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.services.settings_cache.time.monotonic", lambda: now[0])
+    cache: SettingsCache[str] = SettingsCache(max_size=2, ttl=10)
+
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    now[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_invalidation_drops_stale_loads():
+    cache: SettingsCache[str] = SettingsCache(max_size=10, ttl=60)
+    generation = cache.begin_load()
+    cache.invalidate(["core.version"])
+    cache.put("core.version", "old", generation)
+    assert cache.get("core.version") is None
+
+
+def test_invalidation_payload_roundtrip():
+    assert decode_invalidation(encode_invalidation(["a", "b"])) == ["a", "b"]
+    assert decode_invalidation(b"garbage") == []
+
+
+def test_own_invalidation_is_skipped_and_other_replicas_evict(monkeypatch):
+    cache: SettingsCache[str] = SettingsCache(max_size=10, ttl=60)
+    monkeypatch.setattr(settings_cache_module, "settings_cache", cache)
+    cache.put("a", "written-here")
+    cache.put("b", "2")
+
+    asyncio.run(handle_invalidation_message(SimpleNamespace(data=encode_invalidation(["a"]))))
+    assert cache.get("a") == "written-here"
+
+    from_other = json.dumps({"origin": "other-replica", "keys": ["a", "b"]}).encode()
+    asyncio.run(handle_invalidation_message(SimpleNamespace(data=from_other)))
+    assert cache.get("a") is None and cache.get("b") is None
+
+
+def test_nats_disconnect_and_reconnect_clear_the_cache(monkeypatch):
+    cache: SettingsCache[str] = SettingsCache(max_size=10, ttl=60)
+    monkeypatch.setattr(nats_client, "_connection_reset_handlers", [])
+    nats_client.on_connection_reset(cache.clear)
+    nats_client.on_connection_reset(cache.clear)
+
+    for _ in range(2):  # disconnected_cb, затем reconnected_cb
+        cache.put("a", "1")
+        generation = cache.begin_load()
+        asyncio.run(nats_client._connection_reset())
+        assert len(cache) == 0
+        # Чтение, начатое до разрыва, своё значение уже не положит.
+        cache.put("a", "stale", generation)
+        assert cache.get("a") is None
+    assert nats_client._connection_reset_handlers == [cache.clear]
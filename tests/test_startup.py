@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app.startup import StartupCoordinator, StartupError
+
+
+def _coordinator(**kwargs) -> StartupCoordinator:
+    return StartupCoordinator(backoff_base=0.01, backoff_max=0.02, optional=frozenset({"broker"}), **kwargs)
+
+
+def test_ready_once_required_are_up_while_optional_retries_in_background():
+    calls = {"db": 0, "broker": 0}
+
+    async def flaky_db() -> None:
+        calls["db"] += 1
+        if calls["db"] < 3:
+            raise ConnectionError("not yet")
+
+    async def broker_down() -> None:
+        calls["broker"] += 1
+        raise ConnectionError("down")
+
+    async def scenario() -> StartupCoordinator:
+        coordinator = _coordinator(required_timeout=5)
+        coordinator.add("db", flaky_db, attempt_timeout=1)
+        coordinator.add("broker", broker_down, attempt_timeout=1)
+        await asyncio.wait_for(coordinator.run(), timeout=2)
+        await asyncio.sleep(0.05)
+        await coordinator.stop()
+        return coordinator
+
+    coordinator = asyncio.run(scenario())
+    assert coordinator.phases["db"].attempts == 3
+    assert coordinator.phases["db"].duration is not None
+    assert coordinator.phases["broker"].duration is None
+    assert calls["broker"] >= 2
+
+
+def test_required_dependency_fails_fast_after_deadline():
+    async def hangs() -> None:
+        await asyncio.sleep(10)
+
+    async def scenario() -> None:
+        coordinator = _coordinator(required_timeout=0.3)
+        coordinator.add("temporal", hangs, attempt_timeout=0.1)
+        await coordinator.run()
+
+    with pytest.raises(StartupError, match="temporal"):
+        asyncio.run(asyncio.wait_for(scenario(), timeout=2))
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from opentelemetry import trace
+from opentelemetry.instrumentation.redis import RedisInstrumentor
+from opentelemetry.util._once import Once
+
+from app import telemetry
+from app.telemetry import UNMATCHED_ROUTE, route_template
+
+
+def test_route_label_uses_template_not_raw_path():
+    app = FastAPI()
+    seen: list[str] = []
+
+    @app.middleware("http")
+    async def collect_route(request: Request, call_next):
+        response = await call_next(request)
+        seen.append(route_template(request))
+        return response
+
+    @app.get("/settings/{key}")
+    async def read_setting(key: str):
+        return {"key": key}
+
+    async def scenario() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/settings/core.version")
+            await client.get("/settings/feature.flag")
+            await client.get("/no/such/route")
+
+    asyncio.run(scenario())
+    assert seen == ["/settings/{key}", "/settings/{key}", UNMATCHED_ROUTE]
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    """Глобальный TracerProvider ставится один раз на процесс — на время теста даём configure_tracing чистый слот."""
+    monkeypatch.setattr(trace, "_TRACER_PROVIDER_SET_ONCE", Once())
+    monkeypatch.setattr(trace, "_TRACER_PROVIDER", None)
+    monkeypatch.setattr(telemetry, "_tracer_provider", None)
+    yield monkeypatch
+    telemetry.shutdown_tracing()
+    RedisInstrumentor().uninstrument()
+
+
+def test_tracing_disabled_by_default(tracing):
+    tracing.setattr(telemetry, "SBS_TRACES_EXPORTER", "none")
+    assert telemetry.configure_tracing("sbs-test") is None
+    assert trace._TRACER_PROVIDER is None
+
+
+def test_console_exporter_writes_sampled_spans_to_file(tracing, tmp_path):
+    traces_file = tmp_path / "traces.jsonl"
+    tracing.setattr(telemetry, "SBS_TRACES_EXPORTER", "console")
+    tracing.setattr(telemetry, "SBS_TRACES_FILE", str(traces_file))
+
+    provider = telemetry.configure_tracing("sbs-test")
+    assert provider is not None
+    assert trace.get_tracer_provider() is provider
+    assert telemetry.configure_tracing("sbs-test") is provider
+    with provider.get_tracer("sbs.test").start_as_current_span("traced-operation"):
+        pass
+    telemetry.shutdown_tracing()
+
+    exported = traces_file.read_text(encoding="utf-8")
+    assert '"name": "traced-operation"' in exported
+    assert '"service.name": "sbs-test"' in exported
+
+
+def test_sampler_ratio_applies_to_root_spans(tracing):
+    tracing.setattr(telemetry, "SBS_TRACES_EXPORTER", "console")
+    tracing.setattr(telemetry, "SBS_TRACES_SAMPLER_RATIO", 0.0)
+
+    provider = telemetry.configure_tracing("sbs-test")
+    with provider.get_tracer("sbs.test").start_as_current_span("dropped") as span:
+        assert not span.get_span_context().trace_flags.sampled
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import timedelta
+
+from temporalio.client import DescribeWorkflowInput, OutboundInterceptor
+
+from app.temporal import client as temporal_client
+
+
+def test_concurrent_callers_share_one_client_and_failures_are_not_cached(monkeypatch):
+    connects: list[object] = []
+
+    async def flaky_connect():
+        await asyncio.sleep(0.01)
+        if not connects:
+            connects.append(None)
+            raise RuntimeError("Failed client connect")
+        connects.append(object())
+        return connects[-1]
+
+    monkeypatch.setattr(temporal_client, "_connect", flaky_connect)
+    monkeypatch.setattr(temporal_client, "_client", None)
+
+    async def scenario():
+        try:
+            await temporal_client.get_temporal_client()
+        except RuntimeError:
+            pass
+        clients = await asyncio.gather(*(temporal_client.get_temporal_client() for _ in range(10)))
+        await temporal_client.close_temporal_client()
+        return clients
+
+    clients = asyncio.run(scenario())
+    # Первая попытка упала и не закэшировалась; десять параллельных вызовов открыли ровно один клиент.
+    assert len(connects) == 2
+    assert all(client is connects[1] for client in clients)
+    assert temporal_client._client is None
+
+
+def test_rpc_timeout_applies_only_when_call_has_none():
+    seen: list[timedelta | None] = []
+
+    class Recorder(OutboundInterceptor):
+        async def describe_workflow(self, input: DescribeWorkflowInput):
+            seen.append(input.rpc_timeout)
+
+    outbound = temporal_client.RpcTimeoutInterceptor(rpc_timeout=3).intercept_client(Recorder(None))
+
+    def describe_input(rpc_timeout):
+        return DescribeWorkflowInput(id="wf", run_id=None, rpc_metadata={}, rpc_timeout=rpc_timeout)
+
+    asyncio.run(outbound.describe_workflow(describe_input(None)))
+    asyncio.run(outbound.describe_workflow(describe_input(timedelta(seconds=30))))
+    assert seen == [timedelta(seconds=3), timedelta(seconds=30)]
@@ -0,0 +1,101 @@
+import asyncio
+import socket
+import urllib.request
+from uuid import uuid4
+
+import pytest
+from temporalio.testing import ActivityEnvironment, WorkflowEnvironment
+from temporalio.worker import ExecuteActivityInput
+
+from app.temporal import worker
+from app.temporal.interceptors import (
+    ACTIVITY_DURATION_METRIC,
+    ACTIVITY_FAILURES_METRIC,
+    WORKFLOW_DURATION_METRIC,
+    WorkerMetricsInterceptor,
+)
+from app.workflows.test_workflow import TestWorkflow
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    """Runtime worker'а как в проде (с переопределёнными бакетами), но на свободном локальном порту."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setattr(worker, "WORKER_METRICS_ENABLED", True)
+    monkeypatch.setattr(worker, "WORKER_METRICS_HOST", "127.0.0.1")
+    monkeypatch.setattr(worker, "WORKER_METRICS_PORT", port)
+    monkeypatch.delenv("WORKER_SLOT", raising=False)
+    return worker.build_runtime(), f"http://127.0.0.1:{port}/metrics"
+
+
+class _Next:
+    def __init__(self, error: Exception | None) -> None:
+        self.error = error
+
+    async def execute_activity(self, input: ExecuteActivityInput):
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return "done"
+
+
+def _run_attempt(runtime, error: Exception | None):
+    interceptor = WorkerMetricsInterceptor().intercept_activity(_Next(error))
+    env = ActivityEnvironment()
+    env.metric_meter = runtime.metric_meter
+
+    async def attempt():
+        return await interceptor.execute_activity(ExecuteActivityInput(fn=attempt, args=[], executor=None, headers={}))
+
+    return asyncio.run(env.run(attempt))
+
+
+def test_activity_metrics_use_dashboard_names_and_bucket_overrides(runtime):
+    runtime, metrics_url = runtime
+    assert _run_attempt(runtime, None) == "done"
+    with pytest.raises(ValueError):
+        _run_attempt(runtime, ValueError("boom"))
+
+    exposed = urllib.request.urlopen(metrics_url, timeout=5).read().decode()
+    lines = exposed.splitlines()
+
+    def samples(name: str) -> list[str]:
+        return [line for line in lines if line.startswith(name + "{")]
+
+    # Имена — ровно те, что читает дашборд Grafana; длительность в секундах с нашими границами бакетов.
+    buckets = samples(f"{ACTIVITY_DURATION_METRIC}_bucket")
+    assert any('outcome="completed"' in line for line in buckets)
+    assert any('outcome="failed"' in line for line in buckets)
+    bounds = {line.split('le="')[1].split('"')[0] for line in buckets}
+    assert {"0.005", "30", "60", "+Inf"} <= bounds
+    failures = samples(ACTIVITY_FAILURES_METRIC)
+    assert len(failures) == 1
+    assert 'error_type="ValueError"' in failures[0] and 'activity_type="unknown"' in failures[0]
+    assert failures[0].endswith(" 1")
+    assert all('service_name="sbs-worker"' in line for line in buckets + failures)
+
+
+def test_workflow_metrics_from_a_real_run(runtime):
+    runtime, metrics_url = runtime
+
+    async def scenario() -> str:
+        try:
+            env = await WorkflowEnvironment.start_time_skipping(runtime=runtime)
+        except RuntimeError as exc:
+            pytest.skip(f"Temporal test server недоступен: {exc}")
+        async with env:
+            async with worker.build_worker(env.client):
+                await env.client.execute_workflow(
+                    TestWorkflow.run, "Metrics", id=f"metrics-{uuid4()}", task_queue=worker.WORKER_TASK_QUEUE
+                )
+        return urllib.request.urlopen(metrics_url, timeout=5).read().decode()
+
+    exposed = asyncio.run(scenario())
+    assert any(
+        line.startswith(f"{WORKFLOW_DURATION_METRIC}_bucket{{")
+        and 'workflow_type="TestWorkflow"' in line
+        and 'outcome="completed"' in line
+        for line in exposed.splitlines()
+    )
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from app.api import main
+from app.temporal import client as temporal_client
+from app.temporal.client import WorkflowStart, start_workflows_concurrently
+
+
+class _StubClient:
+    """Стартует workflow с задержкой из аргументов и считает, сколько стартов одновременно в полёте."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def start_workflow(self, workflow, *, args, id, task_queue, **options):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay, outcome = args
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        if outcome == "fail":
+            raise RuntimeError(f"start of {id} failed")
+        if outcome == "conflict":
+            raise WorkflowAlreadyStartedError(id, "TestWorkflow", run_id="run-old")
+        return SimpleNamespace(
+            id=id,
+            result_run_id=f"run-{id}",
+            _start_workflow_response=SimpleNamespace(started=outcome != "existing"),
+        )
+
+
+def test_bounded_in_flight_results_by_completion_and_errors(monkeypatch):
+    stub = _StubClient()
+    monkeypatch.setattr(temporal_client, "_client", stub)
+    delays = [0.05, 0.01, 0.03, 0.0, 0.02, 0.01]
+    starts = [
+        WorkflowStart(workflow_id=f"wf-{index}", args=[delay, "fail" if index == 4 else "new"])
+        for index, delay in enumerate(delays)
+    ]
+
+    async def scenario():
+        return [item async for item in start_workflows_concurrently("TestWorkflow", starts, task_queue="q", concurrency=2)]
+
+    outcomes = asyncio.run(scenario())
+    assert stub.max_in_flight == 2
+    # Отдаём по готовности: медленный первый старт приходит не первым, но каждый индекс — ровно один раз.
+    assert outcomes[0][0] != 0
+    assert sorted(index for index, _ in outcomes) == list(range(len(starts)))
+    by_index = dict(outcomes)
+    assert isinstance(by_index[4], RuntimeError)
+    assert all(by_index[index].id == f"wf-{index}" for index in by_index if index != 4)
+
+
+def test_batch_start_reports_existing_runs_separately(monkeypatch):
+    monkeypatch.setattr(temporal_client, "_client", _StubClient())
+    forgotten: list[list[str]] = []
+
+    async def forget(workflow_ids):
+        forgotten.append(list(workflow_ids))
+
+    monkeypatch.setattr(main, "forget_workflow_results", forget)
+    items = [
+        {"name": "new", "workflow_id": "wf-new"},
+        {"name": "existing", "workflow_id": "wf-existing"},
+        {"name": "conflict", "workflow_id": "wf-conflict"},
+    ]
+    monkeypatch.setattr(
+        main,
+        "WorkflowStart",
+        lambda workflow_id, args: WorkflowStart(workflow_id=workflow_id, args=[0.0, args[0]]),
+    )
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            response = await http.post(
+                "/workflows:batchStart", json={"items": items, "id_conflict_policy": "use_existing"}
+            )
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    lines = sorted(asyncio.run(scenario()), key=lambda line: line["index"])
+    assert [line["status"] for line in lines] == ["started", "existing", "already_started"]
+    assert lines[1]["run_id"] == "run-wf-existing"
+    # Кэш результатов сбрасываем только для действительно перезапущенных id.
+    assert forgotten == [["wf-new"]]
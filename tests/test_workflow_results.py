@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import fakeredis
+import httpx
+import pytest
+from temporalio.client import WorkflowExecutionStatus
+
+from app.services import cache
+from app.temporal import results
+
+
+class _FakeHandle:
+    def __init__(self, temporal: "_FakeTemporal") -> None:
+        self._temporal = temporal
+
+    async def result(self):
+        self._temporal.result_calls += 1
+        await self._temporal.finished.wait()
+        return "Привет, Demo"
+
+    async def describe(self):
+        self._temporal.describe_calls += 1
+        closed = self._temporal.finished.is_set()
+        return SimpleNamespace(
+            id="wf-1",
+            run_id=self._temporal.run_id,
+            workflow_type="TestWorkflow",
+            status=WorkflowExecutionStatus.COMPLETED if closed else WorkflowExecutionStatus.RUNNING,
+            start_time=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            close_time=datetime(2026, 1, 1, 0, 1, tzinfo=timezone.utc) if closed else None,
+        )
+
+
+class _FakeTemporal:
+    def __init__(self) -> None:
+        self.finished = asyncio.Event()
+        self.result_calls = 0
+        self.describe_calls = 0
+        self.run_id = "run-1"
+
+    def get_workflow_handle(self, workflow_id: str) -> _FakeHandle:
+        return _FakeHandle(self)
+
+
+def test_waiters_share_one_long_poll_and_closed_results_come_from_redis(monkeypatch):
+    async def scenario():
+        temporal = _FakeTemporal()
+
+        async def get_client():
+            return temporal
+
+        monkeypatch.setattr(results, "get_temporal_client", get_client)
+        monkeypatch.setattr(cache, "_redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+
+        # Пока workflow идёт: ожидание по таймауту отдаёт None и отменяет long-poll, статус — одним describe.
+        assert await results.wait_for_result("wf-1", timeout=0.05) is None
+        assert results._waits == {}
+        assert (await results.workflow_status("wf-1")).status == "RUNNING"
+
+        waiters = [asyncio.create_task(results.wait_for_result("wf-1", timeout=5)) for _ in range(10)]
+        await asyncio.sleep(0.05)
+        temporal.finished.set()
+        outcomes = await asyncio.gather(*waiters)
+        # Первый long-poll отменён по таймауту, второй — один на всех десятерых.
+        assert temporal.result_calls == 2
+        assert {outcome.result for outcome in outcomes} == {"Привет, Demo"}
+
+        result_calls, describe_calls = temporal.result_calls, temporal.describe_calls
+        status = await results.workflow_status("wf-1")
+        again = await results.wait_for_result("wf-1", timeout=5)
+        assert (status.status, status.close_time) == ("COMPLETED", "2026-01-01T00:01:00+00:00")
+        assert again.result == "Привет, Demo"
+        # Из кэша: ни истории, ни describe — повторные опросы закрытого workflow в Temporal не ходят.
+        assert (temporal.result_calls, temporal.describe_calls) == (result_calls, describe_calls)
+
+        # Id перезапущен через API: старт сбросил запись, и статус снова берётся из Temporal.
+        temporal.run_id = "run-2"
+        temporal.finished.clear()
+        await results.forget_workflow_results(["wf-1"])
+        restarted = await results.workflow_status("wf-1")
+        assert (restarted.status, restarted.run_id) == ("RUNNING", "run-2")
+        await cache.close_redis()
+
+    asyncio.run(scenario())
+
+
+def test_corrupt_cache_entry_falls_back_to_temporal(monkeypatch):
+    async def scenario():
+        temporal = _FakeTemporal()
+        temporal.finished.set()
+
+        async def get_client():
+            return temporal
+
+        monkeypatch.setattr(results, "get_temporal_client", get_client)
+        monkeypatch.setattr(cache, "_redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        key = results._cache_key("wf-1")
+
+        for raw in ("not json", '{"workflow_id": "wf-1", "status": "COMPLETED", "old_field": 1}'):
+            await cache._redis.set(key, raw)
+            outcome = await results.workflow_status("wf-1")
+            assert (outcome.status, outcome.result) == ("COMPLETED", "Привет, Demo")
+            # Битую запись заменил свежий исход из Temporal.
+            assert (await results._read_cached("wf-1")).run_id == "run-1"
+        await cache.close_redis()
+
+    asyncio.run(scenario())
+
+
+def test_only_connect_failures_map_to_503(monkeypatch):
+    from app.api import main
+    from app.temporal.client import TemporalConnectError
+
+    async def unreachable(workflow_id):
+        raise TemporalConnectError("Failed client connect: connection refused")
+
+    async def broken(workflow_id):
+        raise RuntimeError("bug in status mapping")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            monkeypatch.setattr(main, "workflow_status", unreachable)
+            assert (await client.get("/workflows/wf-1")).status_code == 503
+            monkeypatch.setattr(main, "workflow_status", broken)
+            # Ошибка в нашем коде — это 500 с трейсбеком, а не «Temporal недоступен».
+            with pytest.raises(RuntimeError):
+                await client.get("/workflows/wf-1")
+
+    asyncio.run(scenario())